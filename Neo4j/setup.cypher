@@ -10,6 +10,20 @@ FOR (s:Slot) REQUIRE (s.name, s.frame) IS UNIQUE;
 CREATE CONSTRAINT daemon_name IF NOT EXISTS
 FOR (d:Daemon) REQUIRE d.name IS UNIQUE;
 
+// Claves de las consultas calientes del agente (las mismas que crea
+// app/migraciones.py al iniciar la app)
+CREATE CONSTRAINT esquema_name IF NOT EXISTS
+FOR (e:Esquema) REQUIRE e.name IS UNIQUE;
+
+CREATE CONSTRAINT atributo_name_esquema IF NOT EXISTS
+FOR (a:Atributo) REQUIRE (a.name, a.esquema) IS UNIQUE;
+
+CREATE INDEX atributo_esquema IF NOT EXISTS
+FOR (a:Atributo) ON (a.esquema);
+
+CREATE CONSTRAINT evaluar_fn_id IF NOT EXISTS
+FOR (ev:EVALUAR_FORMA_NORMAL) REQUIRE ev.id IS UNIQUE;
+
 // =======================================
 // PASO 2 — METAMODELO (sin APOC)
 // =======================================
@@ -138,6 +152,8 @@ MATCH (a2:Atributo {esquema:'Pedido'})
 MERGE (es2)-[:TIENE]->(a2);
 
 // --- 3) Dependencias Funcionales (DF como RELACIÓN entre atributos del mismo esquema)
+//        Una DF con determinante compuesto se guarda con un arco por atributo,
+//        todos con la misma propiedad `determinante` (lista ordenada como la DF).
 MATCH (idProd:Atributo {name:'IDProducto',     esquema:'Pedido'}),
       (idPed :Atributo {name:'IDPedido',       esquema:'Pedido'}),
       (nro   :Atributo {name:'NroPedido',      esquema:'Pedido'}),
@@ -145,14 +161,14 @@ MATCH (idProd:Atributo {name:'IDProducto',     esquema:'Pedido'}),
       (cant  :Atributo {name:'Cantidad',       esquema:'Pedido'})
 
 // (IDProducto, IDPedido) → Cantidad  (Plena)  → representado con dos arcos
-MERGE (idProd)-[:DF {tipo:'Plena'}]->(cant)
-MERGE (idPed) -[:DF {tipo:'Plena'}]->(cant)
+MERGE (idProd)-[:DF {tipo:'Plena', determinante:['IDProducto','IDPedido']}]->(cant)
+MERGE (idPed) -[:DF {tipo:'Plena', determinante:['IDProducto','IDPedido']}]->(cant)
 
 // IDProducto → NombreProducto  (Parcial)
-MERGE (idProd)-[:DF {tipo:'Parcial'}]->(nom)
+MERGE (idProd)-[:DF {tipo:'Parcial', determinante:['IDProducto']}]->(nom)
 
 // IDPedido → NroPedido  (Parcial)
-MERGE (idPed)-[:DF {tipo:'Parcial'}]->(nro);
+MERGE (idPed)-[:DF {tipo:'Parcial', determinante:['IDPedido']}]->(nro);
 
 // --- 4) Instancia de evaluación (con slot forma_normal y el enlace EVALUA)
 MERGE (ev:EVALUAR_FORMA_NORMAL {id:'EV_Pedido_2FN'})
@@ -1,9 +1,27 @@
 # app/agent.py — Neo4j tools + dispatcher para EduDB (formas normales)
+import asyncio
+import base64
+import copy
+import hashlib
+import json
 import os
+import re
+import threading
+import time
 import unicodedata
-from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import ClientError
+
+from app.cache import LRUCache
+from app import perfilado
+from app.metricas import CYPHER_SEGUNDOS, ERRORES_TOTAL, registrar_colector
+from app.dependencias import analizar_dependencias, descomponer
+from app.grafo import Grafo, estados_de_mascara, grafo_memoria_desde_setup, mascara_fn, nivel_de_mascara
+from app.instantanea import InstantaneaFN
+from app.nombres import IndiceNombres, elegir
 
 # ==========================
 # Utilidades de texto
@@ -27,17 +45,146 @@ NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+# Tiempo máximo (s) que execute_read/execute_write reintentan ante errores
+# transitorios (el driver aplica backoff exponencial con jitter entre intentos)
+NEO4J_MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "15"))
+
+# Pool de conexiones (por driver: hay uno sync y uno async)
+NEO4J_POOL_MAX = int(os.getenv("NEO4J_POOL_MAX", "50"))
+NEO4J_POOL_TIMEOUT = float(os.getenv("NEO4J_POOL_TIMEOUT", "30"))  # espera por una conexión libre (s)
+NEO4J_CONN_TIMEOUT = float(os.getenv("NEO4J_CONN_TIMEOUT", "10"))  # apertura de socket (s)
+NEO4J_CONN_LIFETIME = float(os.getenv("NEO4J_CONN_LIFETIME", "3600"))  # reciclado de conexiones (s)
+NEO4J_WARMUP_CONEXIONES = int(os.getenv("NEO4J_WARMUP_CONEXIONES", "4"))
+
+# Backend del grafo: "neo4j" (por defecto) o "memoria" (sin base de datos,
+# sembrado desde Neo4j/setup.cypher; ver app/grafo.py)
+EDUDB_BACKEND = os.getenv("EDUDB_BACKEND", "neo4j").strip().lower()
+
+# Los drivers se crean la primera vez que se usan: importar el módulo no
+# requiere variables de entorno ni abre conexiones. El ciclo de vida
+# (calentar / cerrar) lo maneja el lifespan de FastAPI o quien los use.
+_driver = None
+_async_driver = None
+_driver_lock = threading.Lock()
+
+def _opciones_driver() -> Dict[str, Any]:
+    if not NEO4J_URI:
+        raise RuntimeError("Falta NEO4J_URI en el entorno.")
+    return {
+        "auth": (NEO4J_USERNAME, NEO4J_PASSWORD),
+        "max_transaction_retry_time": NEO4J_MAX_RETRY_TIME,
+        "max_connection_pool_size": NEO4J_POOL_MAX,
+        "connection_acquisition_timeout": NEO4J_POOL_TIMEOUT,
+        "connection_timeout": NEO4J_CONN_TIMEOUT,
+        "max_connection_lifetime": NEO4J_CONN_LIFETIME,
+    }
+
+def get_driver():
+    """Driver sync (singleton perezoso)."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(NEO4J_URI, **_opciones_driver())
+    return _driver
+
+def get_async_driver():
+    """Driver async para los endpoints de FastAPI (no bloquea el event loop)."""
+    global _async_driver
+    if _async_driver is None:
+        with _driver_lock:
+            if _async_driver is None:
+                _async_driver = AsyncGraphDatabase.driver(NEO4J_URI, **_opciones_driver())
+    return _async_driver
+
+def calentar_driver() -> Dict[str, Any]:
+    """Verifica conectividad y abre conexiones del pool sync por adelantado."""
+    t0 = time.perf_counter()
+    drv = get_driver()
+    drv.verify_connectivity()
+    sesiones = [drv.session(database=NEO4J_DATABASE) for _ in range(NEO4J_WARMUP_CONEXIONES)]
+    try:
+        for session in sesiones:
+            session.run("RETURN 1").consume()
+    finally:
+        for session in sesiones:
+            session.close()
+    return {"conexiones": len(sesiones), "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+async def calentar_driver_async() -> Dict[str, Any]:
+    """Igual que calentar_driver, sobre el driver async (conexiones en paralelo)."""
+    t0 = time.perf_counter()
+    drv = get_async_driver()
+    await drv.verify_connectivity()
 
-driver = GraphDatabase.driver(
-    NEO4J_URI,
-    auth=(NEO4J_USERNAME, NEO4J_PASSWORD),
-)
+    async def _ping() -> None:
+        async with drv.session(database=NEO4J_DATABASE) as session:
+            await (await session.run("RETURN 1")).consume()
 
-def _run_cypher(query: str, params: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+    await asyncio.gather(*(_ping() for _ in range(NEO4J_WARMUP_CONEXIONES)))
+    return {"conexiones": NEO4J_WARMUP_CONEXIONES, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+def cerrar_driver() -> None:
+    global _driver
+    with _driver_lock:
+        drv, _driver = _driver, None
+    if drv is not None:
+        drv.close()
+
+async def cerrar_driver_async() -> None:
+    global _async_driver
+    with _driver_lock:
+        drv, _async_driver = _async_driver, None
+    if drv is not None:
+        await drv.close()
+
+@contextmanager
+def _medir_cypher(nombre: str):
+    """Histograma de latencia + contador de errores por nombre de consulta."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORES_TOTAL.inc("cypher", nombre)
+        raise
+    finally:
+        CYPHER_SEGUNDOS.observar(time.perf_counter() - t0, nombre)
+
+def _correr(runner, query: str, params: Dict[str, Any], nombre: str) -> List[Dict[str, Any]]:
+    """Ejecuta sobre una sesión o una transacción. Con CYPHER_PERFILADO
+    también junta el summary (tiempos del servidor, PROFILE muestreado)."""
+    if not perfilado.activo():
+        return [r.data() for r in runner.run(query, params)]
+    perfil = perfilado.muestrear()
+    t0 = time.perf_counter()
+    result = runner.run(perfilado.con_profile(query) if perfil else query, params)
+    rows = [r.data() for r in result]
+    summary = result.consume()
+    perfilado.registrar(nombre, query, params, summary, (time.perf_counter() - t0) * 1000, perfil)
+    return rows
+
+async def _correr_async(runner, query: str, params: Dict[str, Any], nombre: str) -> List[Dict[str, Any]]:
+    if not perfilado.activo():
+        return [r.data() async for r in await runner.run(query, params)]
+    perfil = perfilado.muestrear()
+    t0 = time.perf_counter()
+    result = await runner.run(perfilado.con_profile(query) if perfil else query, params)
+    rows = [r.data() async for r in result]
+    summary = await result.consume()
+    perfilado.registrar(nombre, query, params, summary, (time.perf_counter() - t0) * 1000, perfil)
+    return rows
+
+def _run_cypher(query: str, params: Dict[str, Any] | None = None, nombre: str = "otra") -> List[Dict[str, Any]]:
+    params = params or {}
+    with _medir_cypher(nombre), get_driver().session(database=NEO4J_DATABASE) as session:
+        return _correr(session, query, params, nombre)
+
+async def _run_cypher_async(query: str, params: Dict[str, Any] | None = None,
+                            nombre: str = "otra") -> List[Dict[str, Any]]:
     params = params or {}
-    with driver.session(database=NEO4J_DATABASE) as session:
-        result = session.run(query, params)
-        return [r.data() for r in result]
+    with _medir_cypher(nombre):
+        async with get_async_driver().session(database=NEO4J_DATABASE) as session:
+            return await _correr_async(session, query, params, nombre)
 
 # ==========================
 # Reglas teóricas (hard-code)
@@ -77,41 +224,102 @@ def _norm_fn(fn: Optional[str]) -> Optional[str]:
 # Tools Neo4j existentes
 # ==========================
 
-def tool_estado_fn(esquema: str, forma_normal: Optional[str] = None) -> Dict[str, Any]:
-    """Devuelve el estado de un esquema respecto a una o varias formas normales.
+Q_ESTADO_FN_UNA = """
+MATCH (es:Esquema {name:$esquema})
+OPTIONAL MATCH (es)-[c:CUMPLE]->(fn1:FrameClass {name:$fn})
+OPTIONAL MATCH (es)-[nc:NO_CUMPLE]->(fn2:FrameClass {name:$fn})
+RETURN es.name AS esquema,
+       coalesce(fn1.name, fn2.name, $fn) AS forma_normal,
+       CASE
+         WHEN c IS NOT NULL THEN 'CUMPLE'
+         WHEN nc IS NOT NULL THEN 'NO_CUMPLE'
+         ELSE 'SIN_EVALUAR'
+       END AS estado,
+       properties(c)  AS datos_cumple,
+       properties(nc) AS datos_no_cumple
+"""
 
-    Si forma_normal está dada → devuelve una sola fila (o SIN_EVALUAR).
-    Si forma_normal es None → devuelve lista para 1FN, 2FN, 3FN (si existen).
-    """
+Q_ESTADO_FN_TODAS = """
+MATCH (es:Esquema {name:$esquema})
+OPTIONAL MATCH (es)-[rel:CUMPLE|NO_CUMPLE]->(fn:FrameClass)
+WHERE fn.name IN ['1FN','2FN','3FN']
+RETURN es.name AS esquema,
+       fn.name AS forma_normal,
+       type(rel) AS tipo_rel,
+       CASE
+         WHEN rel IS NULL THEN 'SIN_EVALUAR'
+         WHEN type(rel) = 'CUMPLE' THEN 'CUMPLE'
+         WHEN type(rel) = 'NO_CUMPLE' THEN 'NO_CUMPLE'
+         ELSE 'SIN_EVALUAR'
+       END AS estado,
+       properties(rel) AS detalles
+ORDER BY fn.name
+"""
+
+# Recorrido completo para la instantánea: una fila por arista, o una con
+# forma_normal null si el esquema no tiene evaluaciones
+Q_ESTADOS_FN_RECORRER = """
+MATCH (es:Esquema)
+OPTIONAL MATCH (es)-[rel:CUMPLE|NO_CUMPLE]->(fn:FrameClass)
+WHERE fn.name IN ['1FN','2FN','3FN']
+RETURN es.name AS esquema, fn.name AS forma_normal, type(rel) AS estado, properties(rel) AS props
+"""
+
+# Nivel de FN materializado en el nodo (lo escriben Q_GUIADO_ESCRIBIR y
+# Q_NIVEL_FN_REPARAR): "¿en qué forma normal está X?" sale de las
+# propiedades del nodo, en una fila. Los `detalles` (qué DF rompe la FN)
+# siguen en las aristas: una pattern comprehension sobre las del nodo.
+Q_ESTADO_FN_NIVEL = """
+MATCH (es:Esquema {name:$esquema})
+RETURN es.name AS esquema, es.nivel_fn AS nivel_fn, es.mascara_fn AS mascara_fn,
+       [(es)-[rel:CUMPLE|NO_CUMPLE]->(fn:FrameClass) WHERE fn.name IN ['1FN','2FN','3FN']
+        | [fn.name, properties(rel)]] AS detalles
+"""
+
+# Recalcula nivel_fn/mascara_fn desde las aristas, de a $lote esquemas por
+# nombre (misma codificación que app/grafo.py: 2 bits por FN)
+Q_NIVEL_FN_REPARAR = """
+MATCH (es:Esquema)
+WHERE es.name > $despues
+WITH es ORDER BY es.name LIMIT $lote
+WITH es, reduce(m = 0, e IN [(es)-[rel:CUMPLE|NO_CUMPLE]->(fn:FrameClass)
+                             WHERE fn.name IN ['1FN','2FN','3FN'] | [fn.name, type(rel)]]
+       | m + (CASE e[1] WHEN 'CUMPLE' THEN 1 ELSE 2 END)
+           * (CASE e[0] WHEN '1FN' THEN 1 WHEN '2FN' THEN 4 ELSE 16 END)) AS mascara
+WITH es, mascara, coalesce(es.mascara_fn <> mascara, true) AS distinta
+SET es.mascara_fn = mascara,
+    es.nivel_fn = CASE
+      WHEN mascara = 0 THEN null
+      WHEN mascara % 4 <> 1 THEN 0
+      WHEN mascara / 4 % 4 <> 1 THEN 1
+      WHEN mascara / 16 % 4 <> 1 THEN 2
+      ELSE 3
+    END
+RETURN count(es) AS procesados,
+       sum(CASE WHEN distinta THEN 1 ELSE 0 END) AS corregidos,
+       max(es.name) AS ultimo
+"""
+
+def _consulta_estado_fn(esquema: Optional[str], forma_normal: Optional[str]):
+    """Arma (query, params) para tool_estado_fn, o None si falta el esquema."""
     esquema = _norm_text(esquema)
     if not esquema:
+        return None
+    if forma_normal:
+        return Q_ESTADO_FN_UNA, {"esquema": esquema, "fn": _norm_fn(forma_normal)}
+    return Q_ESTADO_FN_TODAS, {"esquema": esquema}
+
+def _nombre_estado(params: Dict[str, Any]) -> str:
+    return "estado_fn_una" if "fn" in params else "estado_fn_todas"
+
+def _armar_estado_fn(rows: List[Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+    esquema = params["esquema"]
+    if not rows:
         return {
             "ok": False,
-            "error": "Falta el nombre del esquema.",
+            "error": f"No se encontró el esquema '{esquema}' en el grafo.",
         }
-
-    if forma_normal:
-        fn = _norm_fn(forma_normal)
-        q = """
-        MATCH (es:Esquema {name:$esquema})
-        OPTIONAL MATCH (es)-[c:CUMPLE]->(fn1:FrameClass {name:$fn})
-        OPTIONAL MATCH (es)-[nc:NO_CUMPLE]->(fn2:FrameClass {name:$fn})
-        RETURN es.name AS esquema,
-               coalesce(fn1.name, fn2.name, $fn) AS forma_normal,
-               CASE
-                 WHEN c IS NOT NULL THEN 'CUMPLE'
-                 WHEN nc IS NOT NULL THEN 'NO_CUMPLE'
-                 ELSE 'SIN_EVALUAR'
-               END AS estado,
-               properties(c)  AS datos_cumple,
-               properties(nc) AS datos_no_cumple
-        """
-        rows = _run_cypher(q, {"esquema": esquema, "fn": fn})
-        if not rows:
-            return {
-                "ok": False,
-                "error": f"No se encontró el esquema '{esquema}' en el grafo.",
-            }
+    if "fn" in params:
         row = rows[0]
         return {
             "ok": True,
@@ -121,70 +329,405 @@ def tool_estado_fn(esquema: str, forma_normal: Optional[str] = None) -> Dict[str
             "datos_cumple": row.get("datos_cumple"),
             "datos_no_cumple": row.get("datos_no_cumple"),
         }
-
     # Sin forma_normal → devolvemos estado para las FNs conocidas
-    q = """
-    MATCH (es:Esquema {name:$esquema})
-    OPTIONAL MATCH (es)-[rel:CUMPLE|NO_CUMPLE]->(fn:FrameClass)
-    WHERE fn.name IN ['1FN','2FN','3FN']
-    RETURN es.name AS esquema,
-           fn.name AS forma_normal,
-           type(rel) AS tipo_rel,
-           CASE
-             WHEN rel IS NULL THEN 'SIN_EVALUAR'
-             WHEN type(rel) = 'CUMPLE' THEN 'CUMPLE'
-             WHEN type(rel) = 'NO_CUMPLE' THEN 'NO_CUMPLE'
-             ELSE 'SIN_EVALUAR'
-           END AS estado,
-           properties(rel) AS detalles
-    ORDER BY fn.name
-    """
-    rows = _run_cypher(q, {"esquema": esquema})
-    if not rows:
-        return {
-            "ok": False,
-            "error": f"No se encontró el esquema '{esquema}' en el grafo.",
-        }
+    m = mascara_fn({r["forma_normal"]: r["estado"] for r in rows if r.get("forma_normal")})
     return {
         "ok": True,
         "esquema": esquema,
+        "nivel_fn": nivel_de_mascara(m),
         "resultados": rows,
     }
 
+def _armar_estado_nivel(rows: List[Dict[str, Any]], params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Estado de todas las FN a partir de Q_ESTADO_FN_NIVEL. None si el nodo
+    todavía no tiene mascara_fn (esquema anterior a la migración 2 sin
+    reparar): el llamador lee las aristas. Forma normal y estado salen de
+    la máscara; `detalles`, de las propiedades de cada arista."""
+    if not rows:
+        return _armar_estado_fn(rows, params)
+    m = rows[0].get("mascara_fn")
+    if m is None:
+        return None
+    estados = estados_de_mascara(m)
+    detalles = {fn: props for fn, props in rows[0].get("detalles") or []}
+    filas = [
+        {"esquema": params["esquema"], "forma_normal": fn, "tipo_rel": e, "estado": e,
+         "detalles": detalles.get(fn)}
+        for fn, e in estados.items()
+    ] or [{"esquema": params["esquema"], "forma_normal": None, "tipo_rel": None,
+           "estado": "SIN_EVALUAR", "detalles": None}]
+    return {"ok": True, "esquema": params["esquema"], "nivel_fn": rows[0].get("nivel_fn"), "resultados": filas}
 
-def tool_requisitos_fn(forma_normal: str, esquema: Optional[str] = None) -> Dict[str, Any]:
-    """Devuelve los requisitos teóricos de una FN y, si se da un esquema,
-    cruza con el grafo para decir qué le falta o cómo está hoy.
+_ERROR_FALTA_ESQUEMA = {
+    "ok": False,
+    "error": "Falta el nombre del esquema.",
+}
+
+# ==========================
+# Cache de lectura para tool_estado_fn
+# ==========================
+# Clave: (esquema, forma_normal). El estado solo cambia cuando alguien
+# reescribe las relaciones CUMPLE / NO_CUMPLE del esquema, así que cada
+# escritor llama a invalidar_estado_fn(esquema) después de confirmar. Eso
+# solo avisa a este proceso: lo que escribe otro worker (o la CLI de
+# importación) se ve a lo sumo ESTADO_CACHE_TTL segundos después.
+
+ESTADO_CACHE = os.getenv("ESTADO_CACHE", "1") != "0"
+ESTADO_CACHE_MAX = int(os.getenv("ESTADO_CACHE_MAX", "4096"))
+ESTADO_CACHE_TTL = float(os.getenv("ESTADO_CACHE_TTL", "60")) or None  # 0 = sin vencimiento
+# Estado de todas las FN desde Esquema.nivel_fn/mascara_fn (una lectura de
+# propiedades) en vez de las aristas CUMPLE/NO_CUMPLE
+NIVEL_FN_LECTURA = os.getenv("NIVEL_FN_LECTURA", "1") != "0"
+
+_FNS_CACHEABLES = (None, "1FN", "2FN", "3FN")
+_estado_cache = LRUCache(maxsize=ESTADO_CACHE_MAX, ttl=ESTADO_CACHE_TTL)
+# Generación por esquema: una lectura que empezó antes de una escritura no
+# puede dejar en el cache un valor viejo después de la invalidación. La
+# época cuenta las invalidaciones de todo el cache.
+_estado_gen: Dict[str, int] = {}
+_estado_epoca = 0
+
+def _gen_estado(esquema: str) -> Tuple[int, int]:
+    return _estado_epoca, _estado_gen.get(esquema, 0)
+
+def _clave_estado(params: Dict[str, Any]):
+    fn = params.get("fn")
+    if fn not in _FNS_CACHEABLES:
+        return None
+    return (params["esquema"], fn)
+
+def _estado_cacheado(params: Dict[str, Any]):
+    """Devuelve (resultado o None, clave, generación) para una lectura."""
+    if not ESTADO_CACHE:
+        return None, None, (0, 0)
+    clave = _clave_estado(params)
+    if clave is None:
+        return None, None, (0, 0)
+    gen = _gen_estado(clave[0])
+    valor = _estado_cache.get(clave)
+    return (copy.deepcopy(valor) if valor is not None else None), clave, gen
+
+def _guardar_estado(clave, gen: Tuple[int, int], data: Dict[str, Any]) -> None:
+    # Solo se cachean respuestas válidas; "no se encontró" no se guarda
+    if clave is None or not data.get("ok"):
+        return
+    if _gen_estado(clave[0]) != gen:
+        return
+    _estado_cache.set(clave, copy.deepcopy(data))
+
+def invalidar_estado_fn(*esquemas: str) -> None:
+    """Descarta del cache todo lo cacheado para esos esquemas (sin
+    argumentos, todo el cache)."""
+    global _estado_epoca
+    if not esquemas:
+        _estado_epoca += 1
+        _estado_cache.invalidar()
+        return
+    for esquema in esquemas:
+        esquema = _norm_text(esquema)
+        if not esquema:
+            continue
+        _estado_gen[esquema] = _estado_gen.get(esquema, 0) + 1
+        for fn in _FNS_CACHEABLES:
+            _estado_cache.invalidar((esquema, fn))
+
+def configurar_cache_estado(activo: bool) -> None:
+    """Prende o apaga el cache (apagarlo también lo vacía)."""
+    global ESTADO_CACHE
+    ESTADO_CACHE = activo
+    if not activo:
+        invalidar_estado_fn()
+
+def estadisticas_cache_estado() -> Dict[str, Any]:
+    return {"activo": ESTADO_CACHE, **_estado_cache.stats()}
+
+def _metricas_cache_estado():
+    st = _estado_cache.stats()
+    return [
+        ("edudb_cache_estado_total", "counter", "Lecturas del cache de estado_fn, por resultado.",
+         [({"resultado": "hit"}, st["hits"]), ({"resultado": "miss"}, st["misses"])]),
+        ("edudb_cache_estado_desalojos_total", "counter", "Entradas desalojadas por tamaño.",
+         [({}, st["desalojos"])]),
+        ("edudb_cache_estado_entradas", "gauge", "Entradas vigentes en el cache de estado_fn.",
+         [({}, st["tamano"])]),
+    ]
+
+registrar_colector(_metricas_cache_estado)
+
+# ==========================
+# Instantánea de estados FN (read model opcional)
+# ==========================
+# Con INSTANTANEA_FN=1 la app carga al iniciar todas las aristas
+# CUMPLE/NO_CUMPLE en memoria (app/instantanea.py) y las lecturas de chat
+# se sirven de ahí. Cada escritura de este proceso la actualiza en el acto;
+# la reconciliación periódica corrige lo que escribió otro proceso (o las
+# sub-esquemas viejas que borra una descomposición).
+
+INSTANTANEA_FN = os.getenv("INSTANTANEA_FN", "0") != "0"
+INSTANTANEA_RECONCILIAR_S = float(os.getenv("INSTANTANEA_RECONCILIAR_S", "300"))  # 0 = sin reconciliación
+
+_instantanea = InstantaneaFN()
+
+def _leer_instantanea(params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not INSTANTANEA_FN or not _instantanea.cargada:
+        return None
+    filas = _instantanea.filas(params)
+    # Un esquema que no está (recién creado por otro proceso) va al grafo
+    return _armar_estado_fn(filas, params) if filas is not None else None
+
+def _aplicar_instantanea(items: List[Dict[str, Any]]) -> None:
+    """Lleva a la instantánea los items de Q_GUIADO_ESCRIBIR recién escritos."""
+    if not INSTANTANEA_FN:
+        return
+    for it in items:
+        _instantanea.aplicar(it["esquema"], {
+            ev["fn"]: ("CUMPLE" if ev["cumple"] else "NO_CUMPLE", ev["props"])
+            for ev in it["evaluaciones"]
+        })
+
+def cargar_instantanea() -> Dict[str, Any]:
+    """Carga la instantánea (o la reconcilia) con un recorrido completo del grafo."""
+    return _instantanea.cargar(get_grafo().recorrer_estados_fn())
+
+def estadisticas_instantanea() -> Dict[str, Any]:
+    return {"activo": INSTANTANEA_FN, "reconciliar_s": INSTANTANEA_RECONCILIAR_S, **_instantanea.stats()}
+
+def _metricas_instantanea():
+    if not INSTANTANEA_FN:
+        return []
+    st = _instantanea.stats()
+    return [
+        ("edudb_instantanea_lecturas_total", "counter", "Lecturas de estado_fn servidas por la instantánea.",
+         [({"resultado": "hit"}, st["hits"]), ({"resultado": "miss"}, st["misses"])]),
+        ("edudb_instantanea_esquemas", "gauge", "Esquemas en la instantánea.", [({}, st["esquemas"])]),
+        ("edudb_instantanea_bytes", "gauge", "Memoria aproximada de la instantánea.", [({}, st["bytes"])]),
+        ("edudb_instantanea_edad_segundos", "gauge", "Segundos desde la última carga completa.",
+         [({}, st["edad_s"] or 0)]),
+        ("edudb_instantanea_diferencias", "gauge", "Esquemas corregidos por la última reconciliación.",
+         [({}, st["diferencias_ultima_reconciliacion"])]),
+    ]
+
+registrar_colector(_metricas_instantanea)
+
+# ==========================
+# Resolución de nombres de esquema
+# ==========================
+# El LLM suele devolver "pedido" o "Pedidos" para el esquema Pedido. Antes
+# de consultar, el nombre pasa por el índice de app/nombres.py (cargado una
+# vez desde el grafo y completado con cada escritura de este proceso). Si
+# el nombre está ahí tal cual, no cuesta nada más. Si no, una consulta al
+# grafo trae el nombre exacto (si existe) y los candidatos del índice
+# full-text (migración 3): así un esquema que este proceso todavía no vio
+# (importado por la CLI, escrito por otro worker) se encuentra antes de
+# probar nada aproximado. nombres.elegir() decide sobre la unión y solo
+# sustituye ante una coincidencia única y clara; si no, la respuesta trae
+# `sugerencias` y el usuario elige.
+
+RESOLVER_NOMBRES = os.getenv("RESOLVER_NOMBRES", "1") != "0"
+RESOLVER_UMBRAL = float(os.getenv("RESOLVER_UMBRAL", "0.85"))  # Jaccard de trigramas mínimo
+RESOLVER_MARGEN = float(os.getenv("RESOLVER_MARGEN", "0.1"))   # ventaja mínima sobre el segundo
+RESOLVER_CANDIDATOS = 10
+RESOLVER_SUGERENCIAS = 3
+
+Q_ESQUEMAS_NOMBRES = "MATCH (es:Esquema) RETURN es.name AS esquema"
+
+Q_ESQUEMA_EXACTO = "MATCH (es:Esquema {name:$esquema}) RETURN es.name AS esquema, 1.0e9 AS score"
+
+# El nombre exacto va por el constraint de unicidad; el full-text agrega
+# los parecidos. Sin el índice (migración 3 pendiente) queda Q_ESQUEMA_EXACTO.
+Q_ESQUEMAS_BUSCAR = """
+CALL {
+  MATCH (es:Esquema {name:$esquema})
+  RETURN es.name AS esquema, 1.0e9 AS score
+  UNION
+  CALL db.index.fulltext.queryNodes('esquema_name_fulltext', $consulta) YIELD node, score
+  RETURN node.name AS esquema, score
+  LIMIT $limite
+}
+RETURN esquema, max(score) AS score
+ORDER BY score DESC
+"""
+
+_nombres = IndiceNombres()
+_nombres_lock = threading.RLock()
+# El resolver corre en hilos del threadpool y en el event loop a la vez
+_RESOLVER_STATS: Dict[str, int] = {"exacto": 0, "normalizado": 0, "trigramas": 0, "sin_candidato": 0}
+_resolver_stats_lock = threading.Lock()
+
+def _contar_resolucion(via: str) -> None:
+    with _resolver_stats_lock:
+        _RESOLVER_STATS[via] += 1
+
+def _stats_resolver() -> Dict[str, int]:
+    with _resolver_stats_lock:
+        return dict(_RESOLVER_STATS)
+
+def cargar_nombres() -> Dict[str, Any]:
+    """Carga (o completa) el índice de nombres con un recorrido del grafo."""
+    t0 = time.perf_counter()
+    with _nombres_lock:
+        nuevos = _nombres.cargar(get_grafo().nombres_esquemas())
+    return {"nombres": len(_nombres), "nuevos": nuevos, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+def _asegurar_nombres() -> None:
+    with _nombres_lock:
+        if not _nombres.cargado:
+            cargar_nombres()
+
+def registrar_nombres(*esquemas: str) -> None:
+    """Agrega al índice los esquemas que acaba de escribir este proceso."""
+    if RESOLVER_NOMBRES:
+        _nombres.agregar(e for e in esquemas if e)
+
+def recargar_desde_grafo() -> Dict[str, Any]:
+    """Descarta lo que este proceso guarda del grafo (cache de estado,
+    instantánea, índice de nombres) y lo vuelve a leer. Para después de
+    escribir desde otro proceso, p. ej. `python -m app.importar_sql`."""
+    invalidar_estado_fn()
+    reporte: Dict[str, Any] = {"ok": True}
+    if INSTANTANEA_FN:
+        reporte["instantanea"] = cargar_instantanea()
+    if RESOLVER_NOMBRES:
+        with _nombres_lock:
+            _nombres.vaciar()
+            reporte["nombres"] = cargar_nombres()
+    return reporte
+
+def quitar_nombres(*esquemas: str) -> None:
+    """Saca del índice los esquemas que acaba de borrar este proceso."""
+    _nombres.quitar(esquemas)
+
+def estadisticas_nombres() -> Dict[str, Any]:
+    return {"activo": RESOLVER_NOMBRES, "umbral": RESOLVER_UMBRAL, "margen": RESOLVER_MARGEN,
+            "cargado": _nombres.cargado, "nombres": len(_nombres), **_stats_resolver()}
+
+def _metricas_nombres():
+    return [
+        ("edudb_resolver_nombres_total", "counter", "Nombres de esquema resueltos, por vía.",
+         [({"via": via}, n) for via, n in _stats_resolver().items()]),
+        ("edudb_resolver_nombres_indice", "gauge", "Nombres en el índice de trigramas.", [({}, len(_nombres))]),
+    ]
+
+registrar_colector(_metricas_nombres)
+
+def _consulta_fulltext(esquema: str) -> str:
+    """Consulta Lucene: cada palabra con fuzzy (~) y prefijo (*); las partes
+    de un nombre con '_' también como prefijo. Vacía si no hay palabras."""
+    terminos: List[str] = []
+    for palabra in re.findall(r"\w+", _norm_text(esquema.casefold()) or ""):
+        terminos += [f"{palabra}~", f"{palabra}*"]
+        terminos += [f"{p}*" for p in palabra.split("_") if len(p) >= 3 and p != palabra]
+    return " OR ".join(dict.fromkeys(terminos))
+
+def _decidir(esquema: str, del_grafo: List[Dict[str, Any]]):
+    """(nombre a consultar, info para _con_resolucion) a partir de los
+    candidatos del índice local y los del grafo."""
+    candidatos = _nombres.candidatos(esquema, RESOLVER_CANDIDATOS) + [c["esquema"] for c in del_grafo]
+    resuelto, ranking = elegir(esquema, candidatos, RESOLVER_UMBRAL, RESOLVER_MARGEN)
+    if resuelto is None:
+        _contar_resolucion("sin_candidato")
+        sugerencias = [n for n, _ in ranking[:RESOLVER_SUGERENCIAS]]
+        return esquema, {"sugerencias": sugerencias} if sugerencias else None
+    nombre, score, via = resuelto
+    _contar_resolucion(via)
+    _nombres.agregar([nombre])  # puede venir del grafo: la próxima vez es un lookup local
+    if via == "exacto":
+        return nombre, None
+    return nombre, {"esquema_pedido": esquema, "via": via, "similitud": score}
+
+def _resolver_esquema(esquema: str):
+    """(nombre con el que consultar, info de la resolución o None).
+
+    Un nombre conocido tal cual no cuesta nada más que un lookup en un set;
+    cualquier otro, una consulta al grafo antes de la consulta real.
     """
-    fn = _norm_fn(forma_normal)
+    if not RESOLVER_NOMBRES:
+        return esquema, None
+    if not _nombres.cargado:
+        _asegurar_nombres()
+    if esquema in _nombres:
+        _contar_resolucion("exacto")
+        return esquema, None
+    return _decidir(esquema, get_grafo().buscar_esquemas(esquema, RESOLVER_CANDIDATOS))
+
+async def _resolver_esquema_async(esquema: str):
+    if not RESOLVER_NOMBRES:
+        return esquema, None
+    if not _nombres.cargado:
+        await asyncio.to_thread(_asegurar_nombres)  # recorre todos los nombres: fuera del event loop
+    if esquema in _nombres:
+        _contar_resolucion("exacto")
+        return esquema, None
+    return _decidir(esquema, await get_grafo().buscar_esquemas_async(esquema, RESOLVER_CANDIDATOS))
+
+def _con_resolucion(data: Dict[str, Any], info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Agrega a la respuesta cómo se resolvió el nombre (copia: `data` puede
+    venir del cache)."""
+    if not info:
+        return data
+    if "sugerencias" in info:
+        return data if data.get("ok") else {**data, "sugerencias": info["sugerencias"]}
+    return {**data, "esquema_pedido": info["esquema_pedido"],
+            "resolucion": {"via": info["via"], "similitud": info["similitud"]}}
+
+def tool_estado_fn(esquema: str, forma_normal: Optional[str] = None) -> Dict[str, Any]:
+    """Devuelve el estado de un esquema respecto a una o varias formas normales.
+
+    Si forma_normal está dada → devuelve una sola fila (o SIN_EVALUAR).
+    Si forma_normal es None → devuelve lista para 1FN, 2FN, 3FN (si existen).
+    El nombre se resuelve antes (mayúsculas, plurales, typos: ver arriba).
+    """
+    consulta = _consulta_estado_fn(esquema, forma_normal)
+    if consulta is None:
+        return dict(_ERROR_FALTA_ESQUEMA)
+    _, params = consulta
+    params["esquema"], resolucion = _resolver_esquema(params["esquema"])
+    return _con_resolucion(_leer_estado_fn(params), resolucion)
+
+def _leer_estado_fn(params: Dict[str, Any]) -> Dict[str, Any]:
+    data = _leer_instantanea(params)
+    if data is not None:
+        return data
+    cacheado, clave, gen = _estado_cacheado(params)
+    if cacheado is not None:
+        return cacheado
+    data = None
+    if NIVEL_FN_LECTURA and "fn" not in params:
+        data = _armar_estado_nivel(get_grafo().nivel_fn(params["esquema"]), params)
+    if data is None:
+        data = _armar_estado_fn(get_grafo().estado_fn(params), params)
+    _guardar_estado(clave, gen, data)
+    return data
+
+
+def _armar_requisitos_fn(fn: Optional[str], esquema: Optional[str],
+                         estado: Optional[Dict[str, Any]],
+                         propuesta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     desc = REQUISITOS_FN.get(fn, f"No tengo requisitos hard-codeados para {fn}.")
-    esquema = _norm_text(esquema) if esquema else None
 
     info_estado: Optional[Dict[str, Any]] = None
     problemas: List[str] = []
 
-    if esquema:
-        estado = tool_estado_fn(esquema, fn)
-        if estado.get("ok"):
-            info_estado = {
-                "esquema": estado.get("esquema"),
-                "forma_normal": estado.get("forma_normal"),
-                "estado": estado.get("estado"),
-            }
-            if estado.get("estado") == "NO_CUMPLE":
-                detalles = estado.get("datos_no_cumple") or {}
-                if "motivo" in detalles:
-                    problemas.append(detalles.get("motivo"))
-                if "motivos" in detalles and isinstance(detalles.get("motivos"), list):
-                    problemas.extend(m for m in detalles.get("motivos") if m)
-                if "parciales" in detalles:
-                    problemas.append(f"Cantidad de DF parciales: {detalles.get('parciales')}")
-                if "transitivas" in detalles:
-                    problemas.append(f"Cantidad de DF transitivas: {detalles.get('transitivas')}")
-                if "atributos" in detalles and isinstance(detalles.get("atributos"), list):
-                    attrs = detalles.get("atributos")
-                    if attrs:
-                        problemas.append("Atributos problemáticos: " + ", ".join(attrs))
+    if estado and estado.get("ok"):
+        info_estado = {
+            "esquema": estado.get("esquema"),
+            "forma_normal": estado.get("forma_normal"),
+            "estado": estado.get("estado"),
+        }
+        if estado.get("estado") == "NO_CUMPLE":
+            detalles = estado.get("datos_no_cumple") or {}
+            if "motivo" in detalles:
+                problemas.append(detalles.get("motivo"))
+            if "motivos" in detalles and isinstance(detalles.get("motivos"), list):
+                problemas.extend(m for m in detalles.get("motivos") if m)
+            if "parciales" in detalles:
+                problemas.append(f"Cantidad de DF parciales: {detalles.get('parciales')}")
+            if "transitivas" in detalles:
+                problemas.append(f"Cantidad de DF transitivas: {detalles.get('transitivas')}")
+            if "atributos" in detalles and isinstance(detalles.get("atributos"), list):
+                attrs = detalles.get("atributos")
+                if attrs:
+                    problemas.append("Atributos problemáticos: " + ", ".join(attrs))
 
     return {
         "ok": True,
@@ -193,8 +736,197 @@ def tool_requisitos_fn(forma_normal: str, esquema: Optional[str] = None) -> Dict
         "esquema": esquema,
         "estado_actual": info_estado,
         "problemas_detectados": problemas or None,
+        "propuesta_descomposicion": propuesta if propuesta and propuesta.get("ok") else None,
+    }
+
+def _necesita_propuesta(fn: Optional[str], estado: Optional[Dict[str, Any]]) -> bool:
+    # La síntesis a 3FN también resuelve 2FN; para 1FN no hay DF que mirar.
+    return bool(estado and estado.get("estado") == "NO_CUMPLE" and fn in ("2FN", "3FN"))
+
+def tool_requisitos_fn(forma_normal: str, esquema: Optional[str] = None) -> Dict[str, Any]:
+    """Devuelve los requisitos teóricos de una FN y, si se da un esquema,
+    cruza con el grafo para decir qué le falta o cómo está hoy.
+    """
+    fn = _norm_fn(forma_normal)
+    esquema = _norm_text(esquema) if esquema else None
+    resolucion = None
+    if esquema:
+        esquema, resolucion = _resolver_esquema(esquema)
+    estado = _leer_estado_fn(_consulta_estado_fn(esquema, fn)[1]) if esquema else None
+    propuesta = _descomponer(esquema, "3FN") if _necesita_propuesta(fn, estado) else None
+    return _con_resolucion(_armar_requisitos_fn(fn, esquema, estado, propuesta), resolucion)
+
+# ==========================
+# Análisis de dependencias funcionales (motor en app/dependencias.py)
+# ==========================
+
+Q_DEPENDENCIAS = """
+MATCH (es:Esquema {name:$esquema})
+OPTIONAL MATCH (es)-[:TIENE]->(a:Atributo)
+WITH es, collect({nombre: a.name, es_pk: coalesce(a.es_pk, false)}) AS atributos
+OPTIONAL MATCH (x:Atributo {esquema: es.name})-[df:DF]->(y:Atributo {esquema: es.name})
+RETURN atributos,
+       collect({desde: x.name, hacia: y.name, determinante: df.determinante}) AS dfs
+"""
+
+def _agrupar_dfs(filas: List[Dict[str, Any]]) -> List[Any]:
+    """Agrupa los arcos DF del grafo en DFs X → Y.
+
+    Un arco sin `determinante` es una DF de un solo atributo (desde → hacia);
+    los arcos que comparten `determinante` forman una DF compuesta.
+    """
+    grupos: Dict[tuple, List[str]] = {}
+    for f in filas:
+        if not f.get("hacia"):
+            continue
+        det = tuple(f.get("determinante") or [f["desde"]])
+        deps = grupos.setdefault(det, [])
+        if f["hacia"] not in deps:
+            deps.append(f["hacia"])
+    return [(list(det), deps) for det, deps in grupos.items()]
+
+def _leer_dependencias(row: Dict[str, Any]):
+    """(atributos, dfs, pk) a partir de la fila de Q_DEPENDENCIAS."""
+    atributos = [a for a in row["atributos"] if a.get("nombre")]
+    dfs = _agrupar_dfs(row["dfs"])
+    pk = [a["nombre"] for a in atributos if a["es_pk"]]
+    return [a["nombre"] for a in atributos], dfs, pk
+
+def _armar_dependencias(esquema: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if not rows:
+        return {"ok": False, "error": f"No se encontró el esquema '{esquema}' en el grafo."}
+    atributos, dfs, pk = _leer_dependencias(rows[0])
+    analisis = analizar_dependencias(atributos, dfs, pk=pk or None)
+    return {
+        "ok": True,
+        "esquema": esquema,
+        "pk": pk,
+        "dependencias": [{"determinante": det, "dependientes": deps} for det, deps in dfs],
+        **analisis,
     }
 
+def _armar_propuesta(esquema: str, rows: List[Dict[str, Any]], forma_normal: str) -> Dict[str, Any]:
+    if not rows:
+        return {"ok": False, "error": f"No se encontró el esquema '{esquema}' en el grafo."}
+    atributos, dfs, _ = _leer_dependencias(rows[0])
+    if not dfs:
+        return {"ok": False, "error": f"El esquema '{esquema}' no tiene DF cargadas para proponer una descomposición."}
+    propuesta = descomponer(atributos, dfs, forma_normal)
+    for i, sub in enumerate(propuesta["esquemas"], 1):
+        sub["nombre"] = f"{esquema}_{propuesta['forma_normal']}_{i}"
+    return {"ok": True, "esquema": esquema, **propuesta}
+
+def tool_analizar_dependencias(esquema: str) -> Dict[str, Any]:
+    """Lee atributos y arcos DF de un esquema y calcula claves candidatas,
+    atributos primos y dependencias parciales / transitivas reales.
+    """
+    esquema = _norm_text(esquema)
+    if not esquema:
+        return dict(_ERROR_FALTA_ESQUEMA)
+    esquema, resolucion = _resolver_esquema(esquema)
+    return _con_resolucion(_armar_dependencias(esquema, get_grafo().dependencias(esquema)), resolucion)
+
+# Escribe los sub-esquemas de una descomposición como nuevos Esquema,
+# enlazados al original con DESCOMPUESTO_EN. Reemplaza una propuesta
+# anterior para la misma forma normal.
+Q_DESCOMPOSICION_ESCRIBIR = """
+MATCH (orig:Esquema {name:$esquema})
+// Borrar la descomposición anterior (y devolver qué sub-esquemas había)
+CALL {
+  WITH orig
+  OPTIONAL MATCH (orig)-[:DESCOMPUESTO_EN {forma_normal:$fn}]->(viejo:Esquema)
+  OPTIONAL MATCH (viejo)-[:TIENE]->(att_viejo:Atributo)
+  WITH collect(DISTINCT viejo) AS viejos, collect(att_viejo) AS atts_viejos
+  FOREACH (a IN atts_viejos | DETACH DELETE a)
+  FOREACH (v IN viejos | DETACH DELETE v)
+  RETURN [v IN viejos | v.name] AS borrados
+}
+MATCH (fc_es:FrameClass {name:'ESQUEMA'}),
+      (fc_at:FrameClass {name:'ATRIBUTO'})
+UNWIND $subesquemas AS sub
+MERGE (es:Esquema {name:sub.nombre})
+SET es.derivado_de = orig.name,
+    es.mascara_fn = 0,
+    es.nivel_fn = null
+MERGE (orig)-[:DESCOMPUESTO_EN {forma_normal:$fn}]->(es)
+MERGE (es)-[:INSTANCE_OF]->(fc_es)
+WITH es, sub, fc_at, borrados
+CALL {
+  WITH es, sub, fc_at
+  UNWIND sub.atributos AS a
+  MERGE (att:Atributo {name:a.nombre, esquema: es.name})
+  SET att.es_pk = a.es_pk
+  MERGE (es)-[:TIENE]->(att)
+  MERGE (att)-[:INSTANCE_OF]->(fc_at)
+}
+CALL {
+  WITH es, sub
+  UNWIND sub.dfs AS d
+  MATCH (desde:Atributo {name:d.desde, esquema: es.name}),
+        (hacia:Atributo {name:d.hacia, esquema: es.name})
+  MERGE (desde)-[df:DF {determinante: d.determinante}]->(hacia)
+  SET df.tipo = 'Plena'
+}
+RETURN collect(es.name) AS creados, borrados
+"""
+
+# FOREIGN KEY importadas de un dump SQL (app/importar_sql.py): un arco por
+# par de columnas, entre atributos de esquemas distintos
+Q_REFERENCIAS_ESCRIBIR = """
+UNWIND $refs AS r
+MATCH (a:Atributo {name:r.columna, esquema:r.esquema}),
+      (b:Atributo {name:r.columna_ref, esquema:r.esquema_ref})
+MERGE (a)-[:REFERENCIA]->(b)
+RETURN count(*) AS escritas
+"""
+
+def _params_descomposicion(propuesta: Dict[str, Any]) -> Dict[str, Any]:
+    subesquemas = []
+    for sub in propuesta["esquemas"]:
+        clave = set(sub["clave"])
+        subesquemas.append({
+            "nombre": sub["nombre"],
+            "atributos": [{"nombre": a, "es_pk": a in clave} for a in sub["atributos"]],
+            "dfs": [
+                {"desde": x, "hacia": y, "determinante": d["determinante"]}
+                for d in sub["dependencias"]
+                for x in d["determinante"]
+                for y in d["dependientes"]
+            ],
+        })
+    return {"esquema": propuesta["esquema"], "fn": propuesta["forma_normal"], "subesquemas": subesquemas}
+
+def tool_descomponer_esquema(esquema: str, forma_normal: str = "3FN", persistir: bool = False) -> Dict[str, Any]:
+    """Propone la descomposición de un esquema a 3FN (síntesis) o BCNF a
+    partir de la cobertura mínima de sus DF. Con persistir=True escribe
+    los sub-esquemas en el grafo.
+    """
+    esquema = _norm_text(esquema)
+    if not esquema:
+        return dict(_ERROR_FALTA_ESQUEMA)
+    esquema, resolucion = _resolver_esquema(esquema)
+    return _con_resolucion(_descomponer(esquema, forma_normal, persistir), resolucion)
+
+def _descomponer(esquema: str, forma_normal: str, persistir: bool = False) -> Dict[str, Any]:
+    fn = "BCNF" if str(forma_normal).upper() in ("BCNF", "FNBC") else "3FN"
+    propuesta = _armar_propuesta(esquema, get_grafo().dependencias(esquema), fn)
+    if propuesta.get("ok") and persistir:
+        rows = get_grafo().escribir_descomposicion(_params_descomposicion(propuesta))
+        _tras_descomposicion(propuesta, rows)
+    return propuesta
+
+def _tras_descomposicion(propuesta: Dict[str, Any], rows: List[Dict[str, Any]]) -> None:
+    subs = [sub["nombre"] for sub in propuesta["esquemas"]]
+    # Sub-esquemas de la descomposición anterior que no volvieron a crearse
+    borrados = [e for e in (rows[0].get("borrados") or [] if rows else []) if e not in subs]
+    invalidar_estado_fn(*subs, *borrados)
+    _aplicar_instantanea([{"esquema": sub, "evaluaciones": []} for sub in subs])
+    if INSTANTANEA_FN:
+        _instantanea.quitar(*borrados)
+    quitar_nombres(*borrados)
+    registrar_nombres(*subs)
+    propuesta["persistido"] = True
+
 # ==========================
 # flujo de Evaluación guiada de un esquema
 # ==========================
@@ -207,12 +939,118 @@ def _coerce_int(value: Any, default: int = 0) -> int:
     except (TypeError, ValueError):
         return default
 
-def crear_esquema_guiado_y_evaluar(payload: Dict[str, Any]) -> Dict[str, Any]:
+# Escribe uno o varios esquemas evaluados en una sola sentencia.
+# Cada elemento de $esquemas es {esquema, atributos, ev:{id, props}, evaluaciones, dfs,
+# nivel_fn, mascara_fn}.
+# Cada evaluación es {fn, cumple, props} y cada df {desde, hacia, determinante, tipo}
+# (una DF con determinante compuesto se representa con un arco por atributo).
+Q_GUIADO_ESCRIBIR = """
+UNWIND $esquemas AS e
+// Crear esquema (o reutilizar si ya existe)
+MERGE (es:Esquema {name:e.esquema})
+WITH es, e
+
+// Borrar atributos viejos que ya no están en la lista nueva
+CALL {
+  WITH es, e
+  OPTIONAL MATCH (es)-[:TIENE]->(att_viejo:Atributo {esquema: es.name})
+  WHERE NOT att_viejo.name IN [a IN e.atributos | a.nombre]
+  DETACH DELETE att_viejo
+}
+
+// Crear/actualizar atributos actuales, TIENE e INSTANCE_OF
+CALL {
+  WITH es, e
+  MATCH (fc_at:FrameClass {name:'ATRIBUTO'})
+  UNWIND e.atributos AS a
+  MERGE (att:Atributo {name:a.nombre, esquema: es.name})
+  SET att.es_pk = coalesce(a.es_pk, false)
+  MERGE (es)-[:TIENE]->(att)
+  MERGE (att)-[:INSTANCE_OF]->(fc_at)
+}
+
+// Reemplazar las DF del esquema (solo si el payload trajo dependencias)
+CALL {
+  WITH es, e
+  WITH es, e WHERE e.dfs IS NOT NULL
+  OPTIONAL MATCH (:Atributo {esquema: es.name})-[df_vieja:DF]->(:Atributo {esquema: es.name})
+  DELETE df_vieja
+}
+CALL {
+  WITH es, e
+  UNWIND coalesce(e.dfs, []) AS d
+  MATCH (desde:Atributo {name:d.desde, esquema: es.name}),
+        (hacia:Atributo {name:d.hacia, esquema: es.name})
+  MERGE (desde)-[df:DF {determinante: d.determinante}]->(hacia)
+  SET df.tipo = d.tipo
+}
+
+// Asegurar INSTANCE_OF del esquema + instancia de evaluación (EV)
+MATCH (fc_es:FrameClass {name:'ESQUEMA'}),
+      (fc_eval:FrameClass {name:'EVALUAR_FORMA_NORMAL'})
+MERGE (es)-[:INSTANCE_OF]->(fc_es)
+SET es.nivel_fn = e.nivel_fn,
+    es.mascara_fn = e.mascara_fn
+MERGE (ev:EVALUAR_FORMA_NORMAL {id:e.ev.id})
+SET ev += e.ev.props,
+    ev.esquema_objetivo = es.name
+MERGE (ev)-[:EVALUA]->(es)
+MERGE (ev)-[:INSTANCE_OF]->(fc_eval)
+WITH es, e
+
+// Limpiar evaluaciones anteriores para 1FN/2FN/3FN
+CALL {
+  WITH es
+  OPTIONAL MATCH (es)-[old:CUMPLE|NO_CUMPLE]->(f:FrameClass)
+  WHERE f.name IN ['1FN','2FN','3FN']
+  DELETE old
+}
+
+// Escribir relaciones CUMPLE / NO_CUMPLE
+CALL {
+  WITH es, e
+  UNWIND e.evaluaciones AS ev_fn
+  MATCH (fn:FrameClass {name:ev_fn.fn})
+  FOREACH (_ IN CASE WHEN ev_fn.cumple THEN [1] ELSE [] END |
+    MERGE (es)-[r:CUMPLE]->(fn)
+    SET r += ev_fn.props
+  )
+  FOREACH (_ IN CASE WHEN ev_fn.cumple THEN [] ELSE [1] END |
+    MERGE (es)-[r:NO_CUMPLE]->(fn)
+    SET r += ev_fn.props
+  )
+}
+
+RETURN count(es) AS escritos
+"""
+
+def _parsear_dependencias(raw: Any):
+    """Normaliza [{"determinante": [...], "dependientes": [...]}, ...].
+
+    Devuelve None si el payload no trae dependencias (flujo por preguntas).
+    Acepta también "dependiente" como string suelto.
     """
-    Crea un Esquema + Atributos + instancia de EVALUAR_FORMA_NORMAL
-    a partir de un cuestionario guiado, y evalúa 1FN / 2FN / 3FN
-    usando la misma lógica teórica, pero ejecutando varias consultas
-    simples en lugar de un Cypher gigante.
+    if not isinstance(raw, list):
+        return None
+    dfs = []
+    for d in raw:
+        if not isinstance(d, dict):
+            continue
+        dependientes = d.get("dependientes", d.get("dependiente"))
+        if isinstance(dependientes, str):
+            dependientes = [dependientes]
+        det = [x for x in (_norm_text(x) for x in d.get("determinante") or []) if x]
+        deps = [x for x in (_norm_text(x) for x in dependientes or []) if x]
+        if deps:
+            dfs.append((det, deps))
+    return dfs
+
+def _preparar_guiado(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Valida el cuestionario y calcula en Python todo lo que hay que escribir.
+
+    Devuelve {"ok": False, "error": ...} si el payload no sirve, o un dict
+    con el nombre, el id de evaluación, los flags 1FN/2FN/3FN y el
+    elemento a pasar en $esquemas de Q_GUIADO_ESCRIBIR.
     """
     nombre = _norm_text(payload.get("nombre_esquema"))
     if not nombre:
@@ -234,111 +1072,80 @@ def crear_esquema_guiado_y_evaluar(payload: Dict[str, Any]) -> Dict[str, Any]:
     # -------- flags automáticos + guiados --------
 
     # 1FN — asumimos SIEMPRE que NO hay multivaluados
-    tiene_multivaluados = False
     atributos_multivaluados = []   # no se usa más
 
     # 2FN — PK compuesta detectada automáticamente
     pk_es_compuesta = sum(1 for a in atributos if a.get("es_pk")) > 1
 
-    # Dependencias parciales (PREGUNTA 3)
-    tiene_parciales = bool(payload.get("tiene_parciales", False))
-    cant_df_parciales = _coerce_int(payload.get("cant_df_parciales"))
-    if tiene_parciales and cant_df_parciales <= 0:
-        cant_df_parciales = 1
-    if not tiene_parciales:
-        cant_df_parciales = 0
-
-    # Dependencias transitivas (PREGUNTA 4)
-    tiene_transitivas = bool(payload.get("tiene_transitivas", False))
-    cant_df_transitivas = _coerce_int(payload.get("cant_df_transitivas"))
-    if tiene_transitivas and cant_df_transitivas <= 0:
-        cant_df_transitivas = 1
-    if not tiene_transitivas:
-        cant_df_transitivas = 0
+    # Si el payload trae las DF reales, las parciales/transitivas se calculan
+    # con el motor de dependencias en lugar de confiar en las respuestas.
+    dependencias = _parsear_dependencias(payload.get("dependencias"))
+    analisis: Optional[Dict[str, Any]] = None
+    dfs_grafo: Optional[List[Dict[str, Any]]] = None
+    if dependencias is not None:
+        nombres_attrs = [a["nombre"] for a in atributos]
+        desconocidos = sorted({
+            x for det, deps in dependencias for x in (*det, *deps) if x not in nombres_attrs
+        })
+        if desconocidos:
+            return {
+                "ok": False,
+                "error": "Las dependencias mencionan atributos que no están en el esquema: "
+                         + ", ".join(desconocidos),
+            }
+        if any(not det for det, _ in dependencias):
+            # El grafo guarda una DF como arcos desde cada atributo del determinante
+            return {"ok": False, "error": "Cada dependencia necesita al menos un atributo en el determinante."}
+        analisis = analizar_dependencias(
+            nombres_attrs,
+            dependencias,
+            pk=[a["nombre"] for a in atributos if a["es_pk"]],
+        )
+        tiene_parciales = not analisis["cumple_2fn"]
+        cant_df_parciales = len(analisis["dependencias_parciales"])
+        tiene_transitivas = bool(analisis["dependencias_transitivas"])
+        cant_df_transitivas = len(analisis["dependencias_transitivas"])
+        dfs_grafo = [
+            {"desde": x, "hacia": d["dependiente"], "determinante": d["determinante"], "tipo": d["tipo"]}
+            for d in analisis["dfs"]
+            for x in d["determinante"]
+        ]
+    else:
+        # Dependencias parciales (PREGUNTA 3)
+        tiene_parciales = bool(payload.get("tiene_parciales", False))
+        cant_df_parciales = _coerce_int(payload.get("cant_df_parciales"))
+        if tiene_parciales and cant_df_parciales <= 0:
+            cant_df_parciales = 1
+        if not tiene_parciales:
+            cant_df_parciales = 0
+
+        # Dependencias transitivas (PREGUNTA 4)
+        tiene_transitivas = bool(payload.get("tiene_transitivas", False))
+        cant_df_transitivas = _coerce_int(payload.get("cant_df_transitivas"))
+        if tiene_transitivas and cant_df_transitivas <= 0:
+            cant_df_transitivas = 1
+        if not tiene_transitivas:
+            cant_df_transitivas = 0
 
     # 1FN flag final
     sin_multival = True
 
-
     # -------- id de evaluación --------
     safe_name = nombre.replace(" ", "_")
     ev_id = f"EV_{safe_name}_GUIADO"
 
     # ================================
-    # 1) Crear Esquema + Atributos + EV
-    # ================================
-    query_setup = """
-    // Crear esquema (o reutilizar si ya existe)
-    MERGE (es:Esquema {name:$esquema})
-    WITH es, $atributos AS attrs
-
-    // Borrar atributos viejos que ya no están en la lista nueva
-    OPTIONAL MATCH (es)-[:TIENE]->(att_viejo:Atributo {esquema: es.name})
-    WHERE NOT att_viejo.name IN [a IN attrs | a.nombre]
-    OPTIONAL MATCH (att_viejo)-[r_viejo]-()
-    DELETE r_viejo, att_viejo
-
-    // Asegurar INSTANCE_OF del esquema
-    WITH es, attrs
-    MATCH (fc_es:FrameClass {name:'ESQUEMA'})
-    MERGE (es)-[:INSTANCE_OF]->(fc_es)
-
-    // Crear/actualizar atributos actuales, TIENE e INSTANCE_OF
-    WITH es, attrs
-    UNWIND attrs AS a
-    MERGE (att:Atributo {name:a.nombre, esquema: es.name})
-    SET att.es_pk = coalesce(a.es_pk, false)
-    MERGE (es)-[:TIENE]->(att)
-    WITH es
-    MATCH (att2:Atributo {esquema: es.name})
-    MATCH (fc_at:FrameClass {name:'ATRIBUTO'})
-    MERGE (att2)-[:INSTANCE_OF]->(fc_at)
-
-    // Crear instancia de evaluación (EV)
-    WITH es
-    MERGE (ev:EVALUAR_FORMA_NORMAL {id:$evId})
-    SET ev.forma_normal = '3FN',
-        ev.esquema_objetivo = es.name,
-        ev.sin_atributos_multivaluados = $sin_multival,
-        ev.atributos_multivaluados = $attrs_multival,
-        ev.pk_compuesta = $pk_compuesta,
-        ev.cant_df_parciales = $cant_parciales,
-        ev.cant_df_transitivas = $cant_transitivas
-    MERGE (ev)-[:EVALUA]->(es)
-    WITH es, ev
-    MATCH (fc_eval:FrameClass {name:'EVALUAR_FORMA_NORMAL'})
-    MERGE (ev)-[:INSTANCE_OF]->(fc_eval)
-
-    // Limpiar evaluaciones anteriores para 1FN/2FN/3FN
-    WITH es
-    OPTIONAL MATCH (es)-[old:CUMPLE|NO_CUMPLE]->(f:FrameClass)
-    WHERE f.name IN ['1FN','2FN','3FN']
-    DELETE old
-
-    RETURN es.name AS esquema
-    """
-    params_setup = {
-        "esquema": nombre,
-        "atributos": atributos,
-        "evId": ev_id,
-        "sin_multival": sin_multival,
-        "attrs_multival": atributos_multivaluados,
-        "pk_compuesta": pk_es_compuesta,
-        "cant_parciales": cant_df_parciales,
-        "cant_transitivas": cant_df_transitivas,
-    }
-
-    _run_cypher(query_setup, params_setup)
-
-    # ================================
-    # 2) Calcular flags en Python
+    # Calcular flags en Python
     # ================================
     ok1 = sin_multival
 
     # Regla correcta para 2FN:
     # - Si la PK NO es compuesta -> si cumple 1FN, entonces cumple 2FN
     # - Si la PK es compuesta -> además tiene que no tener DF parciales
-    if pk_es_compuesta:
+    # Con DF reales manda el análisis (las claves candidatas pueden no ser la PK).
+    if analisis is not None:
+        ok2 = ok1 and analisis["cumple_2fn"]
+    elif pk_es_compuesta:
         ok2 = ok1 and (cant_df_parciales == 0)
     else:
         ok2 = ok1
@@ -351,140 +1158,693 @@ def crear_esquema_guiado_y_evaluar(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not ok1:
         motivos2.append("No cumple 1FN")
     # Solo tiene sentido hablar de parciales si la PK es compuesta
-    if pk_es_compuesta and cant_df_parciales > 0:
+    if (pk_es_compuesta or analisis is not None) and cant_df_parciales > 0:
         motivos2.append("Tiene dependencias parciales")
 
+    ev_props = {
+        "forma_normal": "3FN",
+        "sin_atributos_multivaluados": sin_multival,
+        "atributos_multivaluados": atributos_multivaluados,
+        "pk_compuesta": pk_es_compuesta,
+        "cant_df_parciales": cant_df_parciales,
+        "cant_df_transitivas": cant_df_transitivas,
+        "df_calculadas": analisis is not None,
+    }
 
-    # ================================
-    # 3) Escribir relaciones CUMPLE / NO_CUMPLE
-    # ================================
+    # Propiedades de cada relación CUMPLE / NO_CUMPLE
+    evaluaciones = [
+        {
+            "fn": "1FN",
+            "cumple": ok1,
+            "props": {
+                "multival": 0,
+                "pk_compuesta": pk_es_compuesta,
+                "parciales": cant_df_parciales,
+                "transitivas": cant_df_transitivas,
+            } if ok1 else {
+                "motivo": "Atributos multivaluados",
+                "atributos": atributos_multivaluados,
+            },
+        },
+        {
+            "fn": "2FN",
+            "cumple": ok2,
+            "props": {
+                "pk_compuesta": pk_es_compuesta,
+                "parciales": 0,
+            } if ok2 else {
+                "motivos": motivos2,
+                "parciales": cant_df_parciales,
+            },
+        },
+        {
+            "fn": "3FN",
+            "cumple": ok3,
+            "props": {
+                "transitivas": 0,
+            } if ok3 else {
+                "motivo": "Tiene dependencias transitivas",
+                "transitivas": cant_df_transitivas,
+            },
+        },
+    ]
 
-    # ----- 1FN -----
-    if ok1:
-        query_1fn = """
-        MATCH (es:Esquema {name:$esquema}),
-              (fn:FrameClass {name:'1FN'}),
-              (ev:EVALUAR_FORMA_NORMAL {id:$evId})
-        MERGE (es)-[r:CUMPLE]->(fn)
-        SET r.multival = 0,
-            r.pk_compuesta = ev.pk_compuesta,
-            r.parciales = ev.cant_df_parciales,
-            r.transitivas = ev.cant_df_transitivas
-        """
-    else:
-        query_1fn = """
-        MATCH (es:Esquema {name:$esquema}),
-              (fn:FrameClass {name:'1FN'}),
-              (ev:EVALUAR_FORMA_NORMAL {id:$evId})
-        MERGE (es)-[r:NO_CUMPLE]->(fn)
-        SET r.motivo = 'Atributos multivaluados',
-            r.atributos = coalesce(ev.atributos_multivaluados, [])
-        """
-    _run_cypher(query_1fn, {"esquema": nombre, "evId": ev_id})
-
-    # ----- 2FN -----
-    # Borrar cualquier relación vieja de 2FN (por las dudas que haya quedado algo de otra evaluación)
-    _run_cypher("""
-    MATCH (es:Esquema {name:$esquema})-[r:CUMPLE|NO_CUMPLE]->(fn:FrameClass {name:'2FN'})
-    DELETE r
-    """, {"esquema": nombre})
-
-    if ok2:
-        query_2fn = """
-        MATCH (es:Esquema {name:$esquema}),
-              (fn:FrameClass {name:'2FN'}),
-              (ev:EVALUAR_FORMA_NORMAL {id:$evId})
-        MERGE (es)-[r:CUMPLE]->(fn)
-        SET r.pk_compuesta = ev.pk_compuesta,
-            r.parciales = 0
-        """
-        _run_cypher(query_2fn, {"esquema": nombre, "evId": ev_id})
-    else:
-        query_2fn = """
-        MATCH (es:Esquema {name:$esquema}),
-              (fn:FrameClass {name:'2FN'}),
-              (ev:EVALUAR_FORMA_NORMAL {id:$evId})
-        MERGE (es)-[r:NO_CUMPLE]->(fn)
-        SET r.motivos = $motivos2,
-            r.parciales = ev.cant_df_parciales
-        """
-        _run_cypher(query_2fn, {
+    if analisis is not None:
+        # Con DF reales podemos decir exactamente qué atributos fallan
+        if not ok2:
+            evaluaciones[1]["props"]["atributos"] = sorted(
+                {d["dependiente"] for d in analisis["dependencias_parciales"]}
+            )
+        if not ok3:
+            evaluaciones[2]["props"]["atributos"] = sorted(
+                {d["dependiente"] for d in analisis["dependencias_transitivas"]}
+            )
+
+    mascara = mascara_fn({ev["fn"]: "CUMPLE" if ev["cumple"] else "NO_CUMPLE" for ev in evaluaciones})
+
+    return {
+        "ok": True,
+        "esquema": nombre,
+        "ev_id": ev_id,
+        "analisis_dependencias": analisis,
+        "resumen": {
             "esquema": nombre,
-            "evId": ev_id,
-            "motivos2": motivos2,
+            "cumple_1fn": ok1,
+            "cumple_2fn": ok2,
+            "cumple_3fn": ok3,
+        },
+        "item": {
+            "esquema": nombre,
+            "atributos": atributos,
+            "ev": {"id": ev_id, "props": ev_props},
+            "evaluaciones": evaluaciones,
+            "dfs": dfs_grafo,
+            "nivel_fn": nivel_de_mascara(mascara),
+            "mascara_fn": mascara,
+        },
+    }
+
+def _armar_guiado(prep: Dict[str, Any], estado: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "ok": True,
+        "esquema": prep["esquema"],
+        "ev_id": prep["ev_id"],
+        "evaluacion_resumen": prep["resumen"],
+        "analisis_dependencias": prep["analisis_dependencias"],
+        "estado_detallado": estado,
+    }
+
+def _armar_guiado_y_cachear(prep: Dict[str, Any], rows: List[Dict[str, Any]],
+                            params_estado: Dict[str, Any]) -> Dict[str, Any]:
+    # El estado se leyó dentro de la misma transacción que escribió: después
+    # de invalidar se puede dejar en el cache tal cual.
+    invalidar_estado_fn(prep["esquema"])
+    _aplicar_instantanea([prep["item"]])
+    registrar_nombres(prep["esquema"])
+    estado = _armar_estado_fn(rows, params_estado)
+    if ESTADO_CACHE:
+        _guardar_estado(_clave_estado(params_estado), _gen_estado(prep["esquema"]), estado)
+    return _armar_guiado(prep, estado)
+
+def _tx_guiado(tx, items, consulta_estado=None) -> List[Dict[str, Any]]:
+    # Función de transacción: el driver puede re-ejecutarla ante errores
+    # transitorios, así que todo lo que escribe es idempotente (MERGE).
+    _correr(tx, Q_GUIADO_ESCRIBIR, {"esquemas": items}, "guiado_escribir")
+    if consulta_estado is None:
+        return []
+    q, params = consulta_estado
+    return _correr(tx, q, params, _nombre_estado(params))
+
+def crear_esquema_guiado_y_evaluar(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Crea un Esquema + Atributos + instancia de EVALUAR_FORMA_NORMAL
+    a partir de un cuestionario guiado, y evalúa 1FN / 2FN / 3FN
+    usando la misma lógica teórica. Todo (escrituras + lectura del
+    estado final) corre en una única transacción de escritura.
+    """
+    prep = _preparar_guiado(payload)
+    if not prep.get("ok"):
+        return prep
+
+    consulta_estado = _consulta_estado_fn(prep["esquema"], None)
+    rows = get_grafo().escribir_guiado([prep["item"]], consulta_estado)
+
+    return _armar_guiado_y_cachear(prep, rows, consulta_estado[1])
+
+# ==========================
+# Evaluación guiada en lote
+# ==========================
+
+GUIADO_CHUNK_SIZE = int(os.getenv("GUIADO_CHUNK_SIZE", "500"))
+
+def _preparar_lote(payloads: List[Dict[str, Any]]):
+    """Prepara todos los payloads en una pasada.
+
+    Devuelve (resultados por posición, items a escribir sin duplicados).
+    Si un esquema aparece más de una vez, gana la última aparición.
+    """
+    resultados: List[Dict[str, Any]] = []
+    items: Dict[str, Dict[str, Any]] = {}
+    for i, payload in enumerate(payloads):
+        prep = _preparar_guiado(payload if isinstance(payload, dict) else {})
+        if not prep.get("ok"):
+            resultados.append({"indice": i, "ok": False, "error": prep.get("error")})
+            continue
+        items[prep["esquema"]] = prep["item"]
+        resultados.append({
+            "indice": i,
+            "ok": True,
+            "esquema": prep["esquema"],
+            "ev_id": prep["ev_id"],
+            "evaluacion_resumen": prep["resumen"],
         })
+    return resultados, list(items.values())
 
-    # ----- 3FN -----
-    if ok3:
-        query_3fn = """
-        MATCH (es:Esquema {name:$esquema}),
-              (fn:FrameClass {name:'3FN'}),
-              (ev:EVALUAR_FORMA_NORMAL {id:$evId})
-        MERGE (es)-[r:CUMPLE]->(fn)
-        SET r.transitivas = 0
-        """
-        _run_cypher(query_3fn, {"esquema": nombre, "evId": ev_id})
-    else:
-        query_3fn = """
-        MATCH (es:Esquema {name:$esquema}),
-              (fn:FrameClass {name:'3FN'}),
-              (ev:EVALUAR_FORMA_NORMAL {id:$evId})
-        MERGE (es)-[r:NO_CUMPLE]->(fn)
-        SET r.motivo = 'Tiene dependencias transitivas',
-            r.transitivas = ev.cant_df_transitivas
-        """
-        _run_cypher(query_3fn, {"esquema": nombre, "evId": ev_id})
+def _armar_lote(resultados, items, chunks: int, chunk_size: int,
+                t_inicio: float, t_preparado: float, t_fin: float) -> Dict[str, Any]:
+    return {
+        "ok": True,
+        "total": len(resultados),
+        "escritos": len(items),
+        "con_error": sum(1 for r in resultados if not r["ok"]),
+        "chunk_size": chunk_size,
+        "chunks": chunks,
+        "tiempos_ms": {
+            "preparar": round((t_preparado - t_inicio) * 1000, 2),
+            "escribir": round((t_fin - t_preparado) * 1000, 2),
+            "total": round((t_fin - t_inicio) * 1000, 2),
+        },
+        "resultados": resultados,
+    }
 
-    # ================================
-    # 4) Resumen + consulta del estado usando la tool existente
-    # ================================
-    resumen = {
-        "esquema": nombre,
-        "cumple_1fn": ok1,
-        "cumple_2fn": ok2,
-        "cumple_3fn": ok3,
+def crear_esquemas_guiados_y_evaluar(payloads: List[Dict[str, Any]],
+                                     chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """Versión en lote de crear_esquema_guiado_y_evaluar.
+
+    Calcula los flags 1FN/2FN/3FN de todos los esquemas en Python y los
+    escribe con Q_GUIADO_ESCRIBIR en transacciones de `chunk_size` esquemas.
+    """
+    chunk_size = max(1, _coerce_int(chunk_size, GUIADO_CHUNK_SIZE))
+    t_inicio = time.perf_counter()
+    resultados, items = _preparar_lote(payloads)
+    t_preparado = time.perf_counter()
+
+    chunks = 0
+    grafo = get_grafo()
+    for i in range(0, len(items), chunk_size):
+        grafo.escribir_guiado(items[i:i + chunk_size])
+        invalidar_estado_fn(*(it["esquema"] for it in items[i:i + chunk_size]))
+        _aplicar_instantanea(items[i:i + chunk_size])
+        registrar_nombres(*(it["esquema"] for it in items[i:i + chunk_size]))
+        chunks += 1
+
+    return _armar_lote(resultados, items, chunks, chunk_size,
+                       t_inicio, t_preparado, time.perf_counter())
+
+
+# ==========================
+# Listado de esquemas (paginado por cursor)
+# ==========================
+# Paginación por clave (keyset): cada página arranca en el primer nombre
+# mayor que el último de la anterior, con el rango resuelto por el índice
+# único de Esquema.name. Ir a la página 1000 cuesta lo mismo que ir a la 1
+# (SKIP tendría que recorrer todas las anteriores) y los esquemas que se
+# agregan o borran mientras tanto no corren los cortes de página.
+
+LISTAR_LIMITE = int(os.getenv("LISTAR_LIMITE", "20"))
+LISTAR_LIMITE_MAX = int(os.getenv("LISTAR_LIMITE_MAX", "200"))
+_ESTADOS_LISTAR = ("CUMPLE", "NO_CUMPLE", "SIN_EVALUAR")
+
+# Los conteos van en comprensiones de patrones (sin agregación) para no
+# perder el orden del índice entre el MATCH y el LIMIT
+Q_ESQUEMAS_LISTAR = """
+MATCH (es:Esquema)
+WHERE es.name > $despues
+WITH es,
+     size([(es)-[:TIENE]->(a:Atributo) | a]) AS n_atributos,
+     size([(es)-[:TIENE]->(a:Atributo) WHERE a.es_pk | a]) AS n_pk,
+     [(es)-[rel:CUMPLE|NO_CUMPLE]->(fn:FrameClass) WHERE fn.name IN ['1FN','2FN','3FN']
+      | [fn.name, type(rel)]] AS estados
+WHERE ($min_atributos IS NULL OR n_atributos >= $min_atributos)
+  AND ($max_atributos IS NULL OR n_atributos <= $max_atributos)
+  AND ($pk_compuesta IS NULL OR (n_pk > 1) = $pk_compuesta)
+  AND ($estado IS NULL OR CASE
+        WHEN $fn IS NOT NULL
+          THEN coalesce(head([e IN estados WHERE e[0] = $fn | e[1]]), 'SIN_EVALUAR') = $estado
+        WHEN $estado = 'SIN_EVALUAR' THEN size(estados) = 0
+        ELSE any(e IN estados WHERE e[1] = $estado)
+      END)
+RETURN es.name AS esquema, n_atributos, n_pk > 1 AS pk_compuesta, estados
+ORDER BY es.name
+LIMIT $limite
+"""
+
+def _firma_filtros(filtros: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(filtros, sort_keys=True).encode()).hexdigest()[:10]
+
+def _cursor(despues: str, filtros: Dict[str, Any]) -> str:
+    """Cursor opaco: último nombre devuelto + firma de los filtros."""
+    crudo = json.dumps({"d": despues, "f": _firma_filtros(filtros)}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+def _leer_cursor(cursor: str, filtros: Dict[str, Any]) -> str:
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        despues, firma = datos["d"], datos["f"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido.")
+    if firma != _firma_filtros(filtros):
+        raise ValueError("El cursor es de un listado con otros filtros.")
+    return despues
+
+def _coerce_bool(value: Any) -> Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    s = str(value).strip().lower()
+    if s in ("1", "true", "si", "sí", "yes"):
+        return True
+    if s in ("0", "false", "no"):
+        return False
+    return None
+
+def _consulta_listar(forma_normal: Optional[str] = None, estado: Optional[str] = None,
+                     pk_compuesta: Any = None, min_atributos: Any = None, max_atributos: Any = None,
+                     limite: Any = None, cursor: Optional[str] = None):
+    """Normaliza los filtros y arma (filtros, params); ValueError si no son válidos."""
+    fn = _norm_fn(forma_normal)
+    if fn is not None and fn not in ("1FN", "2FN", "3FN"):
+        raise ValueError(f"Forma normal no soportada para listar: {fn}.")
+    estado = str(estado).upper().strip() if estado else None
+    if estado is not None and estado not in _ESTADOS_LISTAR:
+        raise ValueError(f"Estado inválido: {estado} (CUMPLE, NO_CUMPLE o SIN_EVALUAR).")
+    if fn and not estado:
+        estado = "CUMPLE"  # "esquemas en 3FN"
+    filtros = {
+        "fn": fn,
+        "estado": estado,
+        "pk_compuesta": _coerce_bool(pk_compuesta),
+        "min_atributos": _coerce_int(min_atributos, None) if min_atributos is not None else None,
+        "max_atributos": _coerce_int(max_atributos, None) if max_atributos is not None else None,
+    }
+    limite = min(max(1, _coerce_int(limite, LISTAR_LIMITE)), LISTAR_LIMITE_MAX)
+    despues = _leer_cursor(cursor, filtros) if cursor else ""
+    # Una fila de más para saber si hay otra página sin contar el total
+    return filtros, {**filtros, "despues": despues, "limite": limite + 1}
+
+def _armar_listado(rows: List[Dict[str, Any]], filtros: Dict[str, Any], limite: int) -> Dict[str, Any]:
+    pagina = rows[:limite]
+    esquemas = [{
+        "esquema": r["esquema"],
+        "n_atributos": r["n_atributos"],
+        "pk_compuesta": r["pk_compuesta"],
+        "estados": {fn: dict(r["estados"]).get(fn, "SIN_EVALUAR") for fn in ("1FN", "2FN", "3FN")},
+    } for r in pagina]
+    hay_mas = len(rows) > limite
+    return {
+        "ok": True,
+        "filtros": {k: v for k, v in filtros.items() if v is not None},
+        "esquemas": esquemas,
+        "cantidad": len(esquemas),
+        "siguiente": _cursor(pagina[-1]["esquema"], filtros) if hay_mas and pagina else None,
     }
 
-    estado = tool_estado_fn(nombre)
+def tool_listar_esquemas(forma_normal: Optional[str] = None, estado: Optional[str] = None,
+                         pk_compuesta: Any = None, min_atributos: Any = None, max_atributos: Any = None,
+                         limite: Any = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Lista esquemas por nombre, filtrando por estado de FN, PK compuesta y
+    cantidad de atributos. `siguiente` es el cursor de la página que sigue
+    (None en la última); se pasa tal cual con los mismos filtros.
+    """
+    try:
+        filtros, params = _consulta_listar(forma_normal, estado, pk_compuesta,
+                                           min_atributos, max_atributos, limite, cursor)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    return _armar_listado(get_grafo().listar_esquemas(params), filtros, params["limite"] - 1)
+
+
+# ==========================
+# Reparación de nivel_fn / mascara_fn
+# ==========================
+
+NIVEL_FN_LOTE = int(os.getenv("NIVEL_FN_LOTE", "1000"))
+
+def reparar_nivel_fn(lote: Optional[int] = None) -> Dict[str, Any]:
+    """Recalcula nivel_fn/mascara_fn de todos los esquemas desde las aristas.
 
+    Para los esquemas escritos antes de la migración 2 o por fuera del flujo
+    guiado (setup.cypher, otro proceso). Va por lotes de `lote` esquemas en
+    orden de nombre, cada uno en su transacción: se puede correr con la app
+    en uso. Invalida el cache de estado si corrigió algo.
+    """
+    lote = max(1, _coerce_int(lote, NIVEL_FN_LOTE))
+    grafo = get_grafo()
+    t0 = time.perf_counter()
+    despues, procesados, corregidos, lotes = "", 0, 0, 0
+    while True:
+        r = grafo.reparar_nivel_fn(despues, lote)
+        lotes += 1
+        procesados += r["procesados"]
+        corregidos += r["corregidos"]
+        if r["procesados"] < lote or not r["ultimo"]:
+            break
+        despues = r["ultimo"]
+    if corregidos:
+        invalidar_estado_fn()
     return {
         "ok": True,
-        "esquema": nombre,
-        "ev_id": ev_id,
-        "evaluacion_resumen": resumen,
-        "estado_detallado": estado,
+        "procesados": procesados,
+        "corregidos": corregidos,
+        "lotes": lotes,
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
     }
 
+# ==========================
+# Exportación completa (NDJSON, ver app/exportar.py)
+# ==========================
+
+# Registros que trae el driver por viaje al servidor: el resultado se
+# consume de a tandas, sin cargar el grafo entero en memoria
+EXPORTAR_FETCH_SIZE = int(os.getenv("EXPORTAR_FETCH_SIZE", "500"))
+
+Q_EXPORTAR = """
+MATCH (es:Esquema)
+WHERE es.name > $despues
+WITH es ORDER BY es.name
+RETURN es.name AS esquema,
+       [(es)-[:TIENE]->(a:Atributo) | {nombre: a.name, es_pk: coalesce(a.es_pk, false)}] AS atributos,
+       [(es)-[:TIENE]->(x:Atributo)-[df:DF]->(y:Atributo) WHERE y.esquema = es.name
+        | {desde: x.name, hacia: y.name, determinante: df.determinante}] AS dfs,
+       [(es)-[rel:CUMPLE|NO_CUMPLE]->(fn:FrameClass) WHERE fn.name IN ['1FN','2FN','3FN']
+        | {forma_normal: fn.name, estado: type(rel), detalles: properties(rel)}] AS evaluaciones,
+       [(es)-[:TIENE]->(x:Atributo)-[:REFERENCIA]->(y:Atributo)
+        | {columna: x.name, esquema_ref: y.esquema, columna_ref: y.name}] AS referencias
+"""
 
 # ==========================
 # Dispatcher (para intents del LLM)
 # ==========================
 
+def _validar_intent(intent: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Devuelve el error a responder si al intent le faltan parámetros."""
+    if intent == "estado_fn" and not params.get("esquema"):
+        return {"ok": False, "error": "Debes indicar un esquema para consultar su estado de FN."}
+    if intent == "requisitos_fn" and not params.get("forma_normal"):
+        return {"ok": False, "error": "Debes indicar una forma normal (1FN, 2FN, 3FN) para ver sus requisitos."}
+    if intent not in ("estado_fn", "requisitos_fn", "listar_esquemas"):
+        # Intent desconocido
+        return {
+            "ok": False,
+            "error": f"Intent no soportado: {intent}",
+        }
+    return None
+
+_PARAMS_LISTAR = ("forma_normal", "estado", "pk_compuesta", "min_atributos", "max_atributos", "limite", "cursor")
+
+def _params_listar(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: params.get(k) for k in _PARAMS_LISTAR}
+
 def dispatch(intent: str, params: Dict[str, Any]) -> Dict[str, Any]:
     """Recibe el intent del router y llama a la tool adecuada."""
     intent = intent or ""
     intent = intent.strip()
 
+    error = _validar_intent(intent, params)
+    if error:
+        return error
+
     if intent == "estado_fn":
-        esquema = params.get("esquema")
-        forma_normal = params.get("forma_normal")
-        if not esquema:
-            return {"ok": False, "error": "Debes indicar un esquema para consultar su estado de FN."}
-        data = tool_estado_fn(esquema=esquema, forma_normal=forma_normal)
-        data["intent"] = intent
-        return data
+        data = tool_estado_fn(esquema=params.get("esquema"), forma_normal=params.get("forma_normal"))
+    elif intent == "listar_esquemas":
+        data = tool_listar_esquemas(**_params_listar(params))
+    else:
+        data = tool_requisitos_fn(forma_normal=params.get("forma_normal"), esquema=params.get("esquema"))
+    data["intent"] = intent
+    return data
 
-    if intent == "requisitos_fn":
-        forma_normal = params.get("forma_normal")
-        esquema = params.get("esquema")
-        if not forma_normal:
-            return {"ok": False, "error": "Debes indicar una forma normal (1FN, 2FN, 3FN) para ver sus requisitos."}
-        data = tool_requisitos_fn(forma_normal=forma_normal, esquema=esquema)
-        data["intent"] = intent
+# ==========================
+# Variantes async (endpoints FastAPI)
+# ==========================
+# Misma lógica que las tools sync, pero sobre el driver async: mientras una
+# consulta espera a Neo4j, el event loop atiende otros requests.
+
+async def tool_estado_fn_async(esquema: str, forma_normal: Optional[str] = None) -> Dict[str, Any]:
+    consulta = _consulta_estado_fn(esquema, forma_normal)
+    if consulta is None:
+        return dict(_ERROR_FALTA_ESQUEMA)
+    _, params = consulta
+    params["esquema"], resolucion = await _resolver_esquema_async(params["esquema"])
+    return _con_resolucion(await _leer_estado_fn_async(params), resolucion)
+
+async def _leer_estado_fn_async(params: Dict[str, Any]) -> Dict[str, Any]:
+    data = _leer_instantanea(params)
+    if data is not None:
         return data
+    cacheado, clave, gen = _estado_cacheado(params)
+    if cacheado is not None:
+        return cacheado
+    data = None
+    if NIVEL_FN_LECTURA and "fn" not in params:
+        data = _armar_estado_nivel(await get_grafo().nivel_fn_async(params["esquema"]), params)
+    if data is None:
+        data = _armar_estado_fn(await get_grafo().estado_fn_async(params), params)
+    _guardar_estado(clave, gen, data)
+    return data
 
-    # Intent desconocido
-    return {
-        "ok": False,
-        "error": f"Intent no soportado: {intent}",
-    }
+async def tool_requisitos_fn_async(forma_normal: str, esquema: Optional[str] = None) -> Dict[str, Any]:
+    fn = _norm_fn(forma_normal)
+    esquema = _norm_text(esquema) if esquema else None
+    resolucion = None
+    if esquema:
+        esquema, resolucion = await _resolver_esquema_async(esquema)
+    estado = await _leer_estado_fn_async(_consulta_estado_fn(esquema, fn)[1]) if esquema else None
+    propuesta = await _descomponer_async(esquema, "3FN") if _necesita_propuesta(fn, estado) else None
+    return _con_resolucion(_armar_requisitos_fn(fn, esquema, estado, propuesta), resolucion)
+
+async def tool_analizar_dependencias_async(esquema: str) -> Dict[str, Any]:
+    esquema = _norm_text(esquema)
+    if not esquema:
+        return dict(_ERROR_FALTA_ESQUEMA)
+    esquema, resolucion = await _resolver_esquema_async(esquema)
+    return _con_resolucion(_armar_dependencias(esquema, await get_grafo().dependencias_async(esquema)), resolucion)
+
+async def tool_descomponer_esquema_async(esquema: str, forma_normal: str = "3FN",
+                                        persistir: bool = False) -> Dict[str, Any]:
+    esquema = _norm_text(esquema)
+    if not esquema:
+        return dict(_ERROR_FALTA_ESQUEMA)
+    esquema, resolucion = await _resolver_esquema_async(esquema)
+    return _con_resolucion(await _descomponer_async(esquema, forma_normal, persistir), resolucion)
+
+async def _descomponer_async(esquema: str, forma_normal: str, persistir: bool = False) -> Dict[str, Any]:
+    fn = "BCNF" if str(forma_normal).upper() in ("BCNF", "FNBC") else "3FN"
+    propuesta = _armar_propuesta(esquema, await get_grafo().dependencias_async(esquema), fn)
+    if propuesta.get("ok") and persistir:
+        rows = await get_grafo().escribir_descomposicion_async(_params_descomposicion(propuesta))
+        _tras_descomposicion(propuesta, rows)
+    return propuesta
+
+async def tool_listar_esquemas_async(forma_normal: Optional[str] = None, estado: Optional[str] = None,
+                                     pk_compuesta: Any = None, min_atributos: Any = None,
+                                     max_atributos: Any = None, limite: Any = None,
+                                     cursor: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        filtros, params = _consulta_listar(forma_normal, estado, pk_compuesta,
+                                           min_atributos, max_atributos, limite, cursor)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    return _armar_listado(await get_grafo().listar_esquemas_async(params), filtros, params["limite"] - 1)
+
+async def _atx_guiado(tx, items, consulta_estado=None) -> List[Dict[str, Any]]:
+    await _correr_async(tx, Q_GUIADO_ESCRIBIR, {"esquemas": items}, "guiado_escribir")
+    if consulta_estado is None:
+        return []
+    q, params = consulta_estado
+    return await _correr_async(tx, q, params, _nombre_estado(params))
+
+async def crear_esquema_guiado_y_evaluar_async(payload: Dict[str, Any]) -> Dict[str, Any]:
+    prep = _preparar_guiado(payload)
+    if not prep.get("ok"):
+        return prep
+
+    consulta_estado = _consulta_estado_fn(prep["esquema"], None)
+    rows = await get_grafo().escribir_guiado_async([prep["item"]], consulta_estado)
+
+    return _armar_guiado_y_cachear(prep, rows, consulta_estado[1])
+
+async def crear_esquemas_guiados_y_evaluar_async(payloads: List[Dict[str, Any]],
+                                                 chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    chunk_size = max(1, _coerce_int(chunk_size, GUIADO_CHUNK_SIZE))
+    t_inicio = time.perf_counter()
+    resultados, items = _preparar_lote(payloads)
+    t_preparado = time.perf_counter()
+
+    chunks = 0
+    grafo = get_grafo()
+    for i in range(0, len(items), chunk_size):
+        await grafo.escribir_guiado_async(items[i:i + chunk_size])
+        invalidar_estado_fn(*(it["esquema"] for it in items[i:i + chunk_size]))
+        _aplicar_instantanea(items[i:i + chunk_size])
+        registrar_nombres(*(it["esquema"] for it in items[i:i + chunk_size]))
+        chunks += 1
+
+    return _armar_lote(resultados, items, chunks, chunk_size,
+                       t_inicio, t_preparado, time.perf_counter())
+
+async def dispatch_async(intent: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    intent = intent or ""
+    intent = intent.strip()
+
+    error = _validar_intent(intent, params)
+    if error:
+        return error
+
+    if intent == "estado_fn":
+        data = await tool_estado_fn_async(esquema=params.get("esquema"), forma_normal=params.get("forma_normal"))
+    elif intent == "listar_esquemas":
+        data = await tool_listar_esquemas_async(**_params_listar(params))
+    else:
+        data = await tool_requisitos_fn_async(forma_normal=params.get("forma_normal"), esquema=params.get("esquema"))
+    data["intent"] = intent
+    return data
+
+# ==========================
+# Backend del grafo
+# ==========================
+
+class GrafoNeo4j(Grafo):
+    """Backend por defecto: las consultas Cypher de este módulo sobre los
+    drivers sync/async. Las escrituras guiadas corren en una transacción
+    administrada (execute_write) junto con la lectura del estado final."""
+
+    nombre = "neo4j"
+
+    def estado_fn(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        q = Q_ESTADO_FN_UNA if "fn" in params else Q_ESTADO_FN_TODAS
+        return _run_cypher(q, params, _nombre_estado(params))
+
+    def nivel_fn(self, esquema: str) -> List[Dict[str, Any]]:
+        return _run_cypher(Q_ESTADO_FN_NIVEL, {"esquema": esquema}, "estado_fn_nivel")
+
+    def reparar_nivel_fn(self, despues: str, lote: int) -> Dict[str, Any]:
+        rows = _run_cypher(Q_NIVEL_FN_REPARAR, {"despues": despues, "lote": lote}, "nivel_fn_reparar")
+        return rows[0] if rows else {"procesados": 0, "corregidos": 0, "ultimo": None}
+
+    def dependencias(self, esquema: str) -> List[Dict[str, Any]]:
+        return _run_cypher(Q_DEPENDENCIAS, {"esquema": esquema}, "dependencias")
+
+    def escribir_guiado(self, items, consulta_estado=None) -> List[Dict[str, Any]]:
+        nombre = "guiado_escribir" if consulta_estado is not None else "lote_escribir"
+        with get_driver().session(database=NEO4J_DATABASE) as session, _medir_cypher(nombre):
+            return session.execute_write(_tx_guiado, items, consulta_estado)
+
+    def escribir_descomposicion(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return _run_cypher(Q_DESCOMPOSICION_ESCRIBIR, params, "descomposicion_escribir")
+
+    async def estado_fn_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        q = Q_ESTADO_FN_UNA if "fn" in params else Q_ESTADO_FN_TODAS
+        return await _run_cypher_async(q, params, _nombre_estado(params))
+
+    async def nivel_fn_async(self, esquema: str) -> List[Dict[str, Any]]:
+        return await _run_cypher_async(Q_ESTADO_FN_NIVEL, {"esquema": esquema}, "estado_fn_nivel")
+
+    async def dependencias_async(self, esquema: str) -> List[Dict[str, Any]]:
+        return await _run_cypher_async(Q_DEPENDENCIAS, {"esquema": esquema}, "dependencias")
+
+    async def escribir_guiado_async(self, items, consulta_estado=None) -> List[Dict[str, Any]]:
+        nombre = "guiado_escribir" if consulta_estado is not None else "lote_escribir"
+        async with get_async_driver().session(database=NEO4J_DATABASE) as session:
+            with _medir_cypher(nombre):
+                return await session.execute_write(_atx_guiado, items, consulta_estado)
+
+    async def escribir_descomposicion_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await _run_cypher_async(Q_DESCOMPOSICION_ESCRIBIR, params, "descomposicion_escribir")
+
+    def recorrer_estados_fn(self):
+        # En streaming: el recorrido completo no se arma como lista
+        with _medir_cypher("estados_recorrer"), get_driver().session(database=NEO4J_DATABASE) as session:
+            for r in session.run(Q_ESTADOS_FN_RECORRER):
+                yield r.data()
+
+    def listar_esquemas(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return _run_cypher(Q_ESQUEMAS_LISTAR, params, "esquemas_listar")
+
+    async def listar_esquemas_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await _run_cypher_async(Q_ESQUEMAS_LISTAR, params, "esquemas_listar")
+
+    def exportar(self, despues: str = ""):
+        # Generador: la sesión queda abierta mientras se consume y se cierra
+        # al terminar o si el consumidor corta (GeneratorExit)
+        with _medir_cypher("exportar"), get_driver().session(
+            database=NEO4J_DATABASE, fetch_size=EXPORTAR_FETCH_SIZE
+        ) as session:
+            for r in session.run(Q_EXPORTAR, {"despues": despues}):
+                yield r.data()
+
+    def nombres_esquemas(self):
+        with _medir_cypher("esquemas_nombres"), get_driver().session(
+            database=NEO4J_DATABASE, fetch_size=EXPORTAR_FETCH_SIZE
+        ) as session:
+            for r in session.run(Q_ESQUEMAS_NOMBRES):
+                yield r["esquema"]
+
+    def buscar_esquemas(self, texto: str, limite: int) -> List[Dict[str, Any]]:
+        consulta = _consulta_fulltext(texto)
+        if consulta:
+            try:
+                return _run_cypher(Q_ESQUEMAS_BUSCAR, {"esquema": texto, "consulta": consulta, "limite": limite},
+                                   "esquemas_buscar")
+            except ClientError:
+                pass  # sin el índice full-text (migración 3 pendiente) o consulta Lucene inválida
+        return _run_cypher(Q_ESQUEMA_EXACTO, {"esquema": texto}, "esquema_exacto")
+
+    async def buscar_esquemas_async(self, texto: str, limite: int) -> List[Dict[str, Any]]:
+        consulta = _consulta_fulltext(texto)
+        if consulta:
+            try:
+                return await _run_cypher_async(Q_ESQUEMAS_BUSCAR,
+                                               {"esquema": texto, "consulta": consulta, "limite": limite},
+                                               "esquemas_buscar")
+            except ClientError:
+                pass
+        return await _run_cypher_async(Q_ESQUEMA_EXACTO, {"esquema": texto}, "esquema_exacto")
+
+    def escribir_referencias(self, refs: List[Dict[str, Any]]) -> int:
+        rows = _run_cypher(Q_REFERENCIAS_ESCRIBIR, {"refs": refs}, "referencias_escribir")
+        return rows[0]["escritas"] if rows else 0
+
+    def cerrar(self) -> None:
+        cerrar_driver()
+
+    async def cerrar_async(self) -> None:
+        await cerrar_driver_async()
+
+
+_grafo: Optional[Grafo] = None
+
+def _crear_grafo(backend: str) -> Grafo:
+    if backend == "neo4j":
+        return GrafoNeo4j()
+    if backend == "memoria":
+        return grafo_memoria_desde_setup(_preparar_guiado)
+    raise ValueError(f"EDUDB_BACKEND desconocido: {backend!r} (neo4j | memoria)")
+
+def get_grafo() -> Grafo:
+    """Backend configurado en EDUDB_BACKEND (singleton perezoso)."""
+    global _grafo
+    if _grafo is None:
+        with _driver_lock:
+            if _grafo is None:
+                _grafo = _crear_grafo(EDUDB_BACKEND)
+    return _grafo
+
+def usar_grafo(grafo: Optional[Grafo]) -> None:
+    """Cambia el backend en caliente (tests, benchmarks). None vuelve al de
+    EDUDB_BACKEND. Vacía el cache de estado y el índice de nombres: lo
+    cacheado era del anterior."""
+    global _grafo
+    with _driver_lock:
+        _grafo = grafo
+    invalidar_estado_fn()
+    _instantanea.vaciar()
+    _nombres.vaciar()
@@ -1,13 +1,158 @@
 # app/app.py — FastAPI + UI para EduDB (chat + evaluación guiada)
+import asyncio
+import json
+import logging
 import os
-from typing import Any, Dict
+import tempfile
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Dict, Optional
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-
-from app.llm_service import route_query
-from app.agent import dispatch, crear_esquema_guiado_y_evaluar
-
-app = FastAPI(title="Asistente EduDB · Formas Normales")
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+
+from app.llm_service import (
+    route_query_async,
+    registrar_esquemas,
+    estadisticas_ruteo,
+    ESQUEMAS_CONOCIDOS,
+    explicar_resultado_stream,
+    calentar_llm,
+    estado_circuito,
+)
+from app.agent import (
+    dispatch_async,
+    crear_esquema_guiado_y_evaluar_async,
+    crear_esquemas_guiados_y_evaluar_async,
+    tool_analizar_dependencias_async,
+    tool_descomponer_esquema_async,
+    tool_listar_esquemas_async,
+    estadisticas_cache_estado,
+    estadisticas_instantanea,
+    cargar_instantanea,
+    cargar_nombres,
+    estadisticas_nombres,
+    reparar_nivel_fn,
+    recargar_desde_grafo,
+    RESOLVER_NOMBRES,
+    INSTANTANEA_FN,
+    INSTANTANEA_RECONCILIAR_S,
+    get_driver,
+    calentar_driver_async,
+    cerrar_driver,
+    cerrar_driver_async,
+    get_grafo,
+    EDUDB_BACKEND,
+    NEO4J_DATABASE,
+)
+from app.migraciones import aplicar_migraciones
+from app.importar_sql import IMPORTAR_CHUNK_SIZE, importar_archivo
+from app.exportar import exportar_ndjson
+from app import perfilado
+from app.metricas import ERRORES_TOTAL, ETAPA_SEGUNDOS, RESPUESTAS_TOTAL, RUTAS_TOTAL, exportar
+
+MIGRAR_AL_INICIO = os.getenv("EDUDB_MIGRAR_AL_INICIO", "1") != "0"
+CALENTAR_AL_INICIO = os.getenv("EDUDB_CALENTAR_AL_INICIO", "1") != "0"
+CALENTAR_LLM = os.getenv("EDUDB_CALENTAR_LLM", "1") != "0"
+# Si un paso del arranque falla se reintenta todo, esperando ARRANQUE_ESPERA_S
+# y el doble cada vez (hasta ARRANQUE_ESPERA_MAX_S); /readyz sigue en 503
+ARRANQUE_ESPERA_S = float(os.getenv("EDUDB_ARRANQUE_ESPERA_S", "1"))
+ARRANQUE_ESPERA_MAX_S = float(os.getenv("EDUDB_ARRANQUE_ESPERA_MAX_S", "60"))
+# Tamaño máximo del body de /api/importar/sql (0 = sin límite)
+IMPORTAR_MAX_BYTES = int(os.getenv("IMPORTAR_MAX_BYTES", str(256 * 1024 * 1024)))
+
+log = logging.getLogger("edudb.app")
+
+# ==========================
+# Ciclo de vida
+# ==========================
+
+async def _arrancar(app: FastAPI) -> None:
+    """Migraciones + calentamiento. /readyz responde 200 recién cuando termina.
+    Si algo falla (p. ej. Neo4j todavía no acepta conexiones) se reintenta
+    con backoff exponencial; el último error queda en el estado."""
+    estado = app.state.arranque
+    t0 = time.perf_counter()
+    espera = ARRANQUE_ESPERA_S
+    while True:
+        estado["intentos"] = estado.get("intentos", 0) + 1
+        try:
+            await _pasos_arranque(app, estado)
+            estado["listo"] = True
+            estado.pop("error", None)
+            break
+        except Exception as e:
+            estado["error"] = f"{type(e).__name__}: {e}"
+            log.warning("Arranque incompleto (intento %d, reintento en %.0f s): %s",
+                        estado["intentos"], espera, estado["error"])
+        finally:
+            estado["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        await asyncio.sleep(espera)
+        espera = min(espera * 2, ARRANQUE_ESPERA_MAX_S)
+
+async def _pasos_arranque(app: FastAPI, estado: Dict[str, Any]) -> None:
+    if EDUDB_BACKEND != "neo4j":
+        # Backend sin base de datos: nada que migrar ni conexiones que abrir
+        grafo = await asyncio.to_thread(get_grafo)
+        estado["grafo"] = {"backend": grafo.nombre, "esquemas": len(grafo)}
+    elif MIGRAR_AL_INICIO:
+        # Crea constraints/índices pendientes (idempotente)
+        reporte = await asyncio.to_thread(aplicar_migraciones, get_driver(), NEO4J_DATABASE)
+        app.state.migraciones = reporte
+        if not reporte["ok"]:
+            log.warning("Migraciones: índices incompletos %s", reporte["verificacion"])
+        if 2 in reporte["aplicadas"]:
+            # Recién se agregó nivel_fn: completarlo en los esquemas que ya
+            # estaban (queda pendiente si este intento falla antes)
+            estado["nivel_fn"] = "pendiente"
+        if estado.get("nivel_fn") == "pendiente":
+            estado["nivel_fn"] = await asyncio.to_thread(reparar_nivel_fn)
+    # El pre-router reconoce los esquemas que existen en el grafo
+    estado["esquemas_conocidos"] = await asyncio.to_thread(_registrar_esquemas_del_grafo)
+    if INSTANTANEA_FN:
+        estado["instantanea"] = await asyncio.to_thread(cargar_instantanea)
+    if RESOLVER_NOMBRES:
+        # Índice de nombres de esquema listo antes de la primera pregunta
+        estado["nombres"] = await asyncio.to_thread(cargar_nombres)
+    if CALENTAR_AL_INICIO:
+        if EDUDB_BACKEND == "neo4j":
+            estado["neo4j"] = await calentar_driver_async()
+        if CALENTAR_LLM:
+            estado["llm"] = await calentar_llm()
+
+def _registrar_esquemas_del_grafo() -> int:
+    registrar_esquemas(get_grafo().nombres_esquemas())
+    return len(ESQUEMAS_CONOCIDOS)
+
+async def _reconciliar_instantanea() -> None:
+    """Recorrido completo cada INSTANTANEA_RECONCILIAR_S, por si otro proceso escribió."""
+    while True:
+        await asyncio.sleep(INSTANTANEA_RECONCILIAR_S)
+        try:
+            r = await asyncio.to_thread(cargar_instantanea)
+            if r["diferencias"]:
+                log.info("Instantánea reconciliada: %d esquemas corregidos", r["diferencias"])
+        except Exception as e:
+            ERRORES_TOTAL.inc("instantanea", "reconciliar")
+            log.warning("Reconciliación de la instantánea: %s: %s", type(e).__name__, e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.migraciones = None
+    app.state.arranque = {"listo": False}
+    tareas = [asyncio.create_task(_arrancar(app))]
+    if INSTANTANEA_FN and INSTANTANEA_RECONCILIAR_S > 0:
+        tareas.append(asyncio.create_task(_reconciliar_instantanea()))
+    try:
+        yield
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+            with suppress(asyncio.CancelledError):
+                await tarea
+        await cerrar_driver_async()
+        await asyncio.to_thread(cerrar_driver)
+
+app = FastAPI(title="Asistente EduDB · Formas Normales", lifespan=lifespan)
 
 INDEX_HTML = """
 <!doctype html>
@@ -149,6 +294,25 @@ Cantidad"
             </p>
           </div>
 
+          <div>
+            <label for="g-dfs" class="text-sm font-medium text-slate-700">
+              Dependencias funcionales (opcional, una por línea)
+            </label>
+            <textarea
+              id="g-dfs"
+              name="g-dfs"
+              rows="3"
+              class="mt-1 w-full rounded-lg border border-slate-300 px-3 py-2 text-sm focus:outline-none focus:ring-2 focus:ring-indigo-500 focus:border-indigo-500"
+              placeholder="Ej:
+IDProducto, IDPedido -> Cantidad
+IDProducto -> NombreProducto"
+            ></textarea>
+            <p class="mt-1 text-[11px] text-slate-500">
+              Si las cargás, el sistema calcula las claves candidatas y las dependencias parciales / transitivas
+              reales, y no usa las preguntas de abajo.
+            </p>
+          </div>
+
           <div class="border-t border-slate-200 pt-4 space-y-4">
             <p class="text-sm font-semibold text-slate-800">Preguntas sobre dependencias</p>
 
@@ -240,9 +404,20 @@ Cantidad"
     const out = document.getElementById('output');
     const statusEl = document.getElementById('status');
 
+    // Nombre de esquema resuelto por aproximación, o sugerencias si no se encontró
+    function notaResolucion(data) {
+      if (data.resolucion) {
+        return `<p class="mb-2 text-xs text-slate-500">Se interpretó "${data.esquema_pedido}" como <span class="font-mono">${data.esquema}</span> (${data.resolucion.via}, similitud ${data.resolucion.similitud}).</p>`;
+      }
+      if (Array.isArray(data.sugerencias) && data.sugerencias.length) {
+        return `<p class="mt-1 text-xs text-slate-600">¿Quisiste decir ${data.sugerencias.map(n => `<span class="font-mono">${n}</span>`).join(', ')}?</p>`;
+      }
+      return '';
+    }
+
     function renderEstadoFN(data) {
       if (!data.ok) {
-        out.innerHTML = card(`<div class="text-red-600">Error: ${data.error ?? 'Consulta inválida.'}</div>`);
+        out.innerHTML = card(`<div class="text-red-600">Error: ${data.error ?? 'Consulta inválida.'}</div>${notaResolucion(data)}`);
         return;
       }
 
@@ -260,7 +435,7 @@ Cantidad"
         }
 
         out.innerHTML = card(`
-          <div>
+          <div>${notaResolucion(data)}
             <p><span class="font-semibold">Esquema:</span> ${esquema}</p>
             <p><span class="font-semibold">Forma normal:</span> ${fn}</p>
             <p class="mt-1">
@@ -303,11 +478,15 @@ Cantidad"
           `;
         }).join('');
 
+        const nivel = data.nivel_fn == null ? '' : `
+            <p class="mb-2">
+              <span class="font-semibold">Forma normal alcanzada:</span> ${data.nivel_fn ? data.nivel_fn + 'FN' : 'ninguna (no cumple 1FN)'}
+            </p>`;
         out.innerHTML = card(`
-          <div>
+          <div>${notaResolucion(data)}
             <p class="mb-2">
               <span class="font-semibold">Esquema:</span> ${data.esquema ?? '-'}
-            </p>
+            </p>${nivel}
             <div class="space-y-2">${rowsHtml}</div>
           </div>
         `);
@@ -317,6 +496,53 @@ Cantidad"
       out.innerHTML = card(`<div class="text-slate-600">No se encontró información de formas normales para este esquema.</div>`);
     }
 
+    function filasListado(esquemas) {
+      const clase = (e) => e === 'CUMPLE' ? 'text-emerald-700' : e === 'NO_CUMPLE' ? 'text-red-700' : 'text-slate-500';
+      return esquemas.map(e => `
+        <tr class="border-t border-slate-200">
+          <td class="py-1 pr-2 font-mono">${e.esquema}</td>
+          <td class="py-1 pr-2 text-center">${e.n_atributos}</td>
+          <td class="py-1 pr-2 text-center">${e.pk_compuesta ? 'sí' : 'no'}</td>
+          ${['1FN', '2FN', '3FN'].map(fn => `<td class="py-1 pr-2 text-xs ${clase(e.estados[fn])}">${e.estados[fn]}</td>`).join('')}
+        </tr>`).join('');
+    }
+
+    function renderListado(data) {
+      if (!data.ok) {
+        out.innerHTML = card(`<div class="text-red-600">Error: ${data.error ?? 'Consulta inválida.'}</div>`);
+        return;
+      }
+      const f = data.filtros ?? {};
+      const detalle = Object.entries(f).map(([k, v]) => `${k}=${v}`).join(' · ') || 'sin filtros';
+      out.innerHTML = card(`
+        <p class="mb-2"><span class="font-semibold">Esquemas</span> <span class="text-xs text-slate-500">(${detalle})</span></p>
+        <table class="w-full text-sm">
+          <thead><tr class="text-left text-xs text-slate-500">
+            <th>Esquema</th><th class="text-center">Atributos</th><th class="text-center">PK compuesta</th><th>1FN</th><th>2FN</th><th>3FN</th>
+          </tr></thead>
+          <tbody id="listado-filas">${filasListado(data.esquemas)}</tbody>
+        </table>
+        ${data.esquemas.length ? '' : '<p class="text-slate-600">Ningún esquema cumple esos filtros.</p>'}
+        <button id="listado-mas" class="mt-2 text-xs text-indigo-700 hover:underline ${data.siguiente ? '' : 'hidden'}">Ver más</button>
+      `);
+      let siguiente = data.siguiente;
+      const mas = document.getElementById('listado-mas');
+      mas.addEventListener('click', async () => {
+        const q = new URLSearchParams({ cursor: siguiente });
+        if (f.fn) q.set('forma_normal', f.fn);
+        for (const k of ['estado', 'pk_compuesta', 'min_atributos', 'max_atributos']) {
+          if (f[k] !== undefined) q.set(k, f[k]);
+        }
+        mas.disabled = true;
+        const pagina = await (await fetch(`/api/esquemas?${q}`)).json();
+        mas.disabled = false;
+        if (!pagina.ok) return;
+        document.getElementById('listado-filas').insertAdjacentHTML('beforeend', filasListado(pagina.esquemas));
+        siguiente = pagina.siguiente;
+        if (!siguiente) mas.classList.add('hidden');
+      });
+    }
+
     function renderRequisitosFN(data) {
       if (!data.ok) {
         out.innerHTML = card(`<div class="text-red-600">Error: ${data.error ?? 'Consulta inválida.'}</div>`);
@@ -338,6 +564,7 @@ Cantidad"
         html += `
           <hr class="my-3 border-slate-200" />
           <p class="font-semibold">Aplicado al esquema: ${esquema}</p>
+          ${notaResolucion(data)}
         `;
         if (estado) {
           const est = estado.estado ?? 'SIN_EVALUAR';
@@ -360,6 +587,17 @@ Cantidad"
         }
       }
 
+      const propuesta = data.propuesta_descomposicion ?? null;
+      if (propuesta && Array.isArray(propuesta.esquemas)) {
+        const items = propuesta.esquemas.map(sub =>
+          `<li><span class="font-mono">${sub.nombre}(${sub.atributos.map(a => sub.clave.includes(a) ? `<u>${a}</u>` : a).join(', ')})</span></li>`
+        ).join('');
+        html += `
+          <p class="mt-2 text-sm font-semibold text-slate-700">Descomposición propuesta (${propuesta.forma_normal}):</p>
+          <ul class="mt-1 text-sm text-slate-700 list-disc list-inside">${items}</ul>
+        `;
+      }
+
       out.innerHTML = card(html);
     }
 
@@ -383,43 +621,95 @@ Cantidad"
       statusEl.textContent = "Consultando...";
       out.innerHTML = "";
 
+      let errorExplicacion = false;
       try {
-        const res = await fetch("/api/query", {
+        const res = await fetch("/api/query/stream", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ query: text })
         });
 
-        const data = await res.json();
-
-        if (!res.ok) {
+        if (!res.ok || !res.body) {
+          const data = await res.json().catch(() => ({}));
           out.innerHTML = card(`<div class="text-red-600">Error: ${data.error ?? 'Ocurrió un error en el servidor.'}</div>`);
           return;
         }
 
-        const intent = data.intent ?? "desconocido";
-
-        if (intent === "estado_fn") {
-          renderEstadoFN(data);
-        } else if (intent === "requisitos_fn") {
-          renderRequisitosFN(data);
-        } else {
-          renderDesconocido(data);
-        }
+        await leerEventos(res.body, {
+          ruta(data) {
+            const p = data.params ?? {};
+            const detalle = [p.esquema, p.forma_normal].filter(Boolean).join(' · ');
+            statusEl.textContent = `Intención: ${data.intent}${detalle ? ' (' + detalle + ')' : ''} · consultando el grafo...`;
+          },
+          resultado(data) {
+            const intent = data.intent ?? "desconocido";
+            if (intent === "estado_fn") {
+              renderEstadoFN(data);
+            } else if (intent === "requisitos_fn") {
+              renderRequisitosFN(data);
+            } else if (intent === "listar_esquemas") {
+              renderListado(data);
+            } else {
+              renderDesconocido(data);
+            }
+            if (data.degradado) {
+              out.insertAdjacentHTML('afterbegin', `<p class="mb-2 text-xs text-amber-700">Modo degradado: el modelo no está disponible y la consulta se interpretó por palabras clave.</p>`);
+            }
+            statusEl.textContent = "";
+          },
+          explicacion(data) {
+            let box = document.getElementById('explicacion');
+            if (!box) {
+              box = document.createElement('div');
+              box.id = 'explicacion';
+              box.className = 'mt-3 text-sm text-slate-700 whitespace-pre-wrap';
+              out.appendChild(box);
+            }
+            box.textContent += data.t;
+          },
+          error(data) {
+            errorExplicacion = true;
+            statusEl.textContent = `No se pudo generar la explicación: ${data.error}`;
+          },
+        });
       } catch (err) {
         out.innerHTML = card(`<div class="text-red-600">Error de red o servidor.</div>`);
       } finally {
         btn.disabled = false;
-        statusEl.textContent = "";
+        if (!errorExplicacion) statusEl.textContent = "";
       }
     });
 
+    // Lee un cuerpo text/event-stream y llama al handler de cada evento
+    async function leerEventos(body, handlers) {
+      const reader = body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let corte;
+        while ((corte = buffer.indexOf("\\n\\n")) >= 0) {
+          const bloque = buffer.slice(0, corte);
+          buffer = buffer.slice(corte + 2);
+          let evento = "message", datos = "";
+          for (const linea of bloque.split("\\n")) {
+            if (linea.startsWith("event: ")) evento = linea.slice(7);
+            else if (linea.startsWith("data: ")) datos += linea.slice(6);
+          }
+          if (handlers[evento] && datos) handlers[evento](JSON.parse(datos));
+        }
+      }
+    }
+
     // =======================
     // Lado Evaluación guiada
     // =======================
     const gForm = document.getElementById('guided-form');
     const gEsquema = document.getElementById('g-esquema');
     const gAtributos = document.getElementById('g-atributos');
+    const gDfs = document.getElementById('g-dfs');
     const gParcialesCant = document.getElementById('g-parciales-cant');
     const gTransitivasCant = document.getElementById('g-transitivas-cant');
     const gBtn = document.getElementById('g-submit-btn');
@@ -448,6 +738,24 @@ Cantidad"
       return attrs;
     }
 
+    function parseDependencias(text) {
+      const dfs = [];
+      for (let line of text.split(/\\r?\\n/)) {
+        line = line.trim();
+        if (!line || !line.includes("->")) continue;
+        const [izq, der] = line.split("->");
+        const determinante = izq.split(",").map(x => x.trim()).filter(Boolean);
+        const dependientes = der.split(",").map(x => x.trim()).filter(Boolean);
+        if (dependientes.length) dfs.push({ determinante, dependientes });
+      }
+      return dfs;
+    }
+
+    function listaDFs(dfs) {
+      if (!dfs || !dfs.length) return '<span class="text-slate-500">ninguna</span>';
+      return dfs.map(d => `<span class="font-mono">${d.determinante.join(', ')} → ${d.dependiente}</span>`).join('; ');
+    }
+
     function renderGuiadoResultado(data) {
       if (!data.ok) {
         gOut.innerHTML = card(`<div class="text-red-600">Error: ${data.error ?? 'Error al evaluar el esquema.'}</div>`);
@@ -475,6 +783,20 @@ Cantidad"
         `;
       }
 
+      const analisis = data.analisis_dependencias ?? null;
+      if (analisis) {
+        const claves = analisis.claves_candidatas.map(k => `<span class="font-mono">{${k.join(', ')}}</span>`).join(', ');
+        html += `
+          <hr class="my-3 border-slate-200" />
+          <p class="text-sm font-semibold text-slate-800">Análisis de dependencias funcionales:</p>
+          <div class="mt-1 text-xs space-y-1">
+            <p><span class="font-semibold">Claves candidatas:</span> ${claves}</p>
+            <p><span class="font-semibold">Parciales:</span> ${listaDFs(analisis.dependencias_parciales)}</p>
+            <p><span class="font-semibold">Transitivas:</span> ${listaDFs(analisis.dependencias_transitivas)}</p>
+          </div>
+        `;
+      }
+
       if (estadoDet && estadoDet.ok && Array.isArray(estadoDet.resultados)) {
         const rows = estadoDet.resultados.map(r => {
           const fn = r.forma_normal ?? '-';
@@ -543,6 +865,9 @@ Cantidad"
         cant_df_transitivas: transCant || null
       };
 
+      const dependencias = parseDependencias(gDfs.value);
+      if (dependencias.length) payload.dependencias = dependencias;
+
       gBtn.disabled = true;
       gStatus.textContent = "Creando esquema y evaluando...";
       gOut.innerHTML = "";
@@ -575,35 +900,272 @@ Cantidad"
 </html>
 """
 
+@app.get("/readyz")
+async def readyz() -> JSONResponse:
+    """200 cuando las migraciones y el calentamiento terminaron; 503 mientras tanto."""
+    estado = app.state.arranque
+    return JSONResponse(estado, status_code=200 if estado.get("listo") else 503)
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request) -> HTMLResponse:
     return HTMLResponse(INDEX_HTML)
 
 
+async def _rutear(text: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    routed = await route_query_async(text)
+    intent = routed.get("intent")
+    ETAPA_SEGUNDOS.observar(time.perf_counter() - t0, "ruteo", intent)
+    RUTAS_TOTAL.inc(routed.get("via"), intent)
+    return routed
+
+async def _despachar(intent: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        result = await dispatch_async(intent, params)
+    except Exception:
+        ERRORES_TOTAL.inc("dispatch", intent)
+        raise
+    finally:
+        ETAPA_SEGUNDOS.observar(time.perf_counter() - t0, "dispatch", intent)
+    RESPUESTAS_TOTAL.inc(intent, "true" if result.get("ok") else "false")
+    return result
+
 @app.post("/api/query")
 async def api_query(payload: Dict[str, Any]) -> JSONResponse:
     text = payload.get("query")
     if not text or not isinstance(text, str):
         return JSONResponse({"error": "Falta 'query'."}, status_code=400)
 
-    routed = route_query(text)
+    t0 = time.perf_counter()
+    routed = await _rutear(text)
     intent = routed.get("intent")
     params = routed.get("params", {})
 
-    result = dispatch(intent, params)
+    result = await _despachar(intent, params)
     result["intent"] = intent
+    result["via"] = routed.get("via")
+    result["degradado"] = routed.get("degradado", False)
+    ETAPA_SEGUNDOS.observar(time.perf_counter() - t0, "total", intent)
+    return JSONResponse(result)
+
+def _sse(evento: str, data: Dict[str, Any]) -> str:
+    return f"event: {evento}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def _eventos_query(text: str) -> AsyncIterator[str]:
+    t0 = time.perf_counter()
+
+    def ms() -> float:
+        return round((time.perf_counter() - t0) * 1000, 1)
+
+    routed = await _rutear(text)
+    intent = routed.get("intent")
+    params = routed.get("params", {})
+    degradado = routed.get("degradado", False)
+    yield _sse("ruta", {"intent": intent, "params": params, "via": routed.get("via"),
+                        "degradado": degradado, "ms": ms()})
+
+    result = await _despachar(intent, params)
+    result["intent"] = intent
+    result["via"] = routed.get("via")
+    result["degradado"] = degradado
+    yield _sse("resultado", {**result, "ms": ms()})
+
+    try:
+        async for token in explicar_resultado_stream(text, intent, result):
+            yield _sse("explicacion", {"t": token})
+    except Exception as e:
+        # La explicación es opcional: el resultado ya se entregó
+        yield _sse("error", {"etapa": "explicacion", "error": str(e)})
+
+    yield _sse("fin", {"ms": ms()})
+
+@app.post("/api/query/stream")
+async def api_query_stream(payload: Dict[str, Any]):
+    """Variante de /api/query con Server-Sent Events.
+
+    Eventos, en orden: ruta (intent + params), resultado (respuesta del
+    grafo), explicacion (tokens del LLM, cero o más) y fin.
+    """
+    text = payload.get("query")
+    if not text or not isinstance(text, str):
+        return JSONResponse({"error": "Falta 'query'."}, status_code=400)
+
+    return StreamingResponse(
+        _eventos_query(text),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/ruteo/stats")
+async def api_ruteo_stats() -> JSONResponse:
+    """Proporción de consultas resueltas por reglas vs. por el LLM."""
+    return JSONResponse(estadisticas_ruteo())
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Métricas en formato texto de Prometheus."""
+    return PlainTextResponse(exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/cypher/perfil")
+async def api_cypher_perfil(top: int = 20) -> JSONResponse:
+    """Stats por huella de consulta Cypher y últimas consultas lentas (CYPHER_PERFILADO=1)."""
+    return JSONResponse(perfilado.informe(top))
+
+@app.get("/api/llm/circuito")
+async def api_llm_circuito() -> JSONResponse:
+    """Estado del circuit breaker del LLM (para alertas)."""
+    return JSONResponse(estado_circuito())
+
+@app.get("/api/cache/stats")
+async def api_cache_stats() -> JSONResponse:
+    """Tamaño, hits/misses y desalojos de los caches en proceso."""
+    return JSONResponse({
+        "rutas": estadisticas_ruteo()["cache_rutas"],
+        "estado_fn": estadisticas_cache_estado(),
+        "nombres": estadisticas_nombres(),
+    })
+
+@app.get("/api/instantanea/stats")
+async def api_instantanea_stats() -> JSONResponse:
+    """Tamaño, memoria, hits y antigüedad de la instantánea de estados FN."""
+    return JSONResponse(estadisticas_instantanea())
+
+@app.post("/api/instantanea/reconciliar")
+async def api_instantanea_reconciliar() -> JSONResponse:
+    """Fuerza un recorrido completo (p. ej. después de cargar datos por fuera de la app)."""
+    if not INSTANTANEA_FN:
+        return JSONResponse({"ok": False, "error": "La instantánea está desactivada (INSTANTANEA_FN=0)."},
+                            status_code=409)
+    return JSONResponse({"ok": True, **await asyncio.to_thread(cargar_instantanea)})
+
+@app.post("/api/nombres/recargar")
+async def api_nombres_recargar() -> JSONResponse:
+    """Completa el índice de nombres de esquema con un recorrido del grafo
+    (p. ej. después de cargar esquemas desde otro proceso)."""
+    return JSONResponse({"ok": True, **await asyncio.to_thread(cargar_nombres)})
+
+@app.post("/api/recargar")
+async def api_recargar() -> JSONResponse:
+    """Vacía el cache de estado y vuelve a leer la instantánea y el índice de
+    nombres (después de escribir el grafo desde otro proceso, p. ej. la CLI
+    de importación con --avisar)."""
+    result = await asyncio.to_thread(recargar_desde_grafo)
+    result["esquemas_conocidos"] = await asyncio.to_thread(_registrar_esquemas_del_grafo)
     return JSONResponse(result)
 
+@app.post("/api/nivel-fn/reparar")
+async def api_nivel_fn_reparar(lote: Optional[int] = None) -> JSONResponse:
+    """Recalcula Esquema.nivel_fn / mascara_fn de todo el grafo desde las aristas."""
+    return JSONResponse(await asyncio.to_thread(reparar_nivel_fn, lote))
+
 @app.post("/api/guiado/evaluar-esquema")
 async def api_guiado_evaluar(payload: Dict[str, Any]) -> JSONResponse:
     """
     Endpoint para el flujo guiado: crea un esquema + evaluación
     a partir de un cuestionario, y devuelve un resumen.
     """
-    result = crear_esquema_guiado_y_evaluar(payload)
+    result = await crear_esquema_guiado_y_evaluar_async(payload)
+    if result.get("ok"):
+        registrar_esquemas([result["esquema"]])
     status = 200 if result.get("ok") else 400
     return JSONResponse(result, status_code=status)
 
+@app.post("/api/guiado/evaluar-esquemas")
+async def api_guiado_evaluar_lote(payload: Dict[str, Any]) -> JSONResponse:
+    """
+    Versión en lote del flujo guiado: recibe {"esquemas": [...], "chunk_size": n}
+    con el mismo formato por esquema que /api/guiado/evaluar-esquema.
+    """
+    esquemas = payload.get("esquemas")
+    if not isinstance(esquemas, list) or not esquemas:
+        return JSONResponse({"ok": False, "error": "Falta la lista 'esquemas'."}, status_code=400)
+
+    result = await crear_esquemas_guiados_y_evaluar_async(esquemas, payload.get("chunk_size"))
+    registrar_esquemas(r["esquema"] for r in result["resultados"] if r["ok"])
+    return JSONResponse(result)
+
+@app.post("/api/importar/sql")
+async def api_importar_sql(request: Request, chunk_size: int = IMPORTAR_CHUNK_SIZE) -> JSONResponse:
+    """
+    Importa las tablas de un dump SQL enviado como body crudo (CREATE TABLE /
+    ALTER TABLE; el resto se ignora). El body se vuelca a un archivo temporal
+    mientras llega (hasta IMPORTAR_MAX_BYTES) y se importa en streaming en un
+    hilo aparte; la escritura a disco tampoco bloquea el event loop.
+    """
+    largo = request.headers.get("content-length")
+    if IMPORTAR_MAX_BYTES and largo and largo.isdigit() and int(largo) > IMPORTAR_MAX_BYTES:
+        return JSONResponse(_error_tamano(), status_code=413)
+    with tempfile.TemporaryDirectory(prefix="edudb-importar-") as carpeta:
+        ruta = os.path.join(carpeta, "dump.sql")
+        f = await asyncio.to_thread(open, ruta, "wb")
+        try:
+            recibidos = 0
+            async for bloque in request.stream():
+                recibidos += len(bloque)
+                if IMPORTAR_MAX_BYTES and recibidos > IMPORTAR_MAX_BYTES:
+                    return JSONResponse(_error_tamano(), status_code=413)
+                await asyncio.to_thread(f.write, bloque)
+        finally:
+            await asyncio.to_thread(f.close)
+        result = await asyncio.to_thread(
+            importar_archivo, ruta, chunk_size=chunk_size, al_escribir=registrar_esquemas,
+        )
+    return JSONResponse(result)
+
+def _error_tamano() -> Dict[str, Any]:
+    return {"ok": False, "error": f"El dump supera IMPORTAR_MAX_BYTES ({IMPORTAR_MAX_BYTES} bytes)."}
+
+@app.get("/api/esquemas")
+async def api_listar_esquemas(forma_normal: Optional[str] = None, estado: Optional[str] = None,
+                              pk_compuesta: Optional[bool] = None, min_atributos: Optional[int] = None,
+                              max_atributos: Optional[int] = None, limite: Optional[int] = None,
+                              cursor: Optional[str] = None) -> JSONResponse:
+    """
+    Lista esquemas ordenados por nombre, con filtros opcionales. Para la
+    página siguiente se repiten los filtros y se pasa `cursor` = `siguiente`.
+    Ej.: /api/esquemas?forma_normal=3FN&estado=NO_CUMPLE&limite=50
+    """
+    result = await tool_listar_esquemas_async(forma_normal, estado, pk_compuesta,
+                                              min_atributos, max_atributos, limite, cursor)
+    return JSONResponse(result, status_code=200 if result.get("ok") else 400)
+
+@app.get("/api/exportar")
+async def api_exportar(cursor: Optional[str] = None):
+    """
+    Todos los esquemas con atributos, DF y evaluaciones, una línea NDJSON por
+    esquema, en streaming. Si la descarga se corta, se reanuda pasando el
+    `cursor` de la última línea recibida.
+    """
+    try:
+        lineas = exportar_ndjson(cursor)
+    except ValueError as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+    # Generador sync: Starlette lo consume en el threadpool
+    return StreamingResponse(lineas, media_type="application/x-ndjson")
+
+@app.get("/api/esquemas/{esquema}/dependencias")
+async def api_dependencias(esquema: str) -> JSONResponse:
+    """Claves candidatas, atributos primos y DF parciales/transitivas de un esquema."""
+    result = await tool_analizar_dependencias_async(esquema)
+    return JSONResponse(result, status_code=200 if result.get("ok") else 404)
+
+@app.post("/api/esquemas/{esquema}/descomponer")
+async def api_descomponer(esquema: str, payload: Dict[str, Any]) -> JSONResponse:
+    """
+    Propone (y opcionalmente escribe en el grafo) la descomposición del esquema.
+    Body: {"forma_normal": "3FN" | "BCNF", "persistir": false}
+    """
+    result = await tool_descomponer_esquema_async(
+        esquema,
+        payload.get("forma_normal") or "3FN",
+        persistir=bool(payload.get("persistir", False)),
+    )
+    if result.get("ok") and result.get("persistido"):
+        registrar_esquemas(sub["nombre"] for sub in result["esquemas"])
+    return JSONResponse(result, status_code=200 if result.get("ok") else 400)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("PORT", "8000")))
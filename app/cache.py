@@ -0,0 +1,86 @@
+# app/cache.py — cache LRU acotado con TTL (en proceso, thread-safe)
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_FALTA = object()
+
+
+class LRUCache:
+    """Cache en memoria con desalojo LRU, vencimiento por TTL y contadores.
+
+    - maxsize: cantidad máxima de entradas (al superarla se desaloja la menos usada).
+    - ttl: segundos de vida de cada entrada (None = no vencen).
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: Optional[float] = None) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.desalojos = 0
+        self.vencidos = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _FALTA)
+            if item is _FALTA:
+                self.misses += 1
+                return default
+            expira, valor = item
+            if expira and expira < time.monotonic():
+                del self._data[key]
+                self.vencidos += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key: Hashable, valor: Any) -> None:
+        expira = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._data[key] = (expira, valor)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, key: Hashable = _FALTA) -> int:
+        """Borra una clave, o todo el cache si no se indica ninguna.
+
+        Devuelve la cantidad de entradas eliminadas.
+        """
+        with self._lock:
+            if key is _FALTA:
+                n = len(self._data)
+                self._data.clear()
+                return n
+            return 1 if self._data.pop(key, _FALTA) is not _FALTA else 0
+
+    def invalidar_si(self, pred: Callable[[Hashable], bool]) -> int:
+        """Borra todas las claves para las que pred(clave) es verdadero."""
+        with self._lock:
+            claves = [k for k in self._data if pred(k)]
+            for k in claves:
+                del self._data[k]
+            return len(claves)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "tamano": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "desalojos": self.desalojos,
+            "vencidos": self.vencidos,
+        }
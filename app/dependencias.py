@@ -0,0 +1,431 @@
+# app/dependencias.py — motor de dependencias funcionales (cierres, claves, 2FN/3FN/BCNF)
+#
+# Los conjuntos de atributos se representan como bitsets (int de Python):
+# el bit i corresponde a atributos[i]. Unión = |, intersección = &,
+# inclusión = (a & b) == a. Esto permite manejar esquemas de 30–60
+# atributos y cientos de DFs sin crear sets en los bucles calientes.
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DF = Tuple[Iterable[str], Iterable[str]]  # (determinante, dependientes)
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+class EsquemaDF:
+    """Un esquema relacional (atributos + DFs) listo para razonar sobre él.
+
+    Las DFs se guardan como pares (lhs, rhs) de bitsets. Para el cierre se
+    mantiene un índice atributo → DFs cuyo determinante lo contiene, así el
+    cálculo es lineal en el tamaño total de las DFs (algoritmo LINCLOSURE).
+    """
+
+    def __init__(self, atributos: Sequence[str], dfs: Iterable[DF] = ()) -> None:
+        self.atributos: List[str] = []
+        self._pos: Dict[str, int] = {}
+        for a in atributos:
+            self._agregar_atributo(a)
+        self.dfs: List[Tuple[int, int]] = []
+        for lhs, rhs in dfs:
+            self.agregar_df(lhs, rhs)
+
+    # ---------- construcción ----------
+
+    def _agregar_atributo(self, nombre: str) -> int:
+        if nombre not in self._pos:
+            self._pos[nombre] = len(self.atributos)
+            self.atributos.append(nombre)
+        return self._pos[nombre]
+
+    def agregar_df(self, lhs: Iterable[str], rhs: Iterable[str]) -> None:
+        # Los atributos que aparecen solo en DFs se agregan al esquema
+        l = 0
+        for a in lhs:
+            l |= 1 << self._agregar_atributo(a)
+        r = 0
+        for a in rhs:
+            r |= 1 << self._agregar_atributo(a)
+        r &= ~l  # la parte trivial no aporta nada
+        if r:
+            self.dfs.append((l, r))
+        self._indice = None
+
+    @property
+    def todos(self) -> int:
+        return (1 << len(self.atributos)) - 1
+
+    def mascara(self, nombres: Iterable[str]) -> int:
+        m = 0
+        for n in nombres:
+            m |= 1 << self._pos[n]
+        return m
+
+    def nombres(self, mask: int) -> List[str]:
+        return [self.atributos[i] for i in _bits(mask)]
+
+    # ---------- cierre ----------
+
+    def _construir_indice(self) -> None:
+        indice: List[List[int]] = [[] for _ in self.atributos]
+        for j, (lhs, _) in enumerate(self.dfs):
+            for i in _bits(lhs):
+                indice[i].append(j)
+        self._indice = indice
+        self._tam_lhs = [popcount(lhs) for lhs, _ in self.dfs]
+        self._vacias = [j for j, n in enumerate(self._tam_lhs) if n == 0]
+
+    def cierre(self, mask: int, excluir: Optional[int] = None, objetivo: int = 0) -> int:
+        """Cierre de `mask` bajo las DFs (opcionalmente ignorando la DF `excluir`).
+
+        Si se indica `objetivo`, corta apenas el cierre lo contiene: alcanza
+        para preguntas del tipo "¿A ∈ X+?" y evita recorrer el resto.
+        """
+        if getattr(self, "_indice", None) is None:
+            self._construir_indice()
+        faltan = self._tam_lhs.copy()
+        dfs = self.dfs
+        indice = self._indice
+        resultado = mask
+        pendientes = list(_bits(mask))
+        # DFs con determinante vacío (∅ → Y) aplican siempre
+        for j in self._vacias:
+            if j != excluir:
+                nuevos = dfs[j][1] & ~resultado
+                resultado |= nuevos
+                pendientes.extend(_bits(nuevos))
+        while pendientes:
+            i = pendientes.pop()
+            for j in indice[i]:
+                faltan[j] -= 1
+                if faltan[j] == 0 and j != excluir:
+                    nuevos = dfs[j][1] & ~resultado
+                    if nuevos:
+                        resultado |= nuevos
+                        if objetivo and (resultado & objetivo) == objetivo:
+                            return resultado
+                        pendientes.extend(_bits(nuevos))
+        return resultado
+
+    def es_superclave(self, mask: int) -> bool:
+        return self.cierre(mask) == self.todos
+
+    # ---------- claves candidatas ----------
+
+    def _minimizar(self, mask: int, obligatorios: int) -> int:
+        # Saca atributos mientras siga siendo superclave. Los obligatorios
+        # (los que no aparecen en ningún rhs) están en toda clave.
+        for i in _bits(mask & ~obligatorios):
+            sin = mask & ~(1 << i)
+            if self.es_superclave(sin):
+                mask = sin
+        return mask
+
+    def claves_candidatas(self, limite: int = 1000) -> List[int]:
+        """Todas las claves candidatas (Lucchesi–Osborn), hasta `limite`.
+
+        Parte de una clave y, por cada DF X → Y, prueba X ∪ (K − Y): si no
+        contiene una clave conocida, se minimiza y es una clave nueva. Solo
+        se minimizan candidatos que no son superconjuntos de claves ya vistas,
+        así el costo depende de la cantidad de claves y no de 2^n.
+        """
+        en_rhs = 0
+        for _, rhs in self.dfs:
+            en_rhs |= rhs
+        obligatorios = self.todos & ~en_rhs
+
+        primera = self._minimizar(self.todos, obligatorios)
+        claves = [primera]
+        i = 0
+        while i < len(claves) and len(claves) < limite:
+            k = claves[i]
+            for lhs, rhs in self.dfs:
+                s = lhs | (k & ~rhs)
+                if any((c & s) == c for c in claves):
+                    continue
+                claves.append(self._minimizar(s, obligatorios))
+                if len(claves) >= limite:
+                    break
+            i += 1
+        return claves
+
+    # ---------- análisis de formas normales ----------
+
+    def analizar(self, pk: Optional[Iterable[str]] = None, limite_claves: int = 1000) -> Dict[str, Any]:
+        """Claves, atributos primos y DFs parciales / transitivas del esquema.
+
+        - Parcial: un atributo no primo depende de una parte propia de una
+          clave candidata (viola 2FN).
+        - Transitiva: una DF X → A con A no primo y X que no es superclave ni
+          parte de una clave (viola 3FN).
+        - Constante: A ∈ ∅+ (A vale lo mismo en todas las tuplas). No es
+          parcial aunque ∅ esté en toda clave; viola 3FN y BCNF porque ∅ no
+          es superclave.
+        - BCNF: toda DF no trivial X → Y tiene que tener X superclave.
+        """
+        claves = self.claves_candidatas(limite_claves)
+        primos = 0
+        for k in claves:
+            primos |= k
+        no_primos = self.todos & ~primos
+        constantes = self.cierre(0)
+        if constantes == self.todos:  # ∅ es superclave: no hay nada que violar
+            constantes = 0
+
+        # Parciales: por clave, basta mirar los subconjuntos K − {b}
+        parciales: Dict[Tuple[int, int], None] = {}
+        for k in claves:
+            if popcount(k) < 2:
+                continue
+            for b in _bits(k):
+                sub = k & ~(1 << b)
+                for a in _bits(self.cierre(sub) & no_primos & ~sub & ~constantes):
+                    # determinante mínimo dentro de la clave
+                    det = sub
+                    for x in _bits(sub):
+                        menor = det & ~(1 << x)
+                        if (self.cierre(menor, objetivo=1 << a) >> a) & 1:
+                            det = menor
+                    parciales[(det, a)] = None
+
+        transitivas: Dict[Tuple[int, int], None] = {}
+        bcnf: List[Tuple[int, int]] = []
+        tipos: List[Dict[str, Any]] = []
+        for lhs, rhs in self.dfs:
+            superclave = self.es_superclave(lhs)
+            parte_de_clave = any((lhs & k) == lhs and lhs != k for k in claves)
+            if not superclave:
+                bcnf.append((lhs, rhs))
+            for a in _bits(rhs):
+                tipo = "Plena"
+                if not superclave and (constantes >> a) & 1:
+                    tipo = "Constante"
+                elif not superclave and (no_primos >> a) & 1:
+                    if parte_de_clave:
+                        tipo = "Parcial"
+                        parciales.setdefault((lhs, a), None)
+                    else:
+                        tipo = "Transitiva"
+                        transitivas[(lhs, a)] = None
+                tipos.append({
+                    "determinante": self.nombres(lhs),
+                    "dependiente": self.atributos[a],
+                    "tipo": tipo,
+                })
+
+        def _lista(pares) -> List[Dict[str, Any]]:
+            return [
+                {"determinante": self.nombres(det), "dependiente": self.atributos[a]}
+                for det, a in pares
+            ]
+
+        resultado: Dict[str, Any] = {
+            "claves_candidatas": [self.nombres(k) for k in claves],
+            "atributos_primos": self.nombres(primos),
+            "dependencias_parciales": _lista(parciales),
+            "dependencias_transitivas": _lista(transitivas),
+            "dependencias_constantes": self.nombres(constantes),
+            "violaciones_bcnf": [
+                {"determinante": self.nombres(l), "dependientes": self.nombres(r)} for l, r in bcnf
+            ],
+            "dfs": tipos,
+            "cumple_2fn": not parciales,
+            "cumple_3fn": not parciales and not transitivas and not constantes,
+            "cumple_bcnf": not bcnf,
+        }
+        if pk is not None:
+            pk_mask = self.mascara(pk)
+            resultado["pk_es_superclave"] = self.es_superclave(pk_mask)
+            resultado["pk_es_clave_candidata"] = pk_mask in claves
+        return resultado
+
+
+# ==========================
+# Cobertura mínima y descomposiciones
+# ==========================
+
+def cobertura_minima(esq: EsquemaDF) -> List[Tuple[int, int]]:
+    """Cobertura canónica de las DFs de `esq`, agrupada por determinante.
+
+    1) Dependientes de a uno.  2) Se sacan atributos extraños del determinante.
+    3) Se eliminan DFs redundantes. Los pasos 2 y 3 usan el cierre indexado
+    sobre un único EsquemaDF de trabajo: una DF eliminada queda con rhs = 0
+    (no aporta nada) y el índice se reutiliza sin recalcularse por cada chequeo.
+    """
+    simples = [(lhs, 1 << a) for lhs, rhs in esq.dfs for a in _bits(rhs)]
+    trabajo = EsquemaDF(esq.atributos)
+    trabajo.dfs = list(dict.fromkeys(simples))  # sin duplicados, orden estable
+
+    # 2) atributos extraños: b sobra en X si A ∈ (X − b)+
+    for j, (lhs, rhs) in enumerate(trabajo.dfs):
+        if popcount(lhs) < 2:
+            continue
+        for b in _bits(lhs):
+            sin = lhs & ~(1 << b)
+            if trabajo.cierre(sin, objetivo=rhs) & rhs:
+                lhs = sin
+        trabajo.dfs[j] = (lhs, rhs)
+    trabajo.dfs = list(dict.fromkeys(trabajo.dfs))
+    trabajo._indice = None
+
+    # 3) DFs redundantes: X → A sobra si A ∈ X+ sin usarla
+    for j, (lhs, rhs) in enumerate(trabajo.dfs):
+        if trabajo.cierre(lhs, excluir=j, objetivo=rhs) & rhs:
+            trabajo.dfs[j] = (lhs, 0)
+
+    agrupadas: Dict[int, int] = {}
+    for lhs, rhs in trabajo.dfs:
+        if rhs:
+            agrupadas[lhs] = agrupadas.get(lhs, 0) | rhs
+    return list(agrupadas.items())
+
+
+def _clave_de(esq: EsquemaDF, r: int) -> int:
+    """Una clave de la relación r (cierre proyectado sobre r)."""
+    clave = r
+    for i in _bits(r):
+        sin = clave & ~(1 << i)
+        if (esq.cierre(sin) & r) == r:
+            clave = sin
+    return clave
+
+
+def _proyectar(cobertura: List[Tuple[int, int]], r: int) -> List[Tuple[int, int]]:
+    return [(lhs, rhs & r) for lhs, rhs in cobertura if (lhs & r) == lhs and rhs & r]
+
+
+def sintesis_3fn(esq: EsquemaDF) -> Dict[str, Any]:
+    """Algoritmo de síntesis de Bernstein: sin pérdida y preservando DFs."""
+    cobertura = cobertura_minima(esq)
+    relaciones = [lhs | rhs for lhs, rhs in cobertura]
+    claves = esq.claves_candidatas()
+    if not any((k & r) == k for k in claves for r in relaciones):
+        relaciones.append(claves[0])
+    # Los atributos que no aparecen en ninguna DF no están en ningún rhs:
+    # están en toda clave, así que la relación con la clave ya los cubre
+    # sacar relaciones contenidas en otras
+    finales: List[int] = []
+    for r in sorted(set(relaciones), key=popcount, reverse=True):
+        if not any((r & f) == r for f in finales):
+            finales.append(r)
+    return _armar_descomposicion(esq, "3FN", cobertura, finales)
+
+
+def _par_tsou_fischer(esq: EsquemaDF, r: int) -> Optional[Tuple[int, int]]:
+    """Busca A, B ∈ r con A ∈ (r − {A, B})+. Si no existe, r está en BCNF."""
+    for a in _bits(r):
+        for b in _bits(r & ~((1 << (a + 1)) - 1)):
+            y = r & ~(1 << a) & ~(1 << b)
+            cy = esq.cierre(y)
+            if (cy >> a) & 1:
+                return a, b
+            if (cy >> b) & 1:
+                return b, a
+    return None
+
+
+def _violacion_bcnf(esq: EsquemaDF, cobertura: List[Tuple[int, int]], r: int) -> Optional[Tuple[int, int]]:
+    """Devuelve (r1, r2) para partir r sin pérdida, o None si r está en BCNF."""
+    # 1) Camino rápido: determinantes de la cobertura y atributos sueltos
+    candidatos = {lhs & r for lhs, _ in cobertura if lhs & r} | {1 << i for i in _bits(r)}
+    for x in sorted(candidatos, key=popcount):
+        cx = esq.cierre(x) & r
+        if cx != r and cx != x:
+            return cx, r & ~(cx & ~x)
+
+    # 2) Una DF implícita puede violar BCNF en la proyección (el test exacto
+    #    es coNP). Tsou–Fischer: si no hay par A, B con A ∈ (r − AB)+, r está
+    #    en BCNF; si lo hay, se achica r hasta un Y = X ∪ {A} en BCNF con X → A.
+    par = _par_tsou_fischer(esq, r)
+    if par is None:
+        return None
+    y = r
+    while par is not None:
+        a, b = par
+        y &= ~(1 << b)
+        par = _par_tsou_fischer(esq, y)
+    return y, r & ~(1 << a)
+
+
+def descomposicion_bcnf(esq: EsquemaDF, max_relaciones: int = 500) -> Dict[str, Any]:
+    """Descomposición BCNF por partición recursiva (sin pérdida).
+
+    Cada relación que viola BCNF se parte en dos que comparten un
+    determinante. Puede no preservar todas las DFs: el resultado lo indica
+    en `preserva_dependencias`.
+    """
+    cobertura = cobertura_minima(esq)
+    pendientes = [esq.todos]
+    finales: List[int] = []
+    while pendientes and len(finales) + len(pendientes) <= max_relaciones:
+        r = pendientes.pop()
+        partes = _violacion_bcnf(esq, cobertura, r) if popcount(r) > 2 else None
+        if partes is None:
+            finales.append(r)
+        else:
+            pendientes.extend(partes)
+    finales.extend(pendientes)
+    finales = list(dict.fromkeys(finales))
+    finales = [r for r in finales if not any(r != f and (r & f) == r for f in finales)]
+    return _armar_descomposicion(esq, "BCNF", cobertura, finales)
+
+
+def preserva_dependencias(esq: EsquemaDF, cobertura: List[Tuple[int, int]], relaciones: List[int]) -> bool:
+    """Chequeo polinomial: Y ⊆ X+ usando solo cierres proyectados sobre cada Ri."""
+    for lhs, rhs in cobertura:
+        z = lhs
+        cambio = True
+        while cambio and (rhs & z) != rhs:
+            cambio = False
+            for r in relaciones:
+                nuevo = esq.cierre(z & r) & r
+                if nuevo & ~z:
+                    z |= nuevo
+                    cambio = True
+        if (rhs & z) != rhs:
+            return False
+    return True
+
+
+def _armar_descomposicion(esq: EsquemaDF, forma_normal: str,
+                          cobertura: List[Tuple[int, int]], relaciones: List[int]) -> Dict[str, Any]:
+    esquemas = []
+    for r in relaciones:
+        clave = _clave_de(esq, r)
+        esquemas.append({
+            "atributos": esq.nombres(r),
+            "clave": esq.nombres(clave),
+            "dependencias": [
+                {"determinante": esq.nombres(l), "dependientes": esq.nombres(d)}
+                for l, d in _proyectar(cobertura, r)
+            ],
+        })
+    return {
+        "forma_normal": forma_normal,
+        "cobertura_minima": [
+            {"determinante": esq.nombres(l), "dependientes": esq.nombres(d)} for l, d in cobertura
+        ],
+        "esquemas": esquemas,
+        "preserva_dependencias": preserva_dependencias(esq, cobertura, relaciones),
+    }
+
+
+def analizar_dependencias(atributos: Sequence[str], dfs: Iterable[DF],
+                          pk: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Atajo: arma el EsquemaDF y devuelve su análisis."""
+    return EsquemaDF(atributos, dfs).analizar(pk=pk)
+
+
+def descomponer(atributos: Sequence[str], dfs: Iterable[DF], forma_normal: str = "3FN") -> Dict[str, Any]:
+    """Atajo: propuesta de descomposición a 3FN (síntesis) o BCNF."""
+    esq = EsquemaDF(atributos, dfs)
+    if forma_normal.upper() == "BCNF":
+        return descomposicion_bcnf(esq)
+    return sintesis_3fn(esq)
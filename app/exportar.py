@@ -0,0 +1,121 @@
+# app/exportar.py — exportación en streaming del grafo de evaluaciones a NDJSON
+#
+#   python -m app.exportar salida.ndjson             # exporta todo
+#   python -m app.exportar salida.ndjson --reanudar  # sigue donde quedó el archivo
+#   python -m app.exportar - > salida.ndjson         # a stdout
+#
+# Una línea JSON por Esquema (atributos, DF, CUMPLE/NO_CUMPLE con detalles y
+# FOREIGN KEY importadas), en orden de nombre. Los registros salen del cursor
+# del driver de a EXPORTAR_FETCH_SIZE y se escriben apenas llegan: la memoria
+# no crece con el tamaño del grafo. Cada línea lleva el `cursor` para reanudar
+# desde el esquema siguiente si la exportación se corta.
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional
+
+_FILTROS_EXPORTAR = {"exportar": True}  # firma propia: un cursor de /api/esquemas no sirve acá
+
+
+def _armar_registro(row: Dict[str, Any]) -> Dict[str, Any]:
+    from app.agent import _agrupar_dfs, _cursor
+
+    return {
+        "esquema": row["esquema"],
+        "atributos": row["atributos"],
+        "pk": [a["nombre"] for a in row["atributos"] if a["es_pk"]],
+        "dependencias": [{"determinante": det, "dependientes": deps} for det, deps in _agrupar_dfs(row["dfs"])],
+        "evaluaciones": {ev["forma_normal"]: {"estado": ev["estado"], "detalles": ev["detalles"]}
+                         for ev in row["evaluaciones"]},
+        "referencias": row.get("referencias") or [],
+        "cursor": _cursor(row["esquema"], _FILTROS_EXPORTAR),
+    }
+
+
+def exportar_registros(cursor: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Registros de todos los esquemas posteriores al cursor (todos si es None).
+
+    ValueError si el cursor no es válido (se valida antes de abrir la consulta).
+    """
+    from app.agent import _leer_cursor, get_grafo
+
+    despues = _leer_cursor(cursor, _FILTROS_EXPORTAR) if cursor else ""
+    return (_armar_registro(row) for row in get_grafo().exportar(despues))
+
+
+def exportar_ndjson(cursor: Optional[str] = None) -> Iterator[str]:
+    """Líneas NDJSON (con '\\n'), perezosas: dejar de iterar cierra la
+    consulta. El cursor se valida al llamar, no al leer la primera línea."""
+    registros = exportar_registros(cursor)
+    return (json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in registros)
+
+
+def cursor_para_reanudar(ruta: str) -> Optional[str]:
+    """Cursor de la última línea completa de un export previo.
+
+    Si el archivo quedó con una línea a medio escribir, la recorta para que
+    lo que se agregue empiece en una línea nueva. Lee desde el final: no
+    recorre el archivo entero.
+    """
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "rb+") as f:
+        fin = f.seek(0, os.SEEK_END)
+        pos, cola = fin, b""
+        while pos > 0:
+            paso = min(64 * 1024, pos)
+            pos -= paso
+            f.seek(pos)
+            cola = f.read(paso) + cola
+            # Hace falta ver un '\n' antes de la última línea completa
+            if cola.count(b"\n") >= 2 or (pos == 0 and b"\n" in cola):
+                break
+        corte = cola.rfind(b"\n")
+        if corte < 0:
+            f.truncate(0)
+            return None
+        if corte != len(cola) - 1:
+            f.truncate(pos + corte + 1)  # línea incompleta al final
+        ultima = cola[:corte].rsplit(b"\n", 1)[-1]
+    try:
+        return json.loads(ultima)["cursor"]
+    except (ValueError, KeyError):
+        return None
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Exporta todos los esquemas del grafo EduDB a NDJSON.")
+    ap.add_argument("salida", help="archivo .ndjson, o - para stdout")
+    ap.add_argument("--reanudar", action="store_true", help="continuar desde la última línea del archivo")
+    ap.add_argument("--cursor", help="empezar después de este cursor (el de cualquier línea exportada)")
+    args = ap.parse_args(argv)
+
+    cursor = args.cursor
+    if args.reanudar and args.salida != "-":
+        cursor = cursor_para_reanudar(args.salida) or cursor
+
+    from app.agent import get_grafo
+
+    t0 = time.perf_counter()
+    n = 0
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "a" if cursor else "w", encoding="utf-8")
+    try:
+        for linea in exportar_ndjson(cursor):
+            salida.write(linea)
+            n += 1
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+        get_grafo().cerrar()
+    s = time.perf_counter() - t0
+    print(f"{n} esquemas exportados en {s:.2f} s" + (" (reanudado)" if cursor else ""), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,460 @@
+# app/grafo.py — backends del grafo EduDB: interfaz común y grafo en memoria
+#
+# Las tools de app/agent.py no hablan con Neo4j directamente sino con un
+# `Grafo`. Cada operación devuelve las mismas filas que la consulta Cypher
+# equivalente de agent.py, así el armado de respuestas es uno solo:
+#
+#   estado_fn(params)            Q_ESTADO_FN_UNA / Q_ESTADO_FN_TODAS
+#   dependencias(esquema)        Q_DEPENDENCIAS (atributos + arcos DF)
+#   escribir_guiado(items, ...)  Q_GUIADO_ESCRIBIR (upsert de esquema y
+#                                atributos + aristas CUMPLE/NO_CUMPLE) y,
+#                                en la misma transacción, el estado final
+#   escribir_descomposicion(p)   Q_DESCOMPOSICION_ESCRIBIR
+#   recorrer_estados_fn()        Q_ESTADOS_FN_RECORRER (todas las aristas
+#                                CUMPLE/NO_CUMPLE, para la instantánea)
+#   escribir_referencias(refs)   Q_REFERENCIAS_ESCRIBIR (FOREIGN KEY entre
+#                                atributos de distintos esquemas)
+#   listar_esquemas(params)      Q_ESQUEMAS_LISTAR (una página por nombre,
+#                                con filtros; paginación por cursor)
+#   exportar(despues)            Q_EXPORTAR (todos los esquemas completos,
+#                                por nombre, de a uno y en streaming)
+#   nivel_fn(esquema)            Q_ESTADO_FN_NIVEL (nivel_fn + mascara_fn
+#                                materializados en el nodo Esquema)
+#   reparar_nivel_fn(desde, n)   Q_NIVEL_FN_REPARAR (recalcula un lote)
+#   nombres_esquemas()           Q_ESQUEMAS_NOMBRES (todos los nombres, en
+#                                streaming, para el índice de app/nombres.py)
+#   buscar_esquemas(texto, n)    Q_ESQUEMAS_BUSCAR (índice full-text sobre
+#                                Esquema.name; candidatos con score)
+#
+# GrafoNeo4j vive en agent.py, junto a las consultas y el driver.
+import abc
+import bisect
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.nombres import similitud
+
+FNS = ("1FN", "2FN", "3FN")
+_CODIGOS = {"CUMPLE": 1, "NO_CUMPLE": 2}
+
+SETUP_CYPHER = os.getenv(
+    "EDUDB_SETUP_CYPHER", str(Path(__file__).resolve().parent.parent / "Neo4j" / "setup.cypher")
+)
+
+
+# Estado de las tres FN en un entero: 2 bits por FN (1FN en los bits 0-1,
+# 2FN en 2-3, 3FN en 4-5), 0 = sin evaluar, 1 = CUMPLE, 2 = NO_CUMPLE. Es
+# lo que se materializa como Esquema.mascara_fn; Esquema.nivel_fn es la
+# mayor FN alcanzada (0..3, null si no hay evaluaciones).
+def mascara_fn(estados: Dict[str, str]) -> int:
+    return sum(_CODIGOS[e] << (2 * FNS.index(fn)) for fn, e in estados.items() if fn in FNS and e in _CODIGOS)
+
+
+def estados_de_mascara(mascara: int) -> Dict[str, str]:
+    return {fn: ("CUMPLE", "NO_CUMPLE")[c - 1] for k, fn in enumerate(FNS) if (c := (mascara >> (2 * k)) & 3)}
+
+
+def nivel_de_mascara(mascara: int) -> Optional[int]:
+    """FN consecutivas cumplidas desde 1FN; None si no hay evaluaciones."""
+    if not mascara:
+        return None
+    nivel = 0
+    while nivel < len(FNS) and (mascara >> (2 * nivel)) & 3 == 1:
+        nivel += 1
+    return nivel
+
+
+class Grafo(abc.ABC):
+    """Operaciones que necesitan las tools. Las variantes async por defecto
+    llaman a las sync (alcanza para backends que no hacen I/O)."""
+
+    nombre = "grafo"
+
+    @abc.abstractmethod
+    def estado_fn(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def dependencias(self, esquema: str) -> List[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def escribir_guiado(self, items: List[Dict[str, Any]],
+                        consulta_estado: Optional[Tuple[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def escribir_descomposicion(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def recorrer_estados_fn(self) -> Iterator[Dict[str, Any]]:
+        """{esquema, forma_normal, estado, props} por arista; forma_normal None
+        para los esquemas sin evaluar."""
+
+    @abc.abstractmethod
+    def escribir_referencias(self, refs: List[Dict[str, Any]]) -> int:
+        """refs: {esquema, columna, esquema_ref, columna_ref}. Devuelve cuántas
+        se escribieron (las que apuntan a atributos inexistentes se ignoran)."""
+
+    @abc.abstractmethod
+    def listar_esquemas(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Hasta `limite` filas {esquema, n_atributos, pk_compuesta, estados}
+        con nombre > `despues`, ordenadas por nombre y filtradas (ver
+        pasa_filtros). `estados` es una lista de [fn, CUMPLE|NO_CUMPLE]."""
+
+    @abc.abstractmethod
+    def exportar(self, despues: str = "") -> Iterator[Dict[str, Any]]:
+        """Una fila {esquema, atributos, dfs, evaluaciones, referencias} por
+        esquema con nombre > `despues`, en orden de nombre. Es un generador:
+        nunca arma el grafo completo en memoria."""
+
+    @abc.abstractmethod
+    def nivel_fn(self, esquema: str) -> List[Dict[str, Any]]:
+        """[{esquema, nivel_fn, mascara_fn, detalles}] leído del nodo, o [] si
+        no existe. mascara_fn None = todavía sin materializar (falta reparar);
+        detalles: [[fn, props de la arista]]."""
+
+    @abc.abstractmethod
+    def reparar_nivel_fn(self, despues: str, lote: int) -> Dict[str, Any]:
+        """Recalcula nivel_fn/mascara_fn de hasta `lote` esquemas con nombre >
+        `despues` a partir de las aristas. {procesados, corregidos, ultimo}."""
+
+    @abc.abstractmethod
+    def nombres_esquemas(self) -> Iterator[str]:
+        """Todos los nombres de esquema, sin orden garantizado."""
+
+    @abc.abstractmethod
+    def buscar_esquemas(self, texto: str, limite: int) -> List[Dict[str, Any]]:
+        """Candidatos {esquema, score} para un nombre mal escrito, de mayor a
+        menor score (la escala depende del backend): el nombre tal cual
+        primero si existe, más hasta `limite` parecidos."""
+
+    async def estado_fn_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.estado_fn(params)
+
+    async def nivel_fn_async(self, esquema: str) -> List[Dict[str, Any]]:
+        return self.nivel_fn(esquema)
+
+    async def dependencias_async(self, esquema: str) -> List[Dict[str, Any]]:
+        return self.dependencias(esquema)
+
+    async def escribir_guiado_async(self, items: List[Dict[str, Any]],
+                                    consulta_estado: Optional[Tuple[str, Dict[str, Any]]] = None
+                                    ) -> List[Dict[str, Any]]:
+        return self.escribir_guiado(items, consulta_estado)
+
+    async def escribir_descomposicion_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.escribir_descomposicion(params)
+
+    async def listar_esquemas_async(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.listar_esquemas(params)
+
+    async def buscar_esquemas_async(self, texto: str, limite: int) -> List[Dict[str, Any]]:
+        return self.buscar_esquemas(texto, limite)
+
+    def cerrar(self) -> None:
+        pass
+
+    async def cerrar_async(self) -> None:
+        pass
+
+
+def pasa_filtros(n_atributos: int, pk_compuesta: bool, estados: Dict[str, str], params: Dict[str, Any]) -> bool:
+    """Los filtros de listar_esquemas, igual que el WHERE de Q_ESQUEMAS_LISTAR.
+
+    Con `fn`, el estado de esa FN tiene que ser `estado` (SIN_EVALUAR si no
+    hay arista); sin `fn`, alguna FN tiene que estar en `estado`.
+    """
+    if params.get("min_atributos") is not None and n_atributos < params["min_atributos"]:
+        return False
+    if params.get("max_atributos") is not None and n_atributos > params["max_atributos"]:
+        return False
+    if params.get("pk_compuesta") is not None and pk_compuesta != params["pk_compuesta"]:
+        return False
+    estado = params.get("estado")
+    if estado is None:
+        return True
+    if params.get("fn") is not None:
+        return estados.get(params["fn"], "SIN_EVALUAR") == estado
+    if estado == "SIN_EVALUAR":
+        return not estados
+    return estado in estados.values()
+
+# ==========================
+# Grafo en memoria
+# ==========================
+
+
+class _Esquema:
+    __slots__ = ("nombre", "atributos", "dfs", "estados", "derivado_de", "descompuesto_en", "referencias")
+
+    def __init__(self, nombre: str) -> None:
+        self.nombre = nombre
+        self.atributos: Dict[str, bool] = {}                     # nombre -> es_pk (en orden de alta)
+        self.dfs: Dict[Tuple[str, str, Tuple[str, ...]], Optional[str]] = {}  # (desde, hacia, det) -> tipo
+        self.estados: Dict[str, Tuple[str, Dict[str, Any]]] = {}  # fn -> (CUMPLE|NO_CUMPLE, props)
+        self.derivado_de: Optional[str] = None
+        self.descompuesto_en: Dict[str, List[str]] = {}          # fn -> sub-esquemas
+        self.referencias: Dict[Tuple[str, str, str], None] = {}   # (columna, esquema_ref, columna_ref)
+
+
+class GrafoMemoria(Grafo):
+    """El metamodelo EduDB en dicts indexados por nombre.
+
+    Lookups de microsegundos sin base de datos: para demos, tests y
+    benchmarks. Las escrituras toman un lock, así una escritura guiada y
+    la lectura de su estado se ven atómicas como en la transacción de Neo4j.
+    No persiste nada: al reiniciar vuelve a la semilla.
+    """
+
+    nombre = "memoria"
+
+    def __init__(self, frame_classes: Optional[List[str]] = None) -> None:
+        self.frame_classes = set(frame_classes or (*FNS, "ESQUEMA", "ATRIBUTO", "EVALUAR_FORMA_NORMAL"))
+        self.esquemas: Dict[str, _Esquema] = {}
+        self.evaluaciones: Dict[str, Dict[str, Any]] = {}
+        self._orden: Optional[List[str]] = None  # nombres ordenados, se rearma al agregar o borrar
+        self._lock = threading.RLock()
+
+    # ---------- lecturas ----------
+
+    def estado_fn(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        nombre = params["esquema"]
+        with self._lock:
+            es = self.esquemas.get(nombre)
+            if es is None:
+                return []
+            if "fn" in params:
+                tipo, props = es.estados.get(params["fn"], (None, None))
+                return [{
+                    "esquema": nombre,
+                    "forma_normal": params["fn"],
+                    "estado": tipo or "SIN_EVALUAR",
+                    "datos_cumple": dict(props) if tipo == "CUMPLE" else None,
+                    "datos_no_cumple": dict(props) if tipo == "NO_CUMPLE" else None,
+                }]
+            filas = [
+                {"esquema": nombre, "forma_normal": fn, "tipo_rel": tipo, "estado": tipo, "detalles": dict(props)}
+                for fn, (tipo, props) in sorted(es.estados.items()) if fn in FNS
+            ]
+        # Como el OPTIONAL MATCH: sin evaluaciones hay una fila con nulls
+        return filas or [{"esquema": nombre, "forma_normal": None, "tipo_rel": None,
+                          "estado": "SIN_EVALUAR", "detalles": None}]
+
+    def nivel_fn(self, esquema: str) -> List[Dict[str, Any]]:
+        # Acá las aristas ya son un dict: la máscara se calcula al leer
+        with self._lock:
+            es = self.esquemas.get(esquema)
+            if es is None:
+                return []
+            m = mascara_fn({fn: tipo for fn, (tipo, _) in es.estados.items()})
+            detalles = [[fn, dict(props)] for fn, (_, props) in es.estados.items() if fn in FNS]
+        return [{"esquema": esquema, "nivel_fn": nivel_de_mascara(m), "mascara_fn": m, "detalles": detalles}]
+
+    def reparar_nivel_fn(self, despues: str, lote: int) -> Dict[str, Any]:
+        return {"procesados": 0, "corregidos": 0, "ultimo": None}  # nada materializado
+
+    def dependencias(self, esquema: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            es = self.esquemas.get(esquema)
+            if es is None:
+                return []
+            return [{
+                "atributos": [{"nombre": a, "es_pk": pk} for a, pk in es.atributos.items()],
+                "dfs": [{"desde": x, "hacia": y, "determinante": list(det)} for x, y, det in es.dfs],
+            }]
+
+    def listar_esquemas(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        filas: List[Dict[str, Any]] = []
+        with self._lock:
+            if self._orden is None:
+                self._orden = sorted(self.esquemas)
+            orden = self._orden
+            for i in range(bisect.bisect_right(orden, params.get("despues") or ""), len(orden)):
+                es = self.esquemas[orden[i]]
+                estados = {fn: tipo for fn, (tipo, _) in es.estados.items() if fn in FNS}
+                n_pk = sum(es.atributos.values())
+                if pasa_filtros(len(es.atributos), n_pk > 1, estados, params):
+                    filas.append({"esquema": es.nombre, "n_atributos": len(es.atributos),
+                                  "pk_compuesta": n_pk > 1, "estados": [[fn, t] for fn, t in estados.items()]})
+                    if len(filas) >= params["limite"]:
+                        break
+        return filas
+
+    def exportar(self, despues: str = "") -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            if self._orden is None:
+                self._orden = sorted(self.esquemas)
+            orden = self._orden
+        # El lock se toma por esquema: una exportación larga no frena las escrituras
+        for nombre in orden[bisect.bisect_right(orden, despues):]:
+            with self._lock:
+                es = self.esquemas.get(nombre)
+                if es is None:
+                    continue
+                yield {
+                    "esquema": nombre,
+                    "atributos": [{"nombre": a, "es_pk": pk} for a, pk in es.atributos.items()],
+                    "dfs": [{"desde": x, "hacia": y, "determinante": list(det)} for x, y, det in es.dfs],
+                    "evaluaciones": [{"forma_normal": fn, "estado": tipo, "detalles": dict(props)}
+                                     for fn, (tipo, props) in sorted(es.estados.items()) if fn in FNS],
+                    "referencias": [{"columna": c, "esquema_ref": e, "columna_ref": r} for c, e, r in es.referencias],
+                }
+
+    def nombres_esquemas(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self.esquemas))
+
+    def buscar_esquemas(self, texto: str, limite: int) -> List[Dict[str, Any]]:
+        # Sin índice full-text: recorre todos los nombres (solo se llega acá
+        # con nombres que el índice de agent.py no tiene tal cual)
+        with self._lock:
+            exacto = [{"esquema": texto, "score": 1.0}] if texto in self.esquemas else []
+            puntajes = [(similitud(texto, n), n) for n in self.esquemas if n != texto]
+        puntajes = sorted((p for p in puntajes if p[0] > 0), key=lambda p: (-p[0], p[1]))[:limite]
+        return exacto + [{"esquema": n, "score": round(s, 4)} for s, n in puntajes]
+
+    def recorrer_estados_fn(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            filas = [
+                {"esquema": es.nombre, "forma_normal": fn, "estado": tipo, "props": dict(props or {})}
+                for es in self.esquemas.values()
+                for fn, (tipo, props) in (es.estados.items() or [(None, (None, None))])
+            ]
+        return iter(filas)
+
+    # ---------- escrituras ----------
+
+    def _upsert_esquema(self, nombre: str, atributos: List[Dict[str, Any]]) -> _Esquema:
+        es = self.esquemas.get(nombre)
+        if es is None:
+            es = self.esquemas[nombre] = _Esquema(nombre)
+            self._orden = None
+        nuevos = {a["nombre"]: bool(a.get("es_pk")) for a in atributos}
+        # Los atributos que salen se llevan sus DF y FK (DETACH DELETE)
+        es.dfs = {k: t for k, t in es.dfs.items() if k[0] in nuevos and k[1] in nuevos}
+        es.referencias = {k: None for k in es.referencias if k[0] in nuevos}
+        es.atributos = nuevos
+        return es
+
+    def _reemplazar_dfs(self, es: _Esquema, dfs: List[Dict[str, Any]]) -> None:
+        es.dfs = {
+            (d["desde"], d["hacia"], tuple(d["determinante"])): d.get("tipo")
+            for d in dfs if d["desde"] in es.atributos and d["hacia"] in es.atributos
+        }
+
+    def _escribir_evaluaciones(self, es: _Esquema, evaluaciones: List[Dict[str, Any]]) -> None:
+        es.estados = {
+            ev["fn"]: ("CUMPLE" if ev["cumple"] else "NO_CUMPLE", dict(ev["props"]))
+            for ev in evaluaciones if ev["fn"] in self.frame_classes
+        }
+
+    def escribir_guiado(self, items: List[Dict[str, Any]],
+                        consulta_estado: Optional[Tuple[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            for e in items:
+                es = self._upsert_esquema(e["esquema"], e["atributos"])
+                if e.get("dfs") is not None:
+                    self._reemplazar_dfs(es, e["dfs"])
+                ev = self.evaluaciones.setdefault(e["ev"]["id"], {})
+                ev.update(e["ev"]["props"])
+                ev["esquema_objetivo"] = es.nombre
+                self._escribir_evaluaciones(es, e["evaluaciones"])
+            if consulta_estado is None:
+                return []
+            return self.estado_fn(consulta_estado[1])
+
+    def escribir_descomposicion(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            orig = self.esquemas.get(params["esquema"])
+            if orig is None:
+                return []
+            borrados = [v for v in orig.descompuesto_en.pop(params["fn"], []) if self.esquemas.pop(v, None)]
+            self._orden = None
+            creados = []
+            for sub in params["subesquemas"]:
+                es = self._upsert_esquema(sub["nombre"], sub["atributos"])
+                es.derivado_de = orig.nombre
+                es.dfs.update({(d["desde"], d["hacia"], tuple(d["determinante"])): "Plena" for d in sub["dfs"]})
+                creados.append(es.nombre)
+            orig.descompuesto_en[params["fn"]] = creados
+            return [{"creados": creados, "borrados": borrados}]
+
+    def escribir_referencias(self, refs: List[Dict[str, Any]]) -> int:
+        escritas = 0
+        with self._lock:
+            for r in refs:
+                es, ref = self.esquemas.get(r["esquema"]), self.esquemas.get(r["esquema_ref"])
+                if es and ref and r["columna"] in es.atributos and r["columna_ref"] in ref.atributos:
+                    es.referencias[(r["columna"], r["esquema_ref"], r["columna_ref"])] = None
+                    escritas += 1
+        return escritas
+
+    def __len__(self) -> int:
+        return len(self.esquemas)
+
+# ==========================
+# Semilla desde Neo4j/setup.cypher
+# ==========================
+# No es un intérprete de Cypher: reconoce las formas que usa el setup
+# (UNWIND de FrameClass, MERGE de Esquema, UNWIND de atributos y MERGE de
+# arcos DF) y las devuelve como payloads de evaluación guiada.
+
+_RE_FRAMECLASSES = re.compile(r"UNWIND\s*\[(.*?)\]\s*AS\s+fc\s+MERGE\s*\(:FrameClass", re.S)
+_RE_COMILLAS = re.compile(r"'([^']*)'")
+_RE_ESQUEMA = re.compile(r"MERGE\s*\(\w+:Esquema\s*\{name:'([^']+)'\}\)")
+_RE_ATRIBUTOS = re.compile(
+    r"UNWIND\s*\[(.*?)\]\s*AS\s+a\s+MERGE\s*\(\w+:Atributo\s*\{name:a\.name,\s*esquema:'([^']+)'\}\)", re.S
+)
+_RE_ATRIBUTO = re.compile(r"\{name:'([^']+)',\s*es_pk:(true|false)\}")
+_RE_VAR_ATRIBUTO = re.compile(r"\((\w+)\s*:Atributo\s*\{name:'([^']+)',\s*esquema:'([^']+)'\}\)")
+_RE_DF = re.compile(r"MERGE\s*\((\w+)\)\s*-\[:DF\s*\{[^}]*determinante:\[([^\]]*)\][^}]*\}\]->\((\w+)\)")
+
+
+def _sin_comentarios(texto: str) -> str:
+    return "\n".join(linea.split("//", 1)[0] for linea in texto.splitlines())
+
+
+def leer_setup(ruta: str = SETUP_CYPHER) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """(frame_classes, payloads guiados) del script de setup."""
+    texto = _sin_comentarios(Path(ruta).read_text(encoding="utf-8"))
+    frame_classes = [fc for m in _RE_FRAMECLASSES.finditer(texto) for fc in _RE_COMILLAS.findall(m.group(1))]
+
+    payloads: Dict[str, Dict[str, Any]] = {
+        nombre: {"nombre_esquema": nombre, "atributos": [], "dependencias": []}
+        for nombre in _RE_ESQUEMA.findall(texto)
+    }
+    for m in _RE_ATRIBUTOS.finditer(texto):
+        p = payloads.setdefault(m.group(2), {"nombre_esquema": m.group(2), "atributos": [], "dependencias": []})
+        p["atributos"] += [{"nombre": n, "es_pk": pk == "true"} for n, pk in _RE_ATRIBUTO.findall(m.group(1))]
+
+    variables = {v: (nombre, esquema) for v, nombre, esquema in _RE_VAR_ATRIBUTO.findall(texto)}
+    vistas = set()
+    for desde, det, hacia in _RE_DF.findall(texto):
+        if desde not in variables or hacia not in variables:
+            continue
+        esquema = variables[hacia][1]
+        clave = (esquema, tuple(_RE_COMILLAS.findall(det)), variables[hacia][0])
+        if esquema in payloads and clave not in vistas:
+            vistas.add(clave)
+            payloads[esquema]["dependencias"].append({"determinante": list(clave[1]), "dependientes": [clave[2]]})
+    return frame_classes, [p for p in payloads.values() if p["atributos"]]
+
+
+def grafo_memoria_desde_setup(preparar, ruta: str = SETUP_CYPHER) -> GrafoMemoria:
+    """GrafoMemoria con el metamodelo y los esquemas de ejemplo del setup.
+
+    `preparar` es agent._preparar_guiado: los esquemas se evalúan con la
+    misma lógica que la evaluación guiada, no se copian los flags del script.
+    """
+    if not Path(ruta).exists():
+        return GrafoMemoria()
+    frame_classes, payloads = leer_setup(ruta)
+    g = GrafoMemoria(frame_classes or None)
+    items = [prep["item"] for prep in map(preparar, payloads) if prep.get("ok")]
+    g.escribir_guiado(items)
+    return g
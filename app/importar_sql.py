@@ -0,0 +1,495 @@
+# app/importar_sql.py — importador en streaming de dumps SQL (CREATE TABLE) al grafo
+#
+#   python -m app.importar_sql dump.sql [--chunk 500] [--solo-parsear] [--avisar URL]
+#
+# Recorre el archivo línea por línea y solo guarda en memoria la sentencia
+# CREATE/ALTER TABLE en curso (los INSERT y demás se descartan mientras se
+# leen). Cada tabla se convierte en un payload de evaluación guiada:
+#   - columnas           → Atributo {es_pk}
+#   - PRIMARY KEY/UNIQUE → DF clave → resto de las columnas
+#   - FOREIGN KEY        → (:Atributo)-[:REFERENCIA]->(:Atributo), al final
+# y se escribe con el mismo camino que el lote guiado (UNWIND por chunks).
+# Las claves pueden venir en el CREATE TABLE (mysqldump) o después, en
+# ALTER TABLE ... ADD CONSTRAINT (pg_dump).
+import argparse
+import json
+import re
+import sys
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+IMPORTAR_CHUNK_SIZE = 500
+_MAX_ERRORES = 20  # errores de parseo que se devuelven en el reporte
+
+# ==========================
+# Separación de sentencias
+# ==========================
+
+_RE_ESPECIAL = re.compile(r"[;'\"`]|--|/\*")
+_RE_FIN_COMILLA = {
+    "'": re.compile(r"\\.|''|'"),
+    '"': re.compile(r'""|"'),
+    "`": re.compile(r"``|`"),
+}
+_RE_CREATE_TABLE = re.compile(
+    r"\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:GLOBAL|LOCAL)\s+)?(?:TEMP(?:ORARY)?\s+)?(?:UNLOGGED\s+)?TABLE\b",
+    re.I,
+)
+_RE_ALTER_TABLE = re.compile(r"\s*ALTER\s+TABLE\b", re.I)
+_RE_SENTENCIA = re.compile(_RE_CREATE_TABLE.pattern + "|" + _RE_ALTER_TABLE.pattern, re.I)
+_VERBOS = ("CREATE", "ALTER")
+# pg_dump: los datos de un COPY ... FROM stdin; van en las líneas
+# siguientes, sin ';', hasta una línea "\."
+_RE_COPY_STDIN = re.compile(r"\s*COPY\b.*\bFROM\s+STDIN\s*;\s*$", re.I | re.S)
+_CABEZA = 48  # caracteres que alcanzan para saber si una sentencia es CREATE/ALTER TABLE
+
+
+class _Separador:
+    """Parte un texto SQL en sentencias por ';' fuera de comillas y comentarios.
+
+    Solo acumula las sentencias CREATE TABLE y ALTER TABLE: apenas la cabeza
+    de una sentencia muestra que es otra cosa, el resto se saltea sin copiarlo.
+    """
+
+    def __init__(self) -> None:
+        self.modo: Optional[str] = None  # None, "--", "/*" o la comilla abierta
+        self.partes: List[str] = []
+        self.guardar: Optional[bool] = None
+        self._largo = 0
+        self._en_copy = False
+
+    def _acumular(self, texto: str) -> None:
+        if self.guardar is False or not texto:
+            return
+        self.partes.append(texto)
+        if self.guardar is None:
+            self._largo += len(texto)
+            cabeza = "".join(self.partes).lstrip()
+            if cabeza and not any(v.startswith(cabeza[:len(v)].upper()) for v in _VERBOS):
+                self._descartar()
+            elif self._largo >= _CABEZA:
+                self.guardar = bool(_RE_SENTENCIA.match(cabeza))
+                if not self.guardar:
+                    self._descartar()
+
+    def _descartar(self) -> None:
+        self.guardar = False
+        self.partes = []
+
+    def _cerrar(self) -> Optional[str]:
+        texto = "".join(self.partes)
+        guardar = self.guardar
+        self.partes, self.guardar, self._largo = [], None, 0
+        if guardar is False or not _RE_SENTENCIA.match(texto):
+            return None
+        return texto
+
+    def alimentar(self, linea: str) -> Iterator[str]:
+        """Sentencias que cierra esta línea (se alimenta de a una línea)."""
+        if self._en_copy:
+            self._en_copy = linea.rstrip("\r\n") != "\\."
+            return
+        i, n = 0, len(linea)
+        while i < n:
+            if self.modo is None:
+                m = _RE_ESPECIAL.search(linea, i)
+                fin = m.start() if m else n
+                self._acumular(linea[i:fin])
+                if m is None:
+                    return
+                tok, i = m.group(), m.end()
+                if tok == ";":
+                    sentencia = self._cerrar()
+                    if sentencia:
+                        yield sentencia
+                    elif self.modo is None and _RE_COPY_STDIN.match(linea):
+                        self._en_copy = True
+                        return
+                elif tok in _RE_FIN_COMILLA:
+                    self.modo = tok
+                    self._acumular(tok)
+                else:
+                    self.modo = tok
+                    self._acumular(" ")
+            elif self.modo == "--":
+                self.modo = None if linea.endswith("\n") else "--"
+                return
+            elif self.modo == "/*":
+                j = linea.find("*/", i)
+                if j < 0:
+                    return
+                self.modo, i = None, j + 2
+            else:
+                patron = _RE_FIN_COMILLA[self.modo]
+                while True:
+                    m = patron.search(linea, i)
+                    if m is None:
+                        self._acumular(linea[i:])
+                        return
+                    if len(m.group()) == 1:  # comilla de cierre (no escape ni duplicada)
+                        self._acumular(linea[i:m.end()])
+                        self.modo, i = None, m.end()
+                        break
+                    self._acumular(linea[i:m.end()])
+                    i = m.end()
+
+    def terminar(self) -> Optional[str]:
+        """Última sentencia si el archivo no termina en ';'."""
+        return self._cerrar() if self.modo is None else None
+
+
+def sentencias_de_tablas(lineas: Iterable[str]) -> Iterator[str]:
+    """Sentencias CREATE TABLE y ALTER TABLE del dump, en orden."""
+    sep = _Separador()
+    for linea in lineas:
+        yield from sep.alimentar(linea)
+    ultima = sep.terminar()
+    if ultima:
+        yield ultima
+
+# ==========================
+# Parseo de CREATE / ALTER TABLE
+# ==========================
+
+_IDENT = r'(?:`(?:[^`]|``)+`|"(?:[^"]|"")+"|\[[^\]]+\]|[\w$]+)'
+_NOMBRE = _IDENT + r"(?:\s*\.\s*" + _IDENT + r")*"
+_RE_CABECERA = re.compile(
+    _RE_CREATE_TABLE.pattern + r"\s*(?:IF\s+NOT\s+EXISTS\s+)?(?P<nombre>" + _NOMBRE + r")\s*\(",
+    re.I,
+)
+_RE_CABECERA_ALTER = re.compile(
+    _RE_ALTER_TABLE.pattern + r"\s*(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?(?P<nombre>" + _NOMBRE + r")\s*",
+    re.I,
+)
+_RE_IDENT = re.compile(_IDENT)
+_RE_PK = re.compile(r"\bPRIMARY\s+KEY\b", re.I)
+_RE_UNIQUE = re.compile(r"\bUNIQUE\b", re.I)
+_RE_REFERENCES = re.compile(r"\bREFERENCES\s+(?P<tabla>" + _NOMBRE + r")\s*(?:\((?P<cols>[^)]*)\))?", re.I)
+_RE_CONSTRAINT = re.compile(r"CONSTRAINT\s+" + _IDENT + r"\s+", re.I)
+_RE_ADD = re.compile(r"ADD\s+", re.I)
+# Items de un CREATE TABLE que no son columnas. PERIOD y LIKE no son
+# reservadas en todos los motores: "period varchar(10)" es una columna.
+_RE_NO_COLUMNA = re.compile(
+    r"(?:KEY|INDEX|FULLTEXT|SPATIAL)\b"
+    r"|CHECK\s*\("
+    r"|EXCLUDE\s*(?:USING\b|\()"
+    r"|PERIOD\s+FOR\b"
+    r"|LIKE\s+" + _NOMBRE + r"(?:\s+(?:INCLUDING|EXCLUDING)\s+\w+)*\s*$",
+    re.I,
+)
+
+
+def _ident(texto: str) -> str:
+    """Nombre sin comillas (y sin el esquema/base si viene calificado)."""
+    partes = _RE_IDENT.findall(texto)
+    t = partes[-1] if partes else texto.strip()
+    if t[:1] in "`\"[":
+        t = t[1:-1].replace(t[0] * 2, t[0]) if t[0] != "[" else t[1:-1]
+    return t
+
+
+def _columnas(lista: str) -> List[str]:
+    # "a, `b`(10) DESC" → ["a", "b"]
+    return [_ident(c) for c in (p.strip() for p in _partir(lista)) if c]
+
+
+_RE_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"]|\"\")*\"|`(?:[^`]|``)*`", re.S)
+
+
+def _saltear_literal(texto: str, i: int) -> int:
+    m = _RE_LITERAL.match(texto, i)
+    return m.end() if m else len(texto)
+
+
+def _partir(cuerpo: str) -> List[str]:
+    """Separa por comas de primer nivel (fuera de paréntesis y comillas)."""
+    partes: List[str] = []
+    nivel, inicio, i, n = 0, 0, 0, len(cuerpo)
+    while i < n:
+        c = cuerpo[i]
+        if c in "'\"`":
+            i = _saltear_literal(cuerpo, i)
+            continue
+        if c == "(":
+            nivel += 1
+        elif c == ")":
+            nivel -= 1
+        elif c == "," and nivel == 0:
+            partes.append(cuerpo[inicio:i])
+            inicio = i + 1
+        i += 1
+    partes.append(cuerpo[inicio:])
+    return partes
+
+
+def _entre_parentesis(texto: str, desde: int) -> Tuple[str, int]:
+    """Contenido del paréntesis que abre en texto[desde] y posición del cierre."""
+    nivel, i, n = 0, desde, len(texto)
+    while i < n:
+        c = texto[i]
+        if c in "'\"`":
+            i = _saltear_literal(texto, i)
+            continue
+        if c == "(":
+            nivel += 1
+        elif c == ")":
+            nivel -= 1
+            if nivel == 0:
+                return texto[desde + 1:i], i
+        i += 1
+    raise ValueError("paréntesis sin cerrar")
+
+
+def _sin_constraint(item: str) -> str:
+    return _RE_CONSTRAINT.sub("", item, count=1) if item[:10].upper() == "CONSTRAINT" else item
+
+
+def _restriccion(item: str, tabla: Dict[str, Any]) -> bool:
+    """Agrega a la tabla la PRIMARY KEY / UNIQUE / FOREIGN KEY de un item
+    (ya sin "CONSTRAINT x"). False si el item no es una de esas."""
+    palabra = item.split(None, 1)[0].upper() if item else ""
+    if palabra not in ("PRIMARY", "UNIQUE", "FOREIGN"):
+        return False
+    if "(" not in item:
+        return True  # PRIMARY KEY USING INDEX x: las columnas no están en la sentencia
+    cols = _columnas(_entre_parentesis(item, item.index("("))[0])
+    if palabra == "PRIMARY":
+        tabla["pk"] = cols
+    elif palabra == "UNIQUE":
+        tabla["unicos"].append(cols)
+    else:
+        ref = _RE_REFERENCES.search(item)
+        if ref:
+            tabla["fks"].append((cols, _ident(ref.group("tabla")), _columnas(ref.group("cols") or "")))
+    return True
+
+
+def parsear_create_table(sentencia: str) -> Optional[Dict[str, Any]]:
+    """{nombre, columnas, pk, unicos, fks} de un CREATE TABLE, o None si no
+    define columnas (CREATE TABLE ... AS SELECT / LIKE)."""
+    m = _RE_CABECERA.match(sentencia)
+    if m is None:
+        return None
+    cuerpo, _ = _entre_parentesis(sentencia, m.end() - 1)
+    tabla: Dict[str, Any] = {"nombre": _ident(m.group("nombre")), "columnas": [], "pk": [], "unicos": [], "fks": []}
+
+    for item in (_sin_constraint(p.strip()) for p in _partir(cuerpo)):
+        if not item or _restriccion(item, tabla) or _RE_NO_COLUMNA.match(item):
+            continue
+        col_m = _RE_IDENT.match(item)
+        if col_m is None:
+            continue
+        col = _ident(col_m.group())
+        resto = item[col_m.end():]
+        tabla["columnas"].append(col)
+        if _RE_PK.search(resto):
+            tabla["pk"] = [col]
+        elif _RE_UNIQUE.search(resto):
+            tabla["unicos"].append([col])
+        ref = _RE_REFERENCES.search(resto)
+        if ref:
+            tabla["fks"].append(([col], _ident(ref.group("tabla")), _columnas(ref.group("cols") or "")))
+    return tabla if tabla["columnas"] else None
+
+
+def parsear_alter_table(sentencia: str) -> Optional[Dict[str, Any]]:
+    """{nombre, pk, unicos, fks} de un ALTER TABLE ... ADD [CONSTRAINT x]
+    PRIMARY KEY / UNIQUE / FOREIGN KEY, o None si no agrega ninguna (OWNER
+    TO, ALTER COLUMN, ADD COLUMN...)."""
+    m = _RE_CABECERA_ALTER.match(sentencia)
+    if m is None:
+        return None
+    alter: Dict[str, Any] = {"nombre": _ident(m.group("nombre")), "pk": [], "unicos": [], "fks": []}
+    hay = False
+    for item in (p.strip() for p in _partir(sentencia[m.end():])):
+        add = _RE_ADD.match(item)
+        if add:
+            hay = _restriccion(_sin_constraint(item[add.end():].strip()), alter) or hay
+    return alter if hay else None
+
+def payload_de_tabla(tabla: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload de evaluación guiada: cada clave declarada determina el resto."""
+    columnas = tabla["columnas"]
+    pk = set(tabla["pk"])
+    dependencias = []
+    for clave in ([tabla["pk"]] if tabla["pk"] else []) + tabla["unicos"]:
+        resto = [c for c in columnas if c not in clave]
+        if resto and all(c in columnas for c in clave):
+            dependencias.append({"determinante": list(clave), "dependientes": resto})
+    return {
+        "nombre_esquema": tabla["nombre"],
+        "atributos": [{"nombre": c, "es_pk": c in pk} for c in columnas],
+        "dependencias": dependencias,
+    }
+
+# ==========================
+# Importación
+# ==========================
+
+
+def importar(lineas: Iterable[str], chunk_size: int = IMPORTAR_CHUNK_SIZE, escribir: bool = True,
+             al_escribir: Optional[Callable[[List[str]], None]] = None,
+             progreso: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Importa las tablas de un dump. Con escribir=False solo parsea (para medir).
+
+    Las tablas que traen su clave en el CREATE TABLE se escriben por chunks
+    de `chunk_size` mientras se lee. Las que no (pg_dump declara PRIMARY
+    KEY/UNIQUE/FOREIGN KEY después, en ALTER TABLE) esperan al final, y una
+    ya escrita que recibe una clave por ALTER TABLE se vuelve a escribir.
+    La memoria queda acotada por el esquema del dump (nombres de columnas y
+    claves), no por sus datos.
+    """
+    from app.agent import _norm_text, crear_esquemas_guiados_y_evaluar, get_grafo
+
+    chunk_size = max(1, int(chunk_size))
+    t0 = time.perf_counter()
+    reporte: Dict[str, Any] = {
+        "ok": True, "tablas": 0, "atributos": 0, "dfs": 0, "referencias": 0, "restricciones": 0,
+        "omitidas": 0, "con_error": 0, "chunks": 0, "errores": [],
+    }
+    pendientes: List[Dict[str, Any]] = []
+    tablas: Dict[str, Dict[str, Any]] = {}  # nombre normalizado → tabla (sin fks)
+    diferidas: Dict[str, None] = {}  # sin clave en el CREATE: se escriben al final (en orden)
+    reescribir: Dict[str, None] = {}  # ya escritas que recibieron una clave por ALTER TABLE
+    fks: List[Tuple[str, List[str], str, List[str]]] = []
+
+    def _volcar() -> None:
+        if not pendientes:
+            return
+        if escribir:
+            r = crear_esquemas_guiados_y_evaluar(pendientes, chunk_size)
+            reporte["con_error"] += r["con_error"]
+            for e in r["resultados"]:
+                if not e["ok"] and len(reporte["errores"]) < _MAX_ERRORES:
+                    reporte["errores"].append({"esquema": pendientes[e["indice"]]["nombre_esquema"],
+                                               "error": e["error"]})
+            if al_escribir:
+                al_escribir([e["esquema"] for e in r["resultados"] if e["ok"]])
+        reporte["chunks"] += 1
+        pendientes.clear()
+        if progreso:
+            progreso(_con_tasas(reporte, t0))
+
+    def _preparar(tabla: Dict[str, Any]) -> None:
+        payload = payload_de_tabla(tabla)
+        pendientes.append(payload)
+        reporte["dfs"] += len(payload["dependencias"])
+        if len(pendientes) >= chunk_size:
+            _volcar()
+
+    def _fks(nombre: str, tabla: Dict[str, Any]) -> None:
+        fks.extend((nombre, [_norm_text(c) for c in cols], _norm_text(ref), [_norm_text(c) for c in cols_ref])
+                   for cols, ref, cols_ref in tabla.pop("fks"))
+
+    for sentencia in sentencias_de_tablas(lineas):
+        es_alter = bool(_RE_ALTER_TABLE.match(sentencia))
+        try:
+            tabla = parsear_alter_table(sentencia) if es_alter else parsear_create_table(sentencia)
+        except ValueError as e:
+            tabla = None
+            if len(reporte["errores"]) < _MAX_ERRORES:
+                reporte["errores"].append({"sentencia": sentencia[:120], "error": str(e)})
+        if tabla is None:
+            reporte["omitidas"] += not es_alter
+            continue
+        nombre = _norm_text(tabla["nombre"])
+        _fks(nombre, tabla)
+        if es_alter:
+            reporte["restricciones"] += 1
+            existente = tablas.get(nombre)
+            if existente is None or not (tabla["pk"] or tabla["unicos"]):
+                continue
+            if nombre not in diferidas and nombre not in reescribir:
+                # Se escribe de nuevo al final: sus DF ya contadas se descuentan
+                reporte["dfs"] -= len(payload_de_tabla(existente)["dependencias"])
+                reescribir[nombre] = None
+            existente["pk"] = tabla["pk"] or existente["pk"]
+            existente["unicos"].extend(tabla["unicos"])
+            continue
+        tablas[nombre] = tabla
+        reporte["tablas"] += 1
+        reporte["atributos"] += len(tabla["columnas"])
+        if tabla["pk"] or tabla["unicos"]:
+            _preparar(tabla)
+        else:
+            diferidas[nombre] = None
+    for nombre in (*diferidas, *reescribir):
+        _preparar(tablas[nombre])
+    _volcar()
+
+    # FOREIGN KEY sin columnas apuntan a la PK de la tabla referenciada
+    refs = [
+        {"esquema": esquema, "columna": c, "esquema_ref": ref, "columna_ref": c_ref}
+        for esquema, cols, ref, cols_ref in fks
+        for c, c_ref in zip(cols, cols_ref or [_norm_text(c) for c in tablas.get(ref, {}).get("pk", [])])
+    ]
+    if escribir:
+        grafo = get_grafo()
+        for i in range(0, len(refs), chunk_size):
+            reporte["referencias"] += grafo.escribir_referencias(refs[i:i + chunk_size])
+    else:
+        reporte["referencias"] = len(refs)
+    reporte["ok"] = reporte["con_error"] == 0
+    return _con_tasas(reporte, t0)
+
+
+def _con_tasas(reporte: Dict[str, Any], t0: float) -> Dict[str, Any]:
+    s = time.perf_counter() - t0
+    reporte["segundos"] = round(s, 3)
+    reporte["tablas_por_s"] = round(reporte["tablas"] / s, 1) if s else 0.0
+    reporte["atributos_por_s"] = round(reporte["atributos"] / s, 1) if s else 0.0
+    return reporte
+
+
+def importar_archivo(ruta: str, **kwargs: Any) -> Dict[str, Any]:
+    with open(ruta, encoding="utf-8", errors="replace", newline="") as f:
+        reporte = importar(f, **kwargs)
+        reporte["bytes"] = f.tell()
+    return reporte
+
+
+def avisar_recarga(url: str, timeout: float = 30.0) -> Dict[str, Any]:
+    """POST {url}/api/recargar: la app en marcha descarta lo que cachea del
+    grafo (estado FN, instantánea, índice de nombres) y lo vuelve a leer."""
+    pedido = urllib.request.Request(url.rstrip("/") + "/api/recargar", data=b"", method="POST")
+    with urllib.request.urlopen(pedido, timeout=timeout) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Importa las tablas de un dump SQL al grafo EduDB.")
+    ap.add_argument("archivo", help="dump .sql (CREATE TABLE / ALTER TABLE ...; el resto se ignora)")
+    ap.add_argument("--chunk", type=int, default=IMPORTAR_CHUNK_SIZE, help="tablas por transacción")
+    ap.add_argument("--solo-parsear", action="store_true", help="no escribir en el grafo (mide el parser)")
+    ap.add_argument("--avisar", metavar="URL",
+                    help="app en marcha a la que pedirle que recargue sus caches al terminar (p. ej. http://localhost:8000)")
+    args = ap.parse_args(argv)
+
+    def _progreso(r: Dict[str, Any]) -> None:
+        print(f"  {r['tablas']} tablas · {r['tablas_por_s']:.0f} tablas/s", file=sys.stderr)
+
+    from app.agent import get_grafo
+
+    try:
+        r = importar_archivo(args.archivo, chunk_size=args.chunk, escribir=not args.solo_parsear,
+                             progreso=_progreso)
+    finally:
+        get_grafo().cerrar()
+    print(f"{r['tablas']} tablas, {r['atributos']} atributos, {r['dfs']} DF, {r['referencias']} FK "
+          f"en {r['segundos']:.2f} s ({r['tablas_por_s']:.0f} tablas/s, {r['atributos_por_s']:.0f} atributos/s)")
+    if r["omitidas"] or r["con_error"]:
+        print(f"omitidas: {r['omitidas']} · con error: {r['con_error']}")
+        for e in r["errores"]:
+            print("  -", e)
+    if args.avisar and not args.solo_parsear:
+        try:
+            print("recarga:", avisar_recarga(args.avisar))
+        except OSError as e:
+            print(f"⚠️ No se pudo avisar a {args.avisar}: {e}", file=sys.stderr)
+            return 1
+    return 0 if r["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# app/instantanea.py — read model en memoria del estado 1FN/2FN/3FN de todos los esquemas
+import json
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.grafo import _CODIGOS, FNS
+_ESTADOS = (None, "CUMPLE", "NO_CUMPLE")
+
+
+def _copiar(props: Dict[str, Any]) -> Dict[str, Any]:
+    # Las props son planas (números, strings, listas): alcanza con copiar las listas
+    return {k: list(v) if isinstance(v, list) else v for k, v in props.items()}
+
+
+class _Datos:
+    """Una versión completa de la instantánea.
+
+    Por esquema: un byte con el estado de las tres FN (2 bits cada una) y
+    tres ids de props (0 = sin props) en un array plano. Las props se
+    internan en una tabla de la versión: la mayoría de los esquemas repiten
+    las mismas (p. ej. {"transitivas": 0}), y cada carga completa arranca
+    una tabla nueva, así la memoria sigue al grafo vivo.
+    """
+
+    __slots__ = ("ids", "nombres", "codigos", "props", "tabla", "claves", "id_props")
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.nombres: List[str] = []
+        self.codigos = bytearray()
+        self.props = array("I")
+        self.tabla: List[Dict[str, Any]] = [{}]
+        self.claves: List[str] = [""]  # JSON de cada props de la tabla
+        self.id_props: Dict[str, int] = {}
+
+    def internar(self, props: Optional[Dict[str, Any]]) -> int:
+        if not props:
+            return 0
+        clave = json.dumps(props, sort_keys=True, default=str)
+        pid = self.id_props.get(clave)
+        if pid is None:
+            pid = self.id_props[clave] = len(self.tabla)
+            self.tabla.append(_copiar(props))
+            self.claves.append(clave)
+        return pid
+
+    def fila(self, nombre: str) -> int:
+        i = self.ids.get(nombre)
+        if i is None:
+            i = self.ids[nombre] = len(self.nombres)
+            self.nombres.append(nombre)
+            self.codigos.append(0)
+            self.props.extend((0, 0, 0))
+        return i
+
+    def firma(self, i: int) -> Tuple[Any, ...]:
+        # Por contenido de las props: los ids no se comparan entre versiones
+        return (self.codigos[i], *(self.claves[p] for p in self.props[3 * i:3 * i + 3]))
+
+
+class InstantaneaFN:
+    """Estado de FN de todos los esquemas, servido sin ir al grafo.
+
+    - cargar(filas) arma una versión nueva a partir de un recorrido completo
+      (al inicio y en cada reconciliación) y la reemplaza de una vez; lo que
+      se aplicó mientras tanto se vuelve a aplicar sobre la nueva.
+    - aplicar(esquema, estados) actualiza un esquema después de escribirlo.
+    - quitar(esquemas) olvida esquemas borrados del grafo.
+    - filas(params) devuelve las mismas filas que Q_ESTADO_FN_UNA/TODAS, o
+      None si el esquema no está (el llamador va al grafo).
+    """
+
+    def __init__(self) -> None:
+        self._datos: Optional[_Datos] = None
+        # Escrituras durante una carga; None = esquema borrado
+        self._durante_carga: Optional[Dict[str, Optional[Dict[str, Tuple[str, Dict[str, Any]]]]]] = None
+        self._lock = threading.Lock()
+        self.cargada_en = 0.0
+        self.actualizada_en = 0.0
+        self.carga_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.aplicados = 0
+        self.cargas = 0
+        self.diferencias_ultima = 0
+
+    @property
+    def cargada(self) -> bool:
+        return self._datos is not None
+
+    def _escribir(self, datos: _Datos, nombre: str, estados: Dict[str, Tuple[str, Dict[str, Any]]]) -> None:
+        i = datos.fila(nombre)
+        codigo = 0
+        pids = [0, 0, 0]
+        for k, fn in enumerate(FNS):
+            if fn in estados:
+                estado, props = estados[fn]
+                codigo |= _CODIGOS[estado] << (2 * k)
+                pids[k] = datos.internar(props)
+        datos.codigos[i] = codigo
+        datos.props[3 * i:3 * i + 3] = array("I", pids)
+
+    # ---------- escritura ----------
+
+    def cargar(self, filas: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Reemplaza todo con un recorrido completo del grafo.
+
+        `filas`: {esquema, forma_normal, estado, props}, una por arista
+        CUMPLE/NO_CUMPLE (forma_normal None para esquemas sin evaluar).
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            self._durante_carga = {}
+        nuevos = _Datos()
+        try:
+            por_esquema: Dict[str, Dict[str, Tuple[str, Dict[str, Any]]]] = {}
+            for f in filas:
+                estados = por_esquema.setdefault(f["esquema"], {})
+                if f.get("forma_normal") in FNS and f.get("estado") in _CODIGOS:
+                    estados[f["forma_normal"]] = (f["estado"], f.get("props") or {})
+            with self._lock:
+                for nombre, estados in por_esquema.items():
+                    self._escribir(nuevos, nombre, estados)
+                # Escrituras que llegaron durante el recorrido: ganan sobre el scan
+                for nombre, estados in self._durante_carga.items():
+                    if estados is None:
+                        nuevos.ids.pop(nombre, None)
+                    else:
+                        self._escribir(nuevos, nombre, estados)
+                viejos = self._datos
+                diferencias = self._diferencias(viejos, nuevos) if viejos is not None else 0
+                self._datos = nuevos
+                self.cargas += 1
+                self.diferencias_ultima = diferencias
+                self.cargada_en = self.actualizada_en = time.time()
+                self.carga_ms = round((time.perf_counter() - t0) * 1000, 1)
+        finally:
+            with self._lock:
+                self._durante_carga = None
+        return {"esquemas": len(nuevos.ids), "diferencias": diferencias, "ms": self.carga_ms}
+
+    @staticmethod
+    def _diferencias(viejos: _Datos, nuevos: _Datos) -> int:
+        n = sum(1 for nombre in viejos.ids if nombre not in nuevos.ids)
+        for nombre, i in nuevos.ids.items():
+            j = viejos.ids.get(nombre)
+            if j is None or viejos.firma(j) != nuevos.firma(i):
+                n += 1
+        return n
+
+    def aplicar(self, esquema: str, estados: Dict[str, Tuple[str, Dict[str, Any]]]) -> None:
+        """Estado nuevo de un esquema recién escrito ({fn: (CUMPLE|NO_CUMPLE, props)})."""
+        with self._lock:
+            if self._durante_carga is not None:
+                self._durante_carga[esquema] = estados
+            if self._datos is None:
+                return
+            self._escribir(self._datos, esquema, estados)
+            self.aplicados += 1
+            self.actualizada_en = time.time()
+
+    def quitar(self, *esquemas: str) -> None:
+        """Olvida esquemas borrados: su fila queda huérfana hasta la próxima
+        carga y una lectura vuelve a ir al grafo."""
+        with self._lock:
+            for esquema in esquemas:
+                if self._durante_carga is not None:
+                    self._durante_carga[esquema] = None
+                if self._datos is not None and self._datos.ids.pop(esquema, None) is not None:
+                    self.aplicados += 1
+                    self.actualizada_en = time.time()
+
+    def vaciar(self) -> None:
+        with self._lock:
+            self._datos = None
+
+    # ---------- lectura ----------
+
+    def filas(self, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        nombre = params["esquema"]
+        with self._lock:
+            datos = self._datos
+            i = datos.ids.get(nombre) if datos is not None else None
+            if i is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            codigo = datos.codigos[i]
+            props = [datos.tabla[p] for p in datos.props[3 * i:3 * i + 3]]
+
+        def _estado(k: int) -> Optional[str]:
+            return _ESTADOS[(codigo >> (2 * k)) & 3]
+
+        if "fn" in params:
+            fn = params["fn"]
+            k = FNS.index(fn) if fn in FNS else None
+            estado = _estado(k) if k is not None else None
+            return [{
+                "esquema": nombre,
+                "forma_normal": fn,
+                "estado": estado or "SIN_EVALUAR",
+                "datos_cumple": _copiar(props[k]) if estado == "CUMPLE" else None,
+                "datos_no_cumple": _copiar(props[k]) if estado == "NO_CUMPLE" else None,
+            }]
+        filas = [
+            {"esquema": nombre, "forma_normal": fn, "tipo_rel": estado, "estado": estado,
+             "detalles": _copiar(props[k])}
+            for k, fn in enumerate(FNS) if (estado := _estado(k))
+        ]
+        return filas or [{"esquema": nombre, "forma_normal": None, "tipo_rel": None,
+                          "estado": "SIN_EVALUAR", "detalles": None}]
+
+    # ---------- reporte ----------
+
+    def bytes_aprox(self) -> int:
+        """Memoria aproximada: estructuras + strings de nombres + tabla de props."""
+        with self._lock:
+            datos = self._datos
+            if datos is None:
+                return 0
+            total = (sys.getsizeof(datos.ids) + sys.getsizeof(datos.nombres)
+                     + sys.getsizeof(datos.codigos) + sys.getsizeof(datos.props))
+            total += sum(sys.getsizeof(n) for n in datos.nombres)
+            total += sys.getsizeof(datos.tabla) + sys.getsizeof(datos.id_props) + sys.getsizeof(datos.claves)
+            total += sum(sys.getsizeof(c) for c in datos.id_props)  # JSON de cada props ~ su tamaño
+            return total
+
+    def stats(self) -> Dict[str, Any]:
+        ahora = time.time()
+        lecturas = self.hits + self.misses
+        return {
+            "cargada": self.cargada,
+            "esquemas": len(self._datos.ids) if self._datos is not None else 0,
+            "props_distintas": len(self._datos.tabla) - 1 if self._datos is not None else 0,
+            "bytes": self.bytes_aprox(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lecturas) if lecturas else 0.0,
+            "aplicados": self.aplicados,
+            "cargas": self.cargas,
+            "carga_ms": self.carga_ms,
+            "diferencias_ultima_reconciliacion": self.diferencias_ultima,
+            "edad_s": round(ahora - self.cargada_en, 1) if self.cargada else None,
+            "ultima_actualizacion_hace_s": round(ahora - self.actualizada_en, 1) if self.cargada else None,
+        }
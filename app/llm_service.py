@@ -1,11 +1,26 @@
 # llm_service.py — LangChain (LCEL) + router de intención para EduDB
+import asyncio
+import json
 import os
-from typing import Dict, Any, Literal, Optional
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import AsyncIterator, Dict, Any, Iterable, List, Literal, Optional
+import requests
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_community.llms import Ollama
+from langchain_core.output_parsers import PydanticOutputParser, StrOutputParser
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+from langchain_core.outputs import LLMResult
+
+from app.agent import _norm_text
+from app.cache import LRUCache
+from app.metricas import ERRORES_TOTAL, LLM_SEGUNDOS, registrar_colector
+from app.resiliencia import ABIERTO, CircuitBreaker
+from app.similitud import CacheSimilitud
 
 load_dotenv()
 
@@ -14,15 +29,63 @@ OLLAMA_BASE = os.getenv("CLOUD_OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("LLM_MODEL", "gpt-oss:120b-cloud")
 API_TOKEN = os.getenv("API_TOKEN", "")
 TEMPERATURE = 0.2  # baja temperatura para respuestas más precisas
+ROUTER_REGLAS = os.getenv("ROUTER_REGLAS", "1") != "0"  # pre-router determinístico
+ROUTER_CACHE_MAX = int(os.getenv("ROUTER_CACHE_MAX", "1024"))
+ROUTER_CACHE_TTL = float(os.getenv("ROUTER_CACHE_TTL", "900"))  # segundos
+ROUTER_SIMILITUD = os.getenv("ROUTER_SIMILITUD", "1") != "0"  # cache por paráfrasis
+ROUTER_SIMILITUD_UMBRAL = float(os.getenv("ROUTER_SIMILITUD_UMBRAL", "0.8"))  # coseno mínimo
+ROUTER_SIMILITUD_MAX = int(os.getenv("ROUTER_SIMILITUD_MAX", "512"))  # consultas recientes guardadas
+ROUTER_LOTE_MS = float(os.getenv("ROUTER_LOTE_MS", "5"))  # ventana de micro-batching (0 = desactivado)
+ROUTER_LOTE_MAX = int(os.getenv("ROUTER_LOTE_MAX", "16"))  # consultas por lote como máximo
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # cuánto queda cargado el modelo
+OLLAMA_WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", "120"))  # s para cargar el modelo
+STREAM_EXPLICAR = os.getenv("STREAM_EXPLICAR", "1") != "0"  # explicación en /api/query/stream
+# "completo" = prompt con ejemplos + format_instructions; "compacto" = prefijo corto
+# estático y salida JSON nativa de Ollama (format="json")
+ROUTER_PROMPT = os.getenv("ROUTER_PROMPT", "completo")
+# Guardas de latencia del LLM
+ROUTER_TIMEOUT_S = float(os.getenv("ROUTER_TIMEOUT_S", "10"))  # tope por llamada de ruteo
+ROUTER_LENTO_MS = float(os.getenv("ROUTER_LENTO_MS", "5000"))  # más que esto cuenta como falla
+CIRCUITO_FALLAS = int(os.getenv("CIRCUITO_FALLAS", "5"))  # fallas seguidas para abrir
+CIRCUITO_REAPERTURA_S = float(os.getenv("CIRCUITO_REAPERTURA_S", "30"))  # abierto antes de probar
+ROUTER_HILOS = int(os.getenv("ROUTER_HILOS", "8"))  # llamadas sync al LLM en vuelo a la vez
 
 # ================================
 # Modelo del LLM (Ollama local/remoto)
 # ================================
-llm = Ollama(
-    model=OLLAMA_MODEL,
-    base_url=OLLAMA_BASE,
-    temperature=TEMPERATURE,
-)
+# El cliente se crea al primer uso: importar el módulo no toca la red ni
+# carga langchain_community (que es lo más lento del import).
+_llms: Dict[str, Any] = {}
+_cadenas: Dict[tuple, Any] = {}
+_llm_lock = threading.Lock()
+
+def _timeout_cliente() -> int:
+    """Timeout del cliente Ollama: nunca mayor que ROUTER_TIMEOUT_S.
+
+    Es el que de verdad libera el hilo del pool (el cliente solo acepta
+    segundos enteros, así que se redondea hacia abajo con piso de 1 s).
+    """
+    return max(1, int(ROUTER_TIMEOUT_S))
+
+def get_llm(formato: str = ""):
+    """Cliente Ollama compartido. formato="json" activa la salida JSON nativa."""
+    llm = _llms.get(formato)
+    if llm is None:
+        with _llm_lock:
+            llm = _llms.get(formato)
+            if llm is None:
+                from langchain_community.llms import Ollama
+
+                llm = Ollama(
+                    model=OLLAMA_MODEL,
+                    base_url=OLLAMA_BASE,
+                    temperature=TEMPERATURE,
+                    keep_alive=OLLAMA_KEEP_ALIVE,
+                    format=formato or None,
+                    timeout=_timeout_cliente(),
+                )
+                _llms[formato] = llm
+    return llm
 
 # ================================
 # Esquemas Pydantic (intents EduDB)
@@ -50,16 +113,36 @@ class RequisitosFNParams(BaseModel):
     forma_normal: Optional[str] = None
 
 
+class ListarEsquemasParams(BaseModel):
+    """
+    Para preguntas tipo:
+    - "qué esquemas no cumplen 3FN"
+    - "listá los esquemas con clave compuesta"
+    - "esquemas con más de 5 atributos"
+    """
+    forma_normal: Optional[str] = None
+    estado: Optional[str] = None          # "CUMPLE", "NO_CUMPLE", "SIN_EVALUAR"
+    pk_compuesta: Optional[bool] = None
+    min_atributos: Optional[int] = None
+    max_atributos: Optional[int] = None
+
+
 class Route(BaseModel):
     intent: Literal[
         "estado_fn",       # saber si cumple/no cumple, o qué FN tiene un esquema
         "requisitos_fn",   # saber qué se requiere para cumplir una FN
+        "listar_esquemas", # listar/filtrar esquemas (por FN, PK compuesta, cantidad de atributos)
         "desconocido",
     ] = "desconocido"
     params: Dict[str, Any] = Field(default_factory=dict)
 
 
+class RutasLote(BaseModel):
+    rutas: List[Route] = Field(default_factory=list)
+
+
 parser = PydanticOutputParser(pydantic_object=Route)
+parser_lote = PydanticOutputParser(pydantic_object=RutasLote)
 
 # ================================
 # Prompt de routing de intención
@@ -103,11 +186,24 @@ Intents válidos:
      - forma_normal (str, opcional): la FN de la que se habla ("1FN", "2FN", "3FN") si aparece.
      - esquema (str, opcional): nombre del esquema si se menciona ("Pedido", etc.).
 
+3) "listar_esquemas"
+   Usalo cuando el usuario quiera VER VARIOS esquemas, o todos, con o sin filtros.
+   Ejemplos:
+   - "qué esquemas no cumplen 3FN"
+   - "listá los esquemas con clave primaria compuesta"
+   - "mostrame los esquemas con más de 5 atributos"
+   - "cuáles esquemas están sin evaluar"
+   Params:
+     - forma_normal (str, opcional): la FN por la que se filtra ("1FN", "2FN", "3FN").
+     - estado (str, opcional): "CUMPLE", "NO_CUMPLE" o "SIN_EVALUAR".
+     - pk_compuesta (bool, opcional): true si pide clave compuesta, false si pide clave simple.
+     - min_atributos / max_atributos (int, opcional): límites de cantidad de atributos.
+
 Reglas:
 - No inventes campos. Si no se menciona una forma normal o un esquema, dejalos en null.
 - Extraé los nombres de esquemas y formas normales tal como aparezcan en el texto,
   pero normalizá la forma normal (1fn → 1FN, "primera forma normal" → 1FN, etc.).
-- Si la pregunta no encaja claramente en ninguno de los dos intents, usá intent="desconocido".
+- Si la pregunta no encaja claramente en ninguno de los intents, usá intent="desconocido".
 - La salida DEBE ser SOLO el JSON, sin explicaciones ni texto adicional.
 
 Usuario: {text}
@@ -120,8 +216,184 @@ prompt = PromptTemplate(
     partial_variables={"format_instructions": parser.get_format_instructions()},
 )
 
-# Cadena LCEL: prompt -> llm -> parser
-chain = prompt | llm | parser
+
+# Variante multi-consulta para el micro-batching: mismas instrucciones,
+# pero varias consultas numeradas y una lista de rutas como salida.
+template_lote = template.rsplit("Usuario:", 1)[0] + """
+Esta vez hay VARIAS consultas numeradas. Devolvé una ruta por consulta, en el
+mismo orden: la ruta i de la lista "rutas" corresponde a la consulta [i].
+
+Consultas:
+{consultas}
+Salida:
+"""
+
+prompt_lote = PromptTemplate(
+    template=template_lote,
+    input_variables=["consultas"],
+    partial_variables={"format_instructions": parser_lote.get_format_instructions()},
+)
+
+# ================================
+# Prompt compacto (ROUTER_PROMPT=compacto)
+# ================================
+# Todo lo estático va primero y la consulta al final: el servidor de Ollama
+# reutiliza el KV cache del prefijo entre llamadas. El esquema de salida va
+# resumido en una línea en lugar de las format_instructions completas.
+
+template_compacto = """Clasificá consultas de un asistente de formas normales (EduDB).
+Respondé SOLO JSON: {{"intent": "estado_fn"|"requisitos_fn"|"listar_esquemas"|"desconocido", "params": {{"esquema": str|null, "forma_normal": "1FN"|"2FN"|"3FN"|null}}}}
+estado_fn: si un esquema cumple una FN o en qué FN está ("¿Pedido cumple 2FN?").
+requisitos_fn: qué pide una FN o qué le falta a un esquema ("qué se requiere para 3FN").
+listar_esquemas: varios esquemas con filtros ("qué esquemas no cumplen 3FN"); params opcionales
+estado ("CUMPLE"|"NO_CUMPLE"|"SIN_EVALUAR"), pk_compuesta (bool), min_atributos, max_atributos (int).
+desconocido: cualquier otra cosa. Lo que no se mencione va en null.
+"""
+
+prompt_compacto = PromptTemplate(
+    template=template_compacto + "Consulta: {text}\nJSON:",
+    input_variables=["text"],
+)
+
+prompt_lote_compacto = PromptTemplate(
+    template=template_compacto
+    + 'Varias consultas: devolvé {{"rutas": [...]}} con una ruta por consulta, en el mismo orden.\n'
+    + "Consultas:\n{consultas}\nJSON:",
+    input_variables=["consultas"],
+)
+
+# ================================
+# Prompt de explicación (modo streaming)
+# ================================
+
+template_explicacion = """
+Sos un asistente docente de normalización de bases de datos (EduDB).
+El usuario preguntó: {text}
+El grafo de conocimiento respondió con este JSON:
+{resultado}
+
+Explicá el resultado en 2 a 4 oraciones, en español y sin inventar datos que
+no estén en el JSON. Si el esquema no cumple una forma normal, mencioná qué
+dependencias lo impiden.
+Explicación:
+"""
+
+prompt_explicacion = PromptTemplate(
+    template=template_explicacion,
+    input_variables=["text", "resultado"],
+)
+
+# ================================
+# Conteo de tokens por cadena
+# ================================
+
+class ContadorTokens(BaseCallbackHandler):
+    """Acumula los contadores que Ollama devuelve al terminar cada generación
+    (prompt_eval_count / eval_count y sus duraciones)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.tokens_prompt = 0
+        self.tokens_respuesta = 0
+        self.prompt_eval_ms = 0.0
+        self.eval_ms = 0.0
+        self.ultima: Dict[str, Any] = {}
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for gens in response.generations:
+            info = (gens[0].generation_info if gens else None) or {}
+            ultima = {
+                "tokens_prompt": int(info.get("prompt_eval_count") or 0),
+                "tokens_respuesta": int(info.get("eval_count") or 0),
+                "prompt_eval_ms": (info.get("prompt_eval_duration") or 0) / 1e6,
+                "eval_ms": (info.get("eval_duration") or 0) / 1e6,
+            }
+            with self._lock:
+                self.llamadas += 1
+                self.tokens_prompt += ultima["tokens_prompt"]
+                self.tokens_respuesta += ultima["tokens_respuesta"]
+                self.prompt_eval_ms += ultima["prompt_eval_ms"]
+                self.eval_ms += ultima["eval_ms"]
+                self.ultima = ultima
+
+    def stats(self) -> Dict[str, Any]:
+        n = self.llamadas
+        return {
+            "llamadas": n,
+            "tokens_prompt": self.tokens_prompt,
+            "tokens_respuesta": self.tokens_respuesta,
+            "tokens_prompt_medio": (self.tokens_prompt / n) if n else 0.0,
+            "tokens_respuesta_medio": (self.tokens_respuesta / n) if n else 0.0,
+            "prompt_eval_ms_medio": round(self.prompt_eval_ms / n, 1) if n else 0.0,
+            "eval_ms_medio": round(self.eval_ms / n, 1) if n else 0.0,
+            "ultima": dict(self.ultima),
+        }
+
+_tokens: Dict[str, ContadorTokens] = {}
+
+def estadisticas_tokens() -> Dict[str, Any]:
+    """Tokens de prompt/respuesta por cadena ("ruteo:compacto", "explicacion", ...)."""
+    return {nombre: c.stats() for nombre, c in _tokens.items()}
+
+# ================================
+# Cadenas LCEL (perezosas)
+# ================================
+
+def get_chain(nombre: str = "ruteo", modo: Optional[str] = None):
+    """Cadenas LCEL sobre el LLM compartido:
+      - "ruteo":       prompt -> llm -> parser (una consulta → Route)
+      - "lote":        prompt_lote -> llm -> parser_lote (varias consultas → RutasLote)
+      - "explicacion": prompt_explicacion -> llm -> texto (se consume con astream)
+
+    modo ("completo" / "compacto", por defecto ROUTER_PROMPT) solo aplica a
+    ruteo y lote. Cada cadena cuenta sus tokens en estadisticas_tokens().
+    """
+    modo = modo or ROUTER_PROMPT
+    if modo not in ("completo", "compacto"):
+        raise ValueError(f"Modo de prompt desconocido: {modo}")
+    clave = (nombre, modo if nombre != "explicacion" else "")
+    cadena = _cadenas.get(clave)
+    if cadena is None:
+        compacto = modo == "compacto"
+        llm = get_llm("json" if compacto and nombre != "explicacion" else "")
+        if nombre == "ruteo":
+            cadena = (prompt_compacto if compacto else prompt) | llm | parser
+        elif nombre == "lote":
+            cadena = (prompt_lote_compacto if compacto else prompt_lote) | llm | parser_lote
+        elif nombre == "explicacion":
+            cadena = prompt_explicacion | llm | StrOutputParser()
+        else:
+            raise ValueError(f"Cadena desconocida: {nombre}")
+        etiqueta = ":".join(filter(None, clave))
+        contador = _tokens.setdefault(etiqueta, ContadorTokens())
+        cadena = cadena.with_config(callbacks=[contador], run_name=etiqueta)
+        _cadenas[clave] = cadena
+    return cadena
+
+def _calentar_modelo() -> None:
+    # /api/generate sin prompt solo carga el modelo en memoria (keep_alive)
+    headers = {"Authorization": f"Bearer {API_TOKEN}"} if API_TOKEN else {}
+    r = requests.post(
+        f"{OLLAMA_BASE.rstrip('/')}/api/generate",
+        json={"model": OLLAMA_MODEL, "keep_alive": OLLAMA_KEEP_ALIVE},
+        headers=headers,
+        timeout=OLLAMA_WARMUP_TIMEOUT,
+    )
+    r.raise_for_status()
+
+async def calentar_llm() -> Dict[str, Any]:
+    """Construye el cliente y las cadenas y pide a Ollama que cargue el modelo."""
+    t0 = time.perf_counter()
+    for nombre in ("ruteo", "lote", "explicacion"):
+        get_chain(nombre)
+    t_cadenas = time.perf_counter()
+    await asyncio.to_thread(_calentar_modelo)
+    return {
+        "modelo": OLLAMA_MODEL,
+        "cadenas_ms": round((t_cadenas - t0) * 1000, 1),
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
 
 # ================================
 # Normalizaciones útiles
@@ -156,39 +428,654 @@ def _norm_forma_normal(x: Optional[str]) -> Optional[str]:
     t = str(x).lower().replace(" ", "")
     return _FN_MAP.get(t, x.strip())
 
+# ================================
+# Pre-router determinístico (sin LLM)
+# ================================
+
+# Esquemas que el router reconoce aunque el texto no diga "esquema X"
+# (casefold → nombre). El arranque los carga del grafo; después se suman los
+# que escribe la app y los de la variable de entorno.
+ESQUEMAS_CONOCIDOS: Dict[str, str] = {
+    n.strip().casefold(): n.strip() for n in os.getenv("ESQUEMAS_CONOCIDOS", "").split(",") if n.strip()
+}
+
+_RE_FN = re.compile(
+    r"\b(?:([123])\s*(?:fn|nf)|(primera|segunda|tercera)\s+forma(?:\s+normal)?)\b"
+)
+_RE_REQUISITOS = re.compile(
+    r"\b(?:requiere|requieren|requisitos?|condicion(?:es)?|pide|exige|necesita|"
+    r"falta|explicame|explica|significa|definicion)\b"
+)
+_RE_ESTADO = re.compile(
+    r"\b(?:cumple|cumplen|esta en|estan en|en que forma normal|formas normales cumple|"
+    r"que formas normales)\b"
+)
+_RE_LISTAR = re.compile(
+    r"\b(?:(?:que|cuales) (?:son (?:los )?)?esquemas|list(?:a|ar|ame|ado)|"
+    r"(?:mostrame|muestra|mostrar|dame) (?:los |todos los )?esquemas|todos los esquemas)\b"
+)
+_RE_SIN_EVALUAR = re.compile(r"\b(?:sin evaluar|no evaluados?)\b")
+_RE_NO_CUMPLE = re.compile(r"\b(?:no (?:cumple|cumplen|esta|estan)|fallan?|violan?|incumplen?)\b")
+_RE_PK = re.compile(r"\b(?:pk|clave(?: primaria)?) (compuesta|simple)\b")
+_RE_N_ATRIBUTOS = re.compile(
+    r"\b(mas de|menos de|al menos|como minimo|como maximo|hasta|con)? ?(\d+) atributos\b"
+)
+_RE_ESQUEMA_EXPLICITO = re.compile(r"\besquema\s+([A-Za-z_]\w*)", re.IGNORECASE)
+_RE_PALABRA = re.compile(r"[A-Za-z_]\w*")
+
+# Palabras que pueden seguir a "esquema" sin ser un nombre de esquema
+_NO_ESQUEMA = {
+    "para", "que", "de", "del", "en", "el", "la", "un", "una", "esta", "cumple",
+    "tiene", "debe", "normalizado", "relacional",
+}
+
+# route_query corre en hilos del threadpool y en el event loop a la vez
+_RUTEO_STATS: Dict[str, int] = {"reglas": 0, "cache": 0, "similar": 0, "llm": 0, "degradado": 0}
+_ruteo_lock = threading.Lock()
+
+
+def _contar_ruta(camino: str) -> None:
+    with _ruteo_lock:
+        _RUTEO_STATS[camino] += 1
+
+
+def registrar_esquemas(nombres: Iterable[str]) -> None:
+    """Agrega nombres de esquemas a los que reconoce el pre-router."""
+    for n in nombres:
+        n = _norm_text(n)
+        if n:
+            ESQUEMAS_CONOCIDOS.setdefault(n.casefold(), n)
+
+
+def estadisticas_ruteo() -> Dict[str, Any]:
+    """Cuántas consultas resolvió cada camino (reglas, cache, similitud, LLM o
+    router degradado con el circuito abierto)."""
+    with _ruteo_lock:
+        stats = dict(_RUTEO_STATS)
+    total = sum(stats.values())
+    return {
+        **stats,
+        "total": total,
+        "esquemas_conocidos": len(ESQUEMAS_CONOCIDOS),
+        "proporcion_reglas": (stats["reglas"] / total) if total else 0.0,
+        "proporcion_sin_llm": ((total - stats["llm"]) / total) if total else 0.0,
+        "cache_rutas": _route_cache.stats(),
+        "similitud": {"activo": ROUTER_SIMILITUD, **_similares.stats()},
+        "lotes": _agrupador.stats(),
+        "prompt": ROUTER_PROMPT,
+        "tokens": estadisticas_tokens(),
+        "circuito": _circuito.stats(),
+    }
+
+
+def _extraer_fns(plano: str) -> List[str]:
+    fns: List[str] = []
+    for m in _RE_FN.finditer(plano):
+        clave = f"{m.group(1)}fn" if m.group(1) else f"{m.group(2)}forma"
+        fn = _FN_MAP[clave]
+        if fn not in fns:
+            fns.append(fn)
+    return fns
+
+
+def _extraer_esquemas(texto: str) -> List[str]:
+    encontrados: List[str] = []
+    for m in _RE_ESQUEMA_EXPLICITO.finditer(texto):
+        nombre = m.group(1)
+        if nombre.casefold() in _NO_ESQUEMA:
+            continue
+        nombre = ESQUEMAS_CONOCIDOS.get(nombre.casefold(), nombre)
+        if nombre not in encontrados:
+            encontrados.append(nombre)
+    for palabra in _RE_PALABRA.findall(texto):
+        nombre = ESQUEMAS_CONOCIDOS.get(palabra.casefold())
+        if nombre and nombre not in encontrados:
+            encontrados.append(nombre)
+    return encontrados
+
+
+def _filtros_listado(plano: str) -> Optional[Dict[str, Any]]:
+    """Params de listar_esquemas a partir del texto; None si es ambiguo."""
+    fns = _extraer_fns(plano)
+    if len(fns) > 1:
+        return None
+    params: Dict[str, Any] = {"forma_normal": fns[0] if fns else None}
+    if _RE_SIN_EVALUAR.search(plano):
+        params["estado"] = "SIN_EVALUAR"
+    elif _RE_NO_CUMPLE.search(plano):
+        params["estado"] = "NO_CUMPLE"
+    elif _RE_ESTADO.search(plano) or fns:
+        params["estado"] = "CUMPLE"
+    m = _RE_PK.search(plano)
+    if m:
+        params["pk_compuesta"] = m.group(1) == "compuesta"
+    for m in _RE_N_ATRIBUTOS.finditer(plano):
+        cota, n = m.group(1), int(m.group(2))
+        if cota == "mas de":
+            params["min_atributos"] = n + 1
+        elif cota in ("al menos", "como minimo"):
+            params["min_atributos"] = n
+        elif cota == "menos de":
+            params["max_atributos"] = n - 1
+        elif cota in ("como maximo", "hasta"):
+            params["max_atributos"] = n
+        else:
+            params["min_atributos"] = params["max_atributos"] = n
+    return params
+
+
+def _rutear_por_reglas(text: str) -> Optional[Dict[str, Any]]:
+    """Intenta resolver la intención sin LLM.
+
+    Devuelve la ruta solo cuando no hay ambigüedad: una única familia de
+    intent, un único esquema y los parámetros obligatorios presentes.
+    En cualquier otro caso devuelve None y decide el LLM.
+    """
+    texto = _norm_text(text)
+    if not texto:
+        return None
+    plano = " ".join(texto.lower().split())
+
+    if _RE_LISTAR.search(plano):
+        # Un esquema puntual mencionado no es un listado: que decida el LLM
+        if _extraer_esquemas(texto):
+            return None
+        params = _filtros_listado(plano)
+        return {"intent": "listar_esquemas", "params": params} if params is not None else None
+
+    es_requisitos = bool(_RE_REQUISITOS.search(plano))
+    es_estado = bool(_RE_ESTADO.search(plano))
+    if es_requisitos == es_estado:
+        return None
+
+    fns = _extraer_fns(plano)
+    esquemas = _extraer_esquemas(texto)
+    if len(esquemas) > 1:
+        return None
+    esquema = esquemas[0] if esquemas else None
+
+    if es_estado:
+        if not esquema:
+            return None
+        # "¿Pedido está en 1FN, 2FN o 3FN?" → pregunta por todas
+        forma_normal = fns[0] if len(fns) == 1 else None
+        return {
+            "intent": "estado_fn",
+            "params": {"esquema": esquema, "forma_normal": forma_normal},
+        }
+
+    if len(fns) != 1:
+        return None
+    # "qué le falta a X para..." con X desconocido: que lo resuelva el LLM
+    if not esquema and re.search(r"\bfalta\b", plano):
+        return None
+    return {
+        "intent": "requisitos_fn",
+        "params": {"esquema": esquema, "forma_normal": fns[0]},
+    }
+
+# ================================
+# Cache de rutas (LRU + TTL)
+# ================================
+
+_route_cache = LRUCache(maxsize=ROUTER_CACHE_MAX, ttl=ROUTER_CACHE_TTL)
+
+
+def _clave_consulta(text: str) -> Optional[str]:
+    """Sin tildes, en minúsculas y con espacios colapsados."""
+    t = _norm_text(text)
+    if not t:
+        return None
+    return " ".join(t.casefold().split())
+
+
+def invalidar_cache_rutas() -> int:
+    """Vacía el cache de rutas (exacto y por similitud). Devuelve cuántas entradas se borraron."""
+    return _route_cache.invalidar() + _similares.invalidar()
+
+# ================================
+# Cache por similitud (paráfrasis)
+# ================================
+# Las consultas se guardan como "plantillas": el esquema y las formas
+# normales se reemplazan por marcadores antes de vectorizar. Así
+# "¿Pedido está en 2FN?" sirve para "¿el esquema cliente cumple la 3fn?",
+# y el esquema / la FN se vuelven a extraer SIEMPRE del texto nuevo.
+
+_similares = CacheSimilitud(maxsize=ROUTER_SIMILITUD_MAX, umbral=ROUTER_SIMILITUD_UMBRAL)
+
+def _plantilla(text: str, esquema: Optional[str]) -> tuple[str, List[str]]:
+    """Devuelve (texto con marcadores, formas normales mencionadas)."""
+    plano = " ".join((_norm_text(text) or "").casefold().split())
+    fns = _extraer_fns(plano)
+    if esquema:
+        plano = re.sub(rf"\b{re.escape((_norm_text(esquema) or '').casefold())}\b", "§", plano)
+    return _RE_FN.sub("¤", plano), fns
+
+def _ruta_similar(text: str) -> Optional[Dict[str, Any]]:
+    esquemas = _extraer_esquemas(_norm_text(text) or "")
+    if len(esquemas) > 1:
+        return None
+    esquema = esquemas[0] if esquemas else None
+    plantilla, fns = _plantilla(text, esquema)
+    guardada, _ = _similares.buscar(plantilla)
+    if guardada is None:
+        return None
+
+    # La entidad nunca viene del cache: tiene que aparecer en la consulta nueva
+    if guardada["con_esquema"] != bool(esquema) or guardada["n_fns"] != len(fns):
+        _similares.rechazar()
+        return None
+    params = dict(guardada["params"])
+    if "esquema" in params:
+        params["esquema"] = esquema
+    if params.get("forma_normal"):
+        params["forma_normal"] = fns[0] if len(fns) == 1 else None
+        if params["forma_normal"] is None:
+            _similares.rechazar()
+            return None
+    return {"intent": guardada["intent"], "params": params, "via": "similar"}
+
+def _guardar_similar(text: str, routed: Dict[str, Any]) -> None:
+    # Los filtros de un listado (estado, cantidades) no se re-extraen del
+    # texto nuevo: una paráfrasis parecida podría heredar otros números
+    if routed["intent"] == "listar_esquemas":
+        return
+    esquema = routed["params"].get("esquema")
+    plantilla, fns = _plantilla(text, esquema)
+    # Si el esquema que devolvió el LLM no está literal en el texto, la
+    # plantilla no lo enmascara y no se podría re-extraer: no se guarda.
+    if esquema and "§" not in plantilla:
+        return
+    _similares.agregar(plantilla, {
+        "intent": routed["intent"],
+        "params": dict(routed["params"]),
+        "con_esquema": bool(esquema),
+        "n_fns": len(fns),
+    })
+
+# ================================
+# Guardas de latencia: circuit breaker + router degradado
+# ================================
+
+_circuito = CircuitBreaker(
+    "llm", fallas_max=CIRCUITO_FALLAS, reapertura_s=CIRCUITO_REAPERTURA_S, lento_ms=ROUTER_LENTO_MS
+)
+
+def estado_circuito() -> Dict[str, Any]:
+    return _circuito.stats()
+
+def _metricas_ruteo():
+    rc, sim, cir = _route_cache.stats(), _similares.stats(), _circuito.stats()
+    tokens = estadisticas_tokens()
+    return [
+        ("edudb_cache_rutas_total", "counter", "Lecturas de los caches de rutas, por cache y resultado.",
+         [({"cache": "exacto", "resultado": "hit"}, rc["hits"]),
+          ({"cache": "exacto", "resultado": "miss"}, rc["misses"]),
+          ({"cache": "similitud", "resultado": "hit"}, sim["hits"]),
+          ({"cache": "similitud", "resultado": "miss"}, sim["misses"])]),
+        ("edudb_circuito_abierto", "gauge", "1 si el circuito del LLM no está cerrado.",
+         [({"circuito": cir["nombre"]}, int(cir["estado"] != "cerrado"))]),
+        ("edudb_circuito_aperturas_total", "counter", "Veces que se abrió el circuito del LLM.",
+         [({"circuito": cir["nombre"]}, cir["aperturas"])]),
+        ("edudb_llm_tokens_total", "counter", "Tokens informados por Ollama, por cadena y tipo.",
+         [({"cadena": n, "tipo": t}, st[f"tokens_{t}"])
+          for n, st in tokens.items() for t in ("prompt", "respuesta")]),
+    ]
+
+registrar_colector(_metricas_ruteo)
+
+def _ruta_degradada(text: str, motivo: str) -> Dict[str, Any]:
+    """Ruteo por palabras clave, sin LLM. Más permisivo que el pre-router:
+    prefiere adivinar a devolver 'desconocido', y lo marca con degradado=True."""
+    ruta = _rutear_por_reglas(text)
+    if ruta is None:
+        texto = _norm_text(text) or ""
+        plano = " ".join(texto.lower().split())
+        fns = _extraer_fns(plano)
+        esquemas = _extraer_esquemas(texto)
+        esquema = esquemas[0] if len(esquemas) == 1 else None
+        fn = fns[0] if len(fns) == 1 else None
+        if _RE_LISTAR.search(plano) and not esquema:
+            ruta = {"intent": "listar_esquemas", "params": _filtros_listado(plano) or {}}
+        elif fn and _RE_REQUISITOS.search(plano):
+            ruta = {"intent": "requisitos_fn", "params": {"esquema": esquema, "forma_normal": fn}}
+        elif esquema:
+            ruta = {"intent": "estado_fn", "params": {"esquema": esquema, "forma_normal": fn}}
+        elif fn:
+            ruta = {"intent": "requisitos_fn", "params": {"esquema": None, "forma_normal": fn}}
+        else:
+            ruta = {"intent": "desconocido", "params": {}}
+    ruta.update({"via": "degradado", "degradado": True, "motivo": motivo})
+    return ruta
+
+def _motivo(e: BaseException) -> str:
+    if isinstance(e, asyncio.TimeoutError):
+        return f"el LLM no respondió en {ROUTER_TIMEOUT_S:g} s"
+    return str(e) or type(e).__name__
+
+def _registrar_llamada(cadena, t0: float, error: Optional[BaseException] = None) -> None:
+    dt = time.perf_counter() - t0
+    nombre = getattr(cadena, "config", {}).get("run_name", "llm")
+    if error is None:
+        resultado = "ok"
+    elif isinstance(error, asyncio.TimeoutError):
+        resultado = "timeout"
+    elif isinstance(error, OutputParserException):
+        resultado = "json_invalido"
+    else:
+        resultado = "error"
+    LLM_SEGUNDOS.observar(dt, nombre, resultado)
+    if error is not None:
+        ERRORES_TOTAL.inc("llm", nombre)
+    # Un JSON mal formado no es culpa del host: no cuenta para el circuito
+    if isinstance(error, OutputParserException):
+        error = None
+    _circuito.registrar(dt * 1000, error)
+
+# La invocación sync corre en un pool propio para que el que llama pueda
+# dejar de esperar a los ROUTER_TIMEOUT_S, como wait_for en la variante async.
+# Un hilo no se puede interrumpir: el worker queda ocupado hasta que el
+# cliente Ollama corta por su propio timeout (ver _timeout_cliente).
+_llm_pool = ThreadPoolExecutor(max_workers=max(1, ROUTER_HILOS), thread_name_prefix="llm-ruteo")
+
+def _llamar_llm(cadena, entrada: Dict[str, Any]):
+    """Invoca la cadena en el pool y espera a lo sumo ROUTER_TIMEOUT_S.
+
+    Vencido ese plazo la llamada se abandona, no se cancela: el hilo sigue
+    en cadena.invoke hasta que corta el timeout del cliente Ollama, que es
+    el tope real de ocupación del pool. Ese timeout es por lectura del
+    socket, así que un host colgado libera el hilo a tiempo; uno que sigue
+    mandando tokens lo retiene hasta terminar.
+    """
+    t0 = time.perf_counter()
+    try:
+        futuro = _llm_pool.submit(cadena.invoke, entrada)
+        try:
+            salida = futuro.result(timeout=ROUTER_TIMEOUT_S)
+        except FuturesTimeout:
+            raise asyncio.TimeoutError() from None
+    except Exception as e:
+        _registrar_llamada(cadena, t0, e)
+        raise
+    _registrar_llamada(cadena, t0)
+    return salida
+
+async def _llamar_llm_async(cadena, entrada: Dict[str, Any]):
+    t0 = time.perf_counter()
+    try:
+        salida = await asyncio.wait_for(cadena.ainvoke(entrada), ROUTER_TIMEOUT_S)
+    except Exception as e:
+        _registrar_llamada(cadena, t0, e)
+        raise
+    _registrar_llamada(cadena, t0)
+    return salida
+
 # ================================
 # Función pública: route_query
 # ================================
 
+def _limpiar_ruta(routed: Route) -> Dict[str, Any]:
+    if routed.intent == "estado_fn":
+        ef = EstadoFNParams(**routed.params)
+        clean = {
+            "esquema": _clean_str(ef.esquema),
+            "forma_normal": _norm_forma_normal(ef.forma_normal),
+        }
+        return {"intent": "estado_fn", "params": clean}
+
+    if routed.intent == "requisitos_fn":
+        rf = RequisitosFNParams(**routed.params)
+        clean = {
+            "esquema": _clean_str(rf.esquema),
+            "forma_normal": _norm_forma_normal(rf.forma_normal),
+        }
+        return {"intent": "requisitos_fn", "params": clean}
+
+    if routed.intent == "listar_esquemas":
+        lp = ListarEsquemasParams(**routed.params)
+        estado = (_clean_str(lp.estado) or "").upper().replace(" ", "_") or None
+        clean = {
+            "forma_normal": _norm_forma_normal(lp.forma_normal),
+            "estado": estado,
+            "pk_compuesta": lp.pk_compuesta,
+            "min_atributos": lp.min_atributos,
+            "max_atributos": lp.max_atributos,
+        }
+        return {"intent": "listar_esquemas", "params": {k: v for k, v in clean.items() if v is not None}}
+
+    # Fallback
+    return {"intent": "desconocido", "params": {}}
+
+
+def _ruta_sin_llm(text: str) -> tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Pre-router y cache. Devuelve (ruta o None, clave de cache)."""
+    if ROUTER_REGLAS:
+        rapido = _rutear_por_reglas(text)
+        if rapido is not None:
+            _contar_ruta("reglas")
+            rapido["via"] = "reglas"
+            return rapido, None
+
+    clave = _clave_consulta(text)
+    if clave:
+        cacheado = _route_cache.get(clave)
+        if cacheado is not None:
+            _contar_ruta("cache")
+            return {
+                "intent": cacheado["intent"],
+                "params": dict(cacheado["params"]),
+                "via": "cache",
+            }, clave
+
+    if ROUTER_SIMILITUD:
+        similar = _ruta_similar(text)
+        if similar is not None:
+            _contar_ruta("similar")
+            return similar, clave
+
+    if not _circuito.permite():
+        _contar_ruta("degradado")
+        return _ruta_degradada(text, "circuito del LLM abierto"), clave
+
+    _contar_ruta("llm")
+    return None, clave
+
+
+def _guardar_ruta(clave: Optional[str], routed: Dict[str, Any], text: Optional[str] = None) -> Dict[str, Any]:
+    if routed.get("degradado"):
+        return routed
+    # Solo se cachean los parseos exitosos, nunca los fallbacks 'desconocido'
+    if clave and routed["intent"] != "desconocido":
+        _route_cache.set(clave, {"intent": routed["intent"], "params": dict(routed["params"])})
+        if ROUTER_SIMILITUD and text:
+            _guardar_similar(text, routed)
+    routed["via"] = "llm"
+    return routed
+
+
 def route_query(text: str) -> Dict[str, Any]:
     """
     Recibe el texto del usuario y devuelve algo como:
-      { "intent": "estado_fn", "params": {"esquema": "Pedido", "forma_normal": "2FN"} }
-      { "intent": "requisitos_fn", "params": {"forma_normal": "3FN"} }
-      { "intent": "desconocido", "params": {} }
+      { "intent": "estado_fn", "params": {"esquema": "Pedido", "forma_normal": "2FN"}, "via": "reglas" }
+      { "intent": "requisitos_fn", "params": {"forma_normal": "3FN"}, "via": "llm" }
+      { "intent": "desconocido", "params": {}, "via": "llm" }
+
+    "via" indica qué camino resolvió la consulta: el pre-router por
+    reglas, el cache de rutas, el cache por similitud ("similar"), la
+    cadena LLM o el router degradado ("degradado", con degradado=True)
+    cuando el LLM falla o su circuito está abierto.
     """
+    ruta, clave = _ruta_sin_llm(text)
+    if ruta is not None:
+        return ruta
     try:
-        routed: Route = chain.invoke({"text": text})
+        routed = _limpiar_ruta(_llamar_llm(get_chain(), {"text": text}))
+    except Exception as e:
+        # Falla segura
+        routed = _ruta_degradada(text, _motivo(e))
+    return _guardar_ruta(clave, routed, text)
 
-        if routed.intent == "estado_fn":
-            ef = EstadoFNParams(**routed.params)
-            clean = {
-                "esquema": _clean_str(ef.esquema),
-                "forma_normal": _norm_forma_normal(ef.forma_normal),
-            }
-            return {"intent": "estado_fn", "params": clean}
 
-        if routed.intent == "requisitos_fn":
-            rf = RequisitosFNParams(**routed.params)
-            clean = {
-                "esquema": _clean_str(rf.esquema),
-                "forma_normal": _norm_forma_normal(rf.forma_normal),
-            }
-            return {"intent": "requisitos_fn", "params": clean}
+# ================================
+# Micro-batching del ruteo async
+# ================================
+
+class _AgrupadorRuteo:
+    """Junta las consultas que llegan dentro de una ventana corta y las
+    rutea con una sola generación (prompt multi-consulta).
+
+    Consultas iguales (misma clave de cache) dentro del lote comparten
+    resultado. El lote se despacha al vencer la ventana o apenas se llena.
+    Un lote de una sola consulta usa la cadena normal, así que el usuario
+    solo paga la ventana.
+    """
+
+    def __init__(self, ventana_ms: float, max_lote: int) -> None:
+        self.ventana = ventana_ms / 1000
+        self.max_lote = max(1, max_lote)
+        self._pendientes: List[tuple[str, Optional[str], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.lotes = 0
+        self.consultas = 0
+        self.generaciones = 0
+        self.fallback = 0
+        self.max_observado = 0
+
+    async def rutear(self, text: str, clave: Optional[str]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pendientes.append((text, clave, fut))
+        if len(self._pendientes) >= self.max_lote:
+            self._despachar()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.ventana, self._despachar)
+        return await fut
+
+    def _despachar(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        lote, self._pendientes = self._pendientes, []
+        if lote:
+            asyncio.ensure_future(self._resolver_seguro(lote))
+
+    async def _rutear_uno(self, text: str) -> Dict[str, Any]:
+        self.generaciones += 1
+        try:
+            return _limpiar_ruta(await _llamar_llm_async(get_chain(), {"text": text}))
+        except Exception as e:
+            # Falla segura
+            return _ruta_degradada(text, _motivo(e))
+
+    async def _rutear_varios(self, textos: List[str]) -> List[Dict[str, Any]]:
+        self.generaciones += 1
+        consultas = "\n".join(f"[{i}] {' '.join(t.split())}" for i, t in enumerate(textos))
+        try:
+            salida = await _llamar_llm_async(get_chain("lote"), {"consultas": consultas})
+        except OutputParserException:
+            salida = None
+        except Exception as e:
+            # Timeout o host caído: reintentar de a una solo alargaría la cola
+            return [_ruta_degradada(t, _motivo(e)) for t in textos]
+        if salida is not None and len(getattr(salida, "rutas", None) or ()) == len(textos):
+            try:
+                return [_limpiar_ruta(r) for r in salida.rutas]
+            except Exception:
+                pass  # una ruta con forma inesperada invalida el lote entero
+        # Si la salida del lote no sirve, cada consulta va por su cuenta
+        self.fallback += 1
+        return list(await asyncio.gather(*(self._rutear_uno(t) for t in textos)))
+
+    async def _resolver_seguro(self, lote: List[tuple[str, Optional[str], asyncio.Future]]) -> None:
+        """_resolver sin dejar futures colgados: lo que no se resolvió (por
+        un error o por faltar rutas) recibe la ruta degradada de su texto."""
+        motivo = "lote_incompleto"
+        try:
+            await self._resolver(lote)
+        except Exception as e:
+            motivo = _motivo(e)
+        finally:
+            for text, _, fut in lote:
+                if fut.done():
+                    continue
+                try:
+                    fut.set_result(_ruta_degradada(text, motivo))
+                except Exception as e:
+                    fut.set_exception(e)
+
+    async def _resolver(self, lote: List[tuple[str, Optional[str], asyncio.Future]]) -> None:
+        grupos: Dict[str, List[asyncio.Future]] = {}
+        textos: Dict[str, str] = {}
+        for text, clave, fut in lote:
+            k = clave or text
+            grupos.setdefault(k, []).append(fut)
+            textos.setdefault(k, text)
+
+        self.lotes += 1
+        self.consultas += len(lote)
+        self.max_observado = max(self.max_observado, len(lote))
+
+        claves = list(grupos)
+        if len(claves) == 1:
+            rutas = [await self._rutear_uno(textos[claves[0]])]
+        else:
+            rutas = await self._rutear_varios([textos[k] for k in claves])
+
+        for k, routed in zip(claves, rutas):
+            for fut in grupos[k]:
+                if not fut.done():
+                    fut.set_result({**routed, "params": dict(routed["params"])})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "activo": self.ventana > 0,
+            "ventana_ms": self.ventana * 1000,
+            "max_lote": self.max_lote,
+            "lotes": self.lotes,
+            "consultas": self.consultas,
+            "generaciones": self.generaciones,
+            "fallback": self.fallback,
+            "tamano_medio": (self.consultas / self.lotes) if self.lotes else 0.0,
+            "tamano_max": self.max_observado,
+        }
 
-        # Fallback
-        return {"intent": "desconocido", "params": {}}
 
+_agrupador = _AgrupadorRuteo(ROUTER_LOTE_MS, ROUTER_LOTE_MAX)
+
+
+async def route_query_async(text: str) -> Dict[str, Any]:
+    """Igual que route_query, pero con chain.ainvoke para no bloquear el event loop.
+
+    Con ROUTER_LOTE_MS > 0 las consultas que necesitan al LLM pasan por el
+    agrupador y se rutean en lote junto con las que llegan a la vez.
+    """
+    ruta, clave = _ruta_sin_llm(text)
+    if ruta is not None:
+        return ruta
+    if ROUTER_LOTE_MS > 0:
+        return _guardar_ruta(clave, await _agrupador.rutear(text, clave), text)
+    try:
+        routed = _limpiar_ruta(await _llamar_llm_async(get_chain(), {"text": text}))
     except Exception as e:
         # Falla segura
-        return {"intent": "desconocido", "params": {"error": str(e)}}
+        routed = _ruta_degradada(text, _motivo(e))
+    return _guardar_ruta(clave, routed, text)
+
+
+# ================================
+# Explicación en streaming
+# ================================
+
+def _debe_explicar(intent: str, result: Dict[str, Any]) -> bool:
+    # Con el circuito abierto no se espera al LLM para un extra opcional
+    return (STREAM_EXPLICAR and intent != "desconocido" and bool(result.get("ok"))
+            and _circuito.estado != ABIERTO)
+
+async def explicar_resultado_stream(text: str, intent: str, result: Dict[str, Any]) -> AsyncIterator[str]:
+    """Genera la explicación del resultado token a token (vacío si no aplica)."""
+    if not _debe_explicar(intent, result):
+        return
+    resultado = json.dumps(result, ensure_ascii=False, default=str)
+    async for trozo in get_chain("explicacion").astream({"text": text, "resultado": resultado}):
+        if trozo:
+            yield trozo
@@ -7,6 +7,7 @@ def ejecutar_consulta(texto_usuario: str):
     routed = route_query(texto_usuario)
     print("🧠 INTENT DETECTADO:", routed["intent"])
     print("📦 PARAMS:", routed["params"])
+    print("🛣️ VÍA:", routed.get("via"))
     result = dispatch(routed["intent"], routed["params"])
     print("\n=== RESULTADO ===")
     print(result)
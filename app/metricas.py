@@ -0,0 +1,167 @@
+# app/metricas.py — contadores e histogramas en proceso, exportados en formato texto de Prometheus
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Buckets en segundos: de 1 ms (cache / Cypher con índice) a 30 s (LLM lento)
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Muestra = Tuple[Dict[str, str], float]
+
+
+def _fmt_etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _escapar(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class Contador:
+    """Contador monotónico con etiquetas. inc() es un += bajo lock."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> None:
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores: str, n: float = 1) -> None:
+        clave = tuple(str(v) for v in valores)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + n
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            items = list(self._valores.items())
+        return [f"{self.nombre}{_fmt_etiquetas(self.etiquetas, k)} {_fmt_num(v)}" for k, v in items]
+
+
+class Histograma:
+    """Histograma de buckets fijos (acumulativos recién al exportar)."""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_LATENCIA) -> None:
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> [cuentas por bucket (+Inf al final), suma, total]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *valores: str) -> None:
+        clave = tuple(str(v) for v in valores)
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def medir(self, *valores: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - t0, *valores)
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            series = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        lineas: List[str] = []
+        for clave, cuentas, suma, total in series:
+            acumulado = 0
+            for limite, c in zip(self.buckets + (float("inf"),), cuentas):
+                acumulado += c
+                le = f'le="{_fmt_num(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{_fmt_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_fmt_etiquetas(self.etiquetas, clave)} {suma!r}")
+            lineas.append(f"{self.nombre}_count{_fmt_etiquetas(self.etiquetas, clave)} {total}")
+        return lineas
+
+
+_METRICAS: List[Any] = []
+# Colectores: funciones que se evalúan recién al exportar (p. ej. contadores
+# que ya llevan los caches), así no suman costo en el camino caliente.
+_COLECTORES: List[Callable[[], List[Tuple[str, str, str, List[Muestra]]]]] = []
+
+
+def contador(nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+    m = Contador(nombre, ayuda, etiquetas)
+    _METRICAS.append(m)
+    return m
+
+
+def histograma(nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+               buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histograma:
+    m = Histograma(nombre, ayuda, etiquetas, buckets)
+    _METRICAS.append(m)
+    return m
+
+
+def registrar_colector(fn: Callable[[], List[Tuple[str, str, str, List[Muestra]]]]) -> None:
+    """fn() devuelve [(nombre, tipo, ayuda, [(etiquetas, valor), ...]), ...]."""
+    _COLECTORES.append(fn)
+
+
+def exportar() -> str:
+    """Todas las métricas en el formato de texto de Prometheus (0.0.4)."""
+    lineas: List[str] = []
+    for m in _METRICAS:
+        lineas.append(f"# HELP {m.nombre} {m.ayuda}")
+        lineas.append(f"# TYPE {m.nombre} {m.tipo}")
+        lineas.extend(m.exportar())
+    for fn in _COLECTORES:
+        for nombre, tipo, ayuda, muestras in fn():
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in muestras:
+                lineas.append(
+                    f"{nombre}{_fmt_etiquetas(list(etiquetas), list(etiquetas.values()))} {_fmt_num(valor)}"
+                )
+    return "\n".join(lineas) + "\n"
+
+
+# ==========================
+# Métricas de EduDB
+# ==========================
+
+ETAPA_SEGUNDOS = histograma(
+    "edudb_etapa_segundos", "Duración de cada etapa de /api/query.", ("etapa", "intent")
+)
+CYPHER_SEGUNDOS = histograma(
+    "edudb_cypher_segundos", "Duración de cada consulta Cypher, por nombre.", ("consulta",)
+)
+LLM_SEGUNDOS = histograma(
+    "edudb_llm_segundos", "Duración de las llamadas al LLM, por cadena y resultado.", ("cadena", "resultado")
+)
+RUTAS_TOTAL = contador(
+    "edudb_rutas_total", "Consultas ruteadas, por camino (reglas, cache, similar, llm, degradado) e intent.",
+    ("via", "intent"),
+)
+ERRORES_TOTAL = contador(
+    "edudb_errores_total", "Errores por etapa (cypher, llm, dispatch).", ("etapa", "nombre")
+)
+RESPUESTAS_TOTAL = contador(
+    "edudb_respuestas_total", "Respuestas de las tools, por intent y ok.", ("intent", "ok")
+)
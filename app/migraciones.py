@@ -0,0 +1,134 @@
+# app/migraciones.py — migraciones versionadas del esquema de Neo4j (constraints + índices)
+import time
+from typing import Any, Dict, List, NamedTuple
+
+
+class Migracion(NamedTuple):
+    version: int
+    descripcion: str
+    sentencias: List[str]
+    indices: List[str]  # nombres que SHOW INDEXES tiene que mostrar ONLINE
+
+
+# Las migraciones se aplican en orden y nunca se editan una vez publicadas:
+# para cambiar algo se agrega una versión nueva.
+MIGRACIONES: List[Migracion] = [
+    Migracion(
+        1,
+        "Constraints e índices para Esquema, Atributo y EVALUAR_FORMA_NORMAL",
+        [
+            "CREATE CONSTRAINT esquema_name IF NOT EXISTS "
+            "FOR (e:Esquema) REQUIRE e.name IS UNIQUE",
+            "CREATE CONSTRAINT atributo_name_esquema IF NOT EXISTS "
+            "FOR (a:Atributo) REQUIRE (a.name, a.esquema) IS UNIQUE",
+            "CREATE INDEX atributo_esquema IF NOT EXISTS "
+            "FOR (a:Atributo) ON (a.esquema)",
+            "CREATE CONSTRAINT evaluar_fn_id IF NOT EXISTS "
+            "FOR (ev:EVALUAR_FORMA_NORMAL) REQUIRE ev.id IS UNIQUE",
+        ],
+        ["esquema_name", "atributo_name_esquema", "atributo_esquema", "evaluar_fn_id"],
+    ),
+    # Los valores de los esquemas existentes los completa agent.reparar_nivel_fn
+    # (el arranque lo corre al aplicar esta versión): acá solo va el índice
+    Migracion(
+        2,
+        "Índice sobre Esquema.nivel_fn (nivel de FN materializado)",
+        [
+            "CREATE INDEX esquema_nivel_fn IF NOT EXISTS "
+            "FOR (e:Esquema) ON (e.nivel_fn)",
+        ],
+        ["esquema_nivel_fn"],
+    ),
+    # Fallback del resolvedor de nombres (app/nombres.py) cuando el índice
+    # de trigramas en memoria no encuentra nada parecido
+    Migracion(
+        3,
+        "Índice full-text sobre Esquema.name (resolución aproximada de nombres)",
+        [
+            "CREATE FULLTEXT INDEX esquema_name_fulltext IF NOT EXISTS "
+            "FOR (e:Esquema) ON EACH [e.name]",
+        ],
+        ["esquema_name_fulltext"],
+    ),
+]
+
+Q_VERSION_ACTUAL = """
+OPTIONAL MATCH (m:MigracionEsquema {id:'edudb'})
+RETURN coalesce(m.version, 0) AS version
+"""
+
+Q_GUARDAR_VERSION = """
+MERGE (m:MigracionEsquema {id:'edudb'})
+SET m.version = $version,
+    m.descripcion = $descripcion,
+    m.aplicada_en = datetime()
+"""
+
+Q_SHOW_INDEXES = "SHOW INDEXES YIELD name, state, labelsOrTypes, properties"
+
+
+def _run(driver, database: str, query: str, params: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+    # Las sentencias de esquema (CREATE INDEX/CONSTRAINT) no pueden mezclarse
+    # con escrituras de datos en la misma transacción: cada una va en auto-commit.
+    with driver.session(database=database) as session:
+        return [r.data() for r in session.run(query, params or {})]
+
+
+def verificar_indices(driver, database: str) -> Dict[str, Any]:
+    """Chequea con SHOW INDEXES que todos los índices esperados estén ONLINE."""
+    filas = _run(driver, database, Q_SHOW_INDEXES)
+    estados = {f["name"]: f["state"] for f in filas}
+    esperados = [n for m in MIGRACIONES for n in m.indices]
+    faltantes = [n for n in esperados if n not in estados]
+    no_online = [n for n in esperados if n in estados and estados[n] != "ONLINE"]
+    return {
+        "ok": not faltantes and not no_online,
+        "indices": {n: estados.get(n) for n in esperados},
+        "faltantes": faltantes,
+        "no_online": no_online,
+    }
+
+
+def aplicar_migraciones(driver, database: str, espera_indices: float = 60.0) -> Dict[str, Any]:
+    """Aplica las migraciones pendientes y verifica los índices.
+
+    Es idempotente: todas las sentencias usan IF NOT EXISTS y la versión
+    aplicada queda guardada en el nodo (:MigracionEsquema {id:'edudb'}).
+    """
+    t0 = time.perf_counter()
+    version = _run(driver, database, Q_VERSION_ACTUAL)[0]["version"]
+    aplicadas: List[int] = []
+
+    for m in MIGRACIONES:
+        if m.version <= version:
+            continue
+        for sentencia in m.sentencias:
+            _run(driver, database, sentencia)
+        _run(driver, database, Q_GUARDAR_VERSION, {"version": m.version, "descripcion": m.descripcion})
+        aplicadas.append(m.version)
+        version = m.version
+
+    if aplicadas:
+        _run(driver, database, "CALL db.awaitIndexes($t)", {"t": int(espera_indices)})
+
+    verificacion = verificar_indices(driver, database)
+    return {
+        "ok": verificacion["ok"],
+        "version": version,
+        "aplicadas": aplicadas,
+        "verificacion": verificacion,
+        "duracion_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    from app.agent import get_driver, cerrar_driver, reparar_nivel_fn, NEO4J_DATABASE
+
+    try:
+        reporte = aplicar_migraciones(get_driver(), NEO4J_DATABASE)
+        print(reporte)
+        if 2 in reporte["aplicadas"] or "--reparar-nivel-fn" in sys.argv[1:]:
+            print(reparar_nivel_fn())
+    finally:
+        cerrar_driver()
@@ -0,0 +1,176 @@
+# app/nombres.py — índice de nombres de esquema para resolver "pedido" / "Pedidos" → Pedido
+#
+# Normaliza (sin acentos, casefold, solo letras y dígitos) y busca por
+# trigramas al estilo pg_trgm: cada nombre se parte en trigramas con relleno
+# y la similitud es el Jaccard de los conjuntos. El índice invertido
+# trigrama → nombres hace que una búsqueda solo toque los nombres que
+# comparten algún trigrama con el texto, no la lista entera.
+#
+# El índice solo conoce los nombres que vio este proceso: no alcanza para
+# decidir que un nombre "no existe". elegir() decide sobre la unión de sus
+# candidatos y los del grafo, y solo sustituye un nombre cuando no hay duda.
+import heapq
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_RE_NO_ALNUM = re.compile(r"[^0-9a-z]+")
+_RE_DIGITOS = re.compile(r"\d+")
+
+
+def normalizar(nombre: str) -> str:
+    """'Clientes_Dirección' → 'clientesdireccion'."""
+    sin_acentos = unicodedata.normalize("NFKD", nombre or "").encode("ascii", "ignore").decode("ascii")
+    return _RE_NO_ALNUM.sub("", sin_acentos.casefold())
+
+
+def trigramas(norm: str) -> Set[str]:
+    """Trigramas de un nombre ya normalizado (dos espacios al inicio, uno al final)."""
+    if not norm:
+        return set()
+    t = f"  {norm} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def similitud(a: str, b: str) -> float:
+    """Jaccard de trigramas entre dos nombres (sin normalizar), en [0, 1]."""
+    ta, tb = trigramas(normalizar(a)), trigramas(normalizar(b))
+    if not ta or not tb:
+        return 0.0
+    comunes = len(ta & tb)
+    return comunes / (len(ta) + len(tb) - comunes)
+
+
+def _digitos(nombre: str) -> List[str]:
+    return _RE_DIGITOS.findall(nombre)
+
+
+def elegir(texto: str, candidatos: Iterable[str], umbral: float,
+           margen: float) -> Tuple[Optional[Tuple[str, float, str]], List[Tuple[str, float]]]:
+    """Decide a qué nombre de `candidatos` se refiere `texto`.
+
+    Devuelve (resuelto, ranking): resuelto es (nombre, similitud, via) o
+    None, y ranking los candidatos parecidos de mayor a menor (vacío si se
+    resolvió). via: "exacto", "normalizado" (una sola coincidencia sin
+    mayúsculas/acentos/'_') o "trigramas": solo si el mejor llega al
+    umbral, le saca al segundo al menos `margen` y tiene los mismos
+    números que el texto (Factura1 nunca se vuelve Factura2).
+    """
+    nombres = list(dict.fromkeys(candidatos))
+    if texto in nombres:
+        return (texto, 1.0, "exacto"), []
+    norm = normalizar(texto)
+    iguales = [n for n in nombres if normalizar(n) == norm]
+    if len(iguales) == 1:
+        return (iguales[0], 1.0, "normalizado"), []
+    ranking = sorted(((n, round(similitud(texto, n), 4)) for n in nombres), key=lambda p: (-p[1], p[0]))
+    ranking = [p for p in ranking if p[1] > 0]
+    if iguales:
+        return None, ranking  # Pedido y PEDIDO existen los dos: que elija el usuario
+    if ranking:
+        nombre, score = ranking[0]
+        segundo = ranking[1][1] if len(ranking) > 1 else 0.0
+        if score >= umbral and score - segundo >= margen and _digitos(nombre) == _digitos(texto):
+            return (nombre, score, "trigramas"), []
+    return None, ranking
+
+
+class IndiceNombres:
+    """Nombres de esquema conocidos, buscables por forma normalizada y por
+    trigramas. Los borrados por este proceso se quitan; uno que borró otro
+    proceso cuesta a lo sumo una consulta que devuelve "No se encontró el
+    esquema"."""
+
+    def __init__(self) -> None:
+        self._exactos: Set[str] = set()
+        self._por_norm: Dict[str, List[str]] = {}
+        self._ids_norm: Dict[str, int] = {}
+        self._normas: List[str] = []
+        self._n_trigramas: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self.cargado = False
+
+    def __len__(self) -> int:
+        return len(self._exactos)
+
+    def __contains__(self, nombre: str) -> bool:
+        return nombre in self._exactos
+
+    def agregar(self, nombres: Iterable[str]) -> int:
+        """Agrega nombres nuevos; devuelve cuántos no estaban."""
+        nuevos = 0
+        with self._lock:
+            for nombre in nombres:
+                norm = normalizar(nombre)
+                if not norm or nombre in self._exactos:
+                    continue
+                self._exactos.add(nombre)
+                self._por_norm.setdefault(norm, []).append(nombre)
+                nuevos += 1
+                if norm in self._ids_norm:
+                    continue
+                # Los trigramas se indexan por forma normalizada, no por nombre
+                i = len(self._normas)
+                self._ids_norm[norm] = i
+                self._normas.append(norm)
+                tris = trigramas(norm)
+                self._n_trigramas.append(len(tris))
+                for t in tris:
+                    self._postings.setdefault(t, []).append(i)
+        return nuevos
+
+    def quitar(self, nombres: Iterable[str]) -> int:
+        """Quita nombres; devuelve cuántos estaban. Los trigramas de una forma
+        normalizada que queda sin nombres se conservan (se reusan si vuelve)
+        pero buscar() la saltea."""
+        quitados = 0
+        with self._lock:
+            for nombre in nombres:
+                if nombre not in self._exactos:
+                    continue
+                self._exactos.discard(nombre)
+                norm = normalizar(nombre)
+                iguales = self._por_norm.get(norm, [])
+                iguales.remove(nombre)
+                if not iguales:
+                    del self._por_norm[norm]
+                quitados += 1
+        return quitados
+
+    def cargar(self, nombres: Iterable[str]) -> int:
+        n = self.agregar(nombres)
+        self.cargado = True
+        return n
+
+    def vaciar(self) -> None:
+        with self._lock:
+            self._exactos.clear()
+            self._por_norm.clear()
+            self._ids_norm.clear()
+            self._normas.clear()
+            self._n_trigramas.clear()
+            self._postings.clear()
+            self.cargado = False
+
+    def buscar(self, texto: str, limite: int = 5) -> List[Tuple[str, float]]:
+        """[(nombre, similitud)] de mayor a menor, solo con trigramas en común.
+        Los nombres que normalizan igual que el texto vienen primero con 1.0."""
+        norm = normalizar(texto)
+        tris = trigramas(norm)
+        if not tris:
+            return []
+        comunes: Dict[int, int] = {}
+        with self._lock:
+            for t in tris:
+                for i in self._postings.get(t, ()):
+                    comunes[i] = comunes.get(i, 0) + 1
+            puntajes = ((c / (len(tris) + self._n_trigramas[i] - c), i) for i, c in comunes.items()
+                        if self._normas[i] in self._por_norm)
+            mejores = heapq.nsmallest(limite, puntajes, key=lambda p: (-p[0], self._normas[p[1]]))
+            return [(nombre, round(s, 4)) for s, i in mejores for nombre in self._por_norm[self._normas[i]]][:limite]
+
+    def candidatos(self, texto: str, limite: int = 10) -> List[str]:
+        """Nombres conocidos parecidos al texto, para pasarle a elegir()."""
+        return [n for n, _ in self.buscar(texto, limite)]
@@ -0,0 +1,182 @@
+# app/perfilado.py — perfilado opcional de Cypher: tiempos del servidor, PROFILE muestreado y log de lentas
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger("edudb.cypher")
+
+CYPHER_PERFILADO = os.getenv("CYPHER_PERFILADO", "0") != "0"  # opt-in
+CYPHER_MUESTREO = float(os.getenv("CYPHER_MUESTREO", "0.01"))  # fracción de ejecuciones con PROFILE
+CYPHER_LENTO_MS = float(os.getenv("CYPHER_LENTO_MS", "200"))  # umbral del log de lentas
+CYPHER_LENTAS_MAX = int(os.getenv("CYPHER_LENTAS_MAX", "200"))  # lentas recientes que se guardan
+
+_RE_ESPACIOS = re.compile(r"\s+")
+_MAX_PARAMS = 500  # caracteres de parámetros que se loguean
+
+
+def activo() -> bool:
+    return CYPHER_PERFILADO
+
+
+def configurar(activo: Optional[bool] = None, muestreo: Optional[float] = None,
+               lento_ms: Optional[float] = None) -> None:
+    """Cambia la configuración en caliente (p. ej. desde un endpoint o un test)."""
+    global CYPHER_PERFILADO, CYPHER_MUESTREO, CYPHER_LENTO_MS
+    if activo is not None:
+        CYPHER_PERFILADO = activo
+    if muestreo is not None:
+        CYPHER_MUESTREO = max(0.0, min(1.0, muestreo))
+    if lento_ms is not None:
+        CYPHER_LENTO_MS = lento_ms
+
+
+def muestrear() -> bool:
+    """¿Esta ejecución va con PROFILE?"""
+    return CYPHER_MUESTREO > 0 and random.random() < CYPHER_MUESTREO
+
+
+def con_profile(query: str) -> str:
+    return "PROFILE " + query.lstrip()
+
+
+def huella(query: str) -> str:
+    """Identificador estable de una consulta: el texto sin espacios de más.
+
+    Los valores van siempre como parámetros, así que el texto normalizado
+    alcanza para agrupar todas las ejecuciones de una misma consulta.
+    """
+    normal = _RE_ESPACIOS.sub(" ", query).strip()
+    return hashlib.sha1(normal.encode("utf-8")).hexdigest()[:12]
+
+
+def _db_hits(plan: Dict[str, Any]) -> int:
+    return int(plan.get("dbHits") or 0) + sum(_db_hits(h) for h in plan.get("children") or [])
+
+
+def resumen_plan(plan: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Plan en una línea: 'Operador(filas, dbHits) < hijo(...)' de la raíz a las hojas."""
+    if not plan:
+        return None
+    partes: List[str] = []
+    pila = [plan]
+    while pila:
+        op = pila.pop()
+        nombre = str(op.get("operatorType", "?")).split("@")[0]
+        partes.append(f"{nombre}({op.get('rows', 0)}, {op.get('dbHits', 0)})")
+        pila.extend(reversed(op.get("children") or []))
+    return " < ".join(partes)
+
+
+def _params_log(params: Dict[str, Any]) -> str:
+    texto = repr(params)
+    return texto if len(texto) <= _MAX_PARAMS else texto[:_MAX_PARAMS] + "…"
+
+
+class _Stats:
+    __slots__ = ("nombre", "consulta", "n", "ms_total", "ms_max", "disponible_total",
+                 "consumido_total", "perfiles", "db_hits_total", "db_hits_max", "lentas")
+
+    def __init__(self, nombre: str, consulta: str) -> None:
+        self.nombre = nombre
+        self.consulta = consulta
+        self.n = 0
+        self.ms_total = 0.0
+        self.ms_max = 0.0
+        self.disponible_total = 0
+        self.consumido_total = 0
+        self.perfiles = 0
+        self.db_hits_total = 0
+        self.db_hits_max = 0
+        self.lentas = 0
+
+
+_stats: Dict[str, _Stats] = {}
+_lentas: "deque[Dict[str, Any]]" = deque(maxlen=CYPHER_LENTAS_MAX)
+_lock = threading.Lock()
+
+
+def registrar(nombre: str, query: str, params: Dict[str, Any], summary: Any,
+              ms_cliente: float, perfilada: bool) -> None:
+    """Acumula una ejecución por huella y, si pasó el umbral, la loguea."""
+    disponible = summary.result_available_after or 0
+    consumido = summary.result_consumed_after or 0
+    plan = summary.profile if perfilada else None
+    hits = _db_hits(plan) if plan else None
+    clave = huella(query)
+
+    with _lock:
+        st = _stats.get(clave)
+        if st is None:
+            st = _stats[clave] = _Stats(nombre, _RE_ESPACIOS.sub(" ", query).strip())
+        st.n += 1
+        st.ms_total += ms_cliente
+        st.ms_max = max(st.ms_max, ms_cliente)
+        st.disponible_total += disponible
+        st.consumido_total += consumido
+        if hits is not None:
+            st.perfiles += 1
+            st.db_hits_total += hits
+            st.db_hits_max = max(st.db_hits_max, hits)
+        lenta = ms_cliente >= CYPHER_LENTO_MS
+        if lenta:
+            st.lentas += 1
+
+    if lenta:
+        entrada = {
+            "huella": clave,
+            "nombre": nombre,
+            "ms": round(ms_cliente, 1),
+            "disponible_ms": disponible,
+            "consumido_ms": consumido,
+            "db_hits": hits,
+            "plan": resumen_plan(plan),
+            "params": _params_log(params),
+        }
+        _lentas.append(entrada)
+        log.warning(
+            "Cypher lenta %s [%s] %.1f ms (servidor %d+%d ms, dbHits=%s) params=%s plan=%s",
+            nombre, clave, ms_cliente, disponible, consumido, hits, entrada["params"], entrada["plan"],
+        )
+
+
+def informe(top: int = 20) -> Dict[str, Any]:
+    """Stats por huella, ordenadas por tiempo total, y las últimas consultas lentas."""
+    with _lock:
+        filas = [
+            {
+                "huella": clave,
+                "nombre": st.nombre,
+                "ejecuciones": st.n,
+                "ms_total": round(st.ms_total, 1),
+                "ms_medio": round(st.ms_total / st.n, 2),
+                "ms_max": round(st.ms_max, 1),
+                "servidor_disponible_ms_medio": round(st.disponible_total / st.n, 2),
+                "servidor_consumido_ms_medio": round(st.consumido_total / st.n, 2),
+                "perfiles": st.perfiles,
+                "db_hits_medio": round(st.db_hits_total / st.perfiles, 1) if st.perfiles else None,
+                "db_hits_max": st.db_hits_max if st.perfiles else None,
+                "lentas": st.lentas,
+                "consulta": st.consulta[:300],
+            }
+            for clave, st in _stats.items()
+        ]
+        lentas = list(_lentas)
+    filas.sort(key=lambda f: f["ms_total"], reverse=True)
+    return {
+        "activo": CYPHER_PERFILADO,
+        "muestreo": CYPHER_MUESTREO,
+        "lento_ms": CYPHER_LENTO_MS,
+        "consultas": filas[:top],
+        "lentas": lentas[-top:],
+    }
+
+
+def reiniciar() -> None:
+    with _lock:
+        _stats.clear()
+        _lentas.clear()
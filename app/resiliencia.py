@@ -0,0 +1,99 @@
+# app/resiliencia.py — circuit breaker para dependencias lentas o caídas (LLM)
+import threading
+import time
+from typing import Any, Dict, Optional
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class CircuitBreaker:
+    """Circuit breaker por fallas consecutivas.
+
+    - Una llamada cuenta como falla si lanzó una excepción (incluido el
+      timeout) o si tardó más de `lento_ms`.
+    - Con `fallas_max` fallas seguidas el circuito se abre: permite()
+      devuelve False durante `reapertura_s` segundos.
+    - Pasado ese tiempo queda semiabierto y deja pasar UNA llamada de
+      prueba: si sale bien se cierra, si falla se vuelve a abrir.
+    """
+
+    def __init__(self, nombre: str, fallas_max: int = 5, reapertura_s: float = 30.0,
+                 lento_ms: Optional[float] = None) -> None:
+        self.nombre = nombre
+        self.fallas_max = max(1, fallas_max)
+        self.reapertura_s = reapertura_s
+        self.lento_ms = lento_ms
+        self.estado = CERRADO
+        self._fallas_seguidas = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+        self.aperturas = 0
+        self.rechazadas = 0
+        self.fallas = 0
+        self.lentas = 0
+        self.exitos = 0
+        self.ultimo_error: Optional[str] = None
+
+    def permite(self) -> bool:
+        with self._lock:
+            if self.estado == CERRADO:
+                return True
+            if self.estado == ABIERTO and time.monotonic() - self._abierto_desde >= self.reapertura_s:
+                self.estado = SEMIABIERTO
+                self._prueba_en_curso = False
+            if self.estado == SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            self.rechazadas += 1
+            return False
+
+    def registrar(self, ms: float, error: Optional[BaseException] = None) -> None:
+        """Anota el resultado de una llamada que permite() dejó pasar."""
+        lenta = error is None and self.lento_ms is not None and ms > self.lento_ms
+        with self._lock:
+            self._prueba_en_curso = False
+            if error is None and not lenta:
+                self.exitos += 1
+                self._fallas_seguidas = 0
+                self.estado = CERRADO
+                return
+            if lenta:
+                self.lentas += 1
+                self.ultimo_error = f"llamada lenta ({ms:.0f} ms)"
+            else:
+                self.fallas += 1
+                self.ultimo_error = f"{type(error).__name__}: {error}"
+            self._fallas_seguidas += 1
+            if self.estado == SEMIABIERTO or self._fallas_seguidas >= self.fallas_max:
+                if self.estado != ABIERTO:
+                    self.aperturas += 1
+                self.estado = ABIERTO
+                self._abierto_desde = time.monotonic()
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self.estado = CERRADO
+            self._fallas_seguidas = 0
+            self._prueba_en_curso = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            abierto_s = time.monotonic() - self._abierto_desde if self.estado != CERRADO else 0.0
+            return {
+                "nombre": self.nombre,
+                "estado": self.estado,
+                "fallas_seguidas": self._fallas_seguidas,
+                "fallas_max": self.fallas_max,
+                "reapertura_s": self.reapertura_s,
+                "lento_ms": self.lento_ms,
+                "aperturas": self.aperturas,
+                "rechazadas": self.rechazadas,
+                "fallas": self.fallas,
+                "lentas": self.lentas,
+                "exitos": self.exitos,
+                "abierto_hace_s": round(abierto_s, 1),
+                "ultimo_error": self.ultimo_error,
+            }
@@ -0,0 +1,162 @@
+# app/similitud.py — cache por similitud de consultas (TF-IDF de n-gramas de caracteres, NumPy)
+import math
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class CacheSimilitud:
+    """Cache acotado que devuelve el valor de la consulta más parecida.
+
+    Cada texto se vectoriza con n-gramas de caracteres (hashing trick en
+    `dims` columnas, tf sublineal) y se guarda como una fila de una matriz
+    densa de `maxsize` filas. El IDF se recalcula con las filas vigentes,
+    y la búsqueda es un coseno TF-IDF contra todas ellas. Al llenarse se
+    reemplaza la fila más vieja.
+    """
+
+    def __init__(self, maxsize: int = 512, umbral: float = 0.8, dims: int = 4096,
+                 ngramas: Tuple[int, ...] = (2, 3)) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self.umbral = umbral
+        self.dims = dims
+        self.ngramas = ngramas
+        self._M = np.zeros((self.maxsize, dims), dtype=np.float32)
+        self._M2 = np.zeros((self.maxsize, dims), dtype=np.float32)  # M**2, para las normas
+        self._df = np.zeros(dims, dtype=np.float32)
+        self._vigente = np.zeros(self.maxsize, dtype=bool)
+        self._valores: List[Any] = [None] * self.maxsize
+        self._textos: List[Optional[str]] = [None] * self.maxsize
+        self._fila_de: Dict[str, int] = {}
+        self._siguiente = 0
+        self._idf2: Optional[np.ndarray] = None     # idf**2, se recalcula al cambiar el contenido
+        self._normas: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rechazos = 0
+        self.reemplazos = 0
+        self._lookup_total = 0.0
+        self._lookup_max = 0.0
+
+    # ---------- vectorización ----------
+
+    def vectorizar(self, texto: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Devuelve (columnas, pesos tf) del texto, en forma dispersa."""
+        t = f" {' '.join(texto.split())} "
+        cuentas: Dict[int, int] = {}
+        for n in self.ngramas:
+            for i in range(len(t) - n + 1):
+                col = zlib.crc32(t[i:i + n].encode("utf-8")) % self.dims
+                cuentas[col] = cuentas.get(col, 0) + 1
+        cols = np.fromiter(cuentas.keys(), dtype=np.int64, count=len(cuentas))
+        tf = np.fromiter((1.0 + math.log(c) for c in cuentas.values()), dtype=np.float32, count=len(cuentas))
+        return cols, tf
+
+    def _preparar(self) -> None:
+        if self._idf2 is None:
+            n = int(self._vigente.sum())
+            idf = np.log((1.0 + n) / (1.0 + self._df)) + 1.0
+            self._idf2 = (idf * idf).astype(np.float32)
+            normas = np.sqrt(self._M2 @ self._idf2)
+            normas[~self._vigente] = np.inf
+            normas[normas == 0] = np.inf
+            self._normas = normas
+
+    # ---------- API ----------
+
+    def agregar(self, texto: str, valor: Any) -> None:
+        cols, tf = self.vectorizar(texto)
+        with self._lock:
+            fila = self._fila_de.get(texto)
+            if fila is None:
+                fila = self._siguiente
+                self._siguiente = (self._siguiente + 1) % self.maxsize
+                if self._vigente[fila]:
+                    self.reemplazos += 1
+                    self._quitar(fila)
+                self._fila_de[texto] = fila
+            else:
+                self._quitar(fila)
+                self._fila_de[texto] = fila
+            self._M[fila, cols] = tf
+            self._M2[fila, cols] = tf * tf
+            self._df[cols] += 1
+            self._vigente[fila] = True
+            self._valores[fila] = valor
+            self._textos[fila] = texto
+            self._idf2 = None
+
+    def _quitar(self, fila: int) -> None:
+        cols = np.flatnonzero(self._M[fila])
+        self._df[cols] -= 1
+        self._M[fila] = 0
+        self._M2[fila] = 0
+        self._vigente[fila] = False
+        self._fila_de.pop(self._textos[fila], None)
+        self._valores[fila] = None
+        self._textos[fila] = None
+
+    def buscar(self, texto: str) -> Tuple[Any, float]:
+        """Devuelve (valor, similitud) de la fila más parecida si supera el
+        umbral, o (None, mejor similitud) si no."""
+        t0 = time.perf_counter()
+        cols, tf = self.vectorizar(texto)
+        with self._lock:
+            valor, score = None, 0.0
+            if self._vigente.any():
+                self._preparar()
+                w = self._idf2[cols]
+                norma_q = float(np.sqrt(np.sum(tf * tf * w)))
+                if norma_q > 0:
+                    sims = (self._M[:, cols] @ (tf * w)) / (self._normas * norma_q)
+                    fila = int(np.argmax(sims))
+                    score = float(sims[fila])
+                    if score >= self.umbral:
+                        valor = self._valores[fila]
+            if valor is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            dt = time.perf_counter() - t0
+            self._lookup_total += dt
+            self._lookup_max = max(self._lookup_max, dt)
+        return valor, score
+
+    def rechazar(self) -> None:
+        """El llamador descartó el último hit (p. ej. no coincide la entidad)."""
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            self.rechazos += 1
+
+    def invalidar(self) -> int:
+        with self._lock:
+            n = int(self._vigente.sum())
+            for fila in np.flatnonzero(self._vigente):
+                self._quitar(int(fila))
+            self._siguiente = 0
+            self._idf2 = None
+            return n
+
+    def __len__(self) -> int:
+        return int(self._vigente.sum())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "tamano": len(self),
+            "maxsize": self.maxsize,
+            "umbral": self.umbral,
+            "dims": self.dims,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "rechazos_entidad": self.rechazos,
+            "reemplazos": self.reemplazos,
+            "lookup_us_medio": round(self._lookup_total / lookups * 1e6, 1) if lookups else 0.0,
+            "lookup_us_max": round(self._lookup_max * 1e6, 1),
+        }
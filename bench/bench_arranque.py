@@ -0,0 +1,69 @@
+# bench/bench_arranque.py — tiempo de import y de arranque en frío (lifespan + calentamiento)
+#
+#   python -m bench.bench_arranque                 # solo imports (no necesita Neo4j ni Ollama)
+#   python -m bench.bench_arranque --arranque      # además: lifespan completo y primera consulta
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULOS = ["app.cache", "app.dependencias", "app.agent", "app.llm_service", "app.app"]
+
+CONSULTA = "¿El esquema Pedido cumple 2FN?"
+
+
+def _medir_import(modulo: str, repeticiones: int) -> list[float]:
+    # Proceso nuevo por medición (import en frío) y sin variables de Neo4j:
+    # importar no debe necesitar entorno ni conexiones.
+    entorno = {k: v for k, v in os.environ.items() if not k.startswith("NEO4J_")}
+    codigo = f"import time; t=time.perf_counter(); import {modulo}; print(time.perf_counter()-t)"
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", codigo],
+            capture_output=True, text=True, env=entorno, check=True,
+        )
+        tiempos.append(float(salida.stdout.strip().splitlines()[-1]) * 1000)
+    return tiempos
+
+
+async def _medir_arranque() -> dict:
+    from app.app import app
+    from app.agent import dispatch_async
+    from app.llm_service import route_query_async
+
+    t0 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        while not (app.state.arranque.get("listo") or app.state.arranque.get("error")):
+            await asyncio.sleep(0.01)
+        listo_ms = (time.perf_counter() - t0) * 1000
+
+        t1 = time.perf_counter()
+        routed = await route_query_async(CONSULTA)
+        await dispatch_async(routed["intent"], routed["params"])
+        primera_ms = (time.perf_counter() - t1) * 1000
+    return {"arranque": app.state.arranque, "listo_ms": listo_ms, "primera_consulta_ms": primera_ms}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--arranque", action="store_true", help="medir lifespan + primera consulta (requiere Neo4j y Ollama)")
+    args = ap.parse_args()
+
+    print(f"{'módulo':20} {'import p50':>11} {'min':>9}")
+    for modulo in MODULOS:
+        t = _medir_import(modulo, args.repeticiones)
+        print(f"{modulo:20} {statistics.median(t):>9.1f}ms {min(t):>7.1f}ms")
+
+    if args.arranque:
+        r = asyncio.run(_medir_arranque())
+        print(f"\nArranque hasta /readyz listo: {r['listo_ms']:.1f} ms  {r['arranque']}")
+        print(f"Primera consulta después del calentamiento: {r['primera_consulta_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
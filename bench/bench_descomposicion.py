@@ -0,0 +1,100 @@
+# bench/bench_descomposicion.py — cobertura mínima, síntesis 3FN y BCNF sobre esquemas sintéticos
+#
+# Compara el motor de app/dependencias.py (cierre indexado sobre bitsets)
+# con una implementación ingenua que recalcula el cierre re-escaneando
+# todas las DFs hasta el punto fijo. No necesita Neo4j ni Ollama.
+#
+#   python -m bench.bench_descomposicion --dfs 100 200 400
+import argparse
+import random
+import time
+from typing import List, Set, Tuple
+
+from app.dependencias import EsquemaDF, cobertura_minima, descomposicion_bcnf, sintesis_3fn
+
+
+def esquema_sintetico(n_dfs: int, n_attrs: int, semilla: int = 7) -> Tuple[List[str], List[Tuple[List[str], List[str]]]]:
+    """Esquema con la forma típica de un modelo mal normalizado: una clave
+    compuesta, grupos de atributos que dependen de partes de la clave
+    (parciales), cadenas entre no primos (transitivas) y DFs redundantes.
+    """
+    rnd = random.Random(semilla)
+    attrs = [f"A{i:03d}" for i in range(n_attrs)]
+    clave, resto = attrs[:3], attrs[3:]
+    dfs: List[Tuple[List[str], List[str]]] = [(clave, resto[:5])]
+    while len(dfs) < n_dfs:
+        tipo = rnd.random()
+        if tipo < 0.3:
+            dfs.append(([rnd.choice(clave)], [rnd.choice(resto)]))
+        elif tipo < 0.7:
+            a, b = rnd.sample(resto, 2)
+            dfs.append(([a], [b]))
+        else:
+            lhs = rnd.sample(resto, rnd.randint(2, 3))
+            dfs.append((lhs, [rnd.choice(resto)]))
+    return attrs, dfs
+
+
+# ---------- implementación ingenua (referencia) ----------
+
+def _cierre_ingenuo(x: Set[str], dfs: List[Tuple[Set[str], Set[str]]]) -> Set[str]:
+    res = set(x)
+    cambio = True
+    while cambio:
+        cambio = False
+        for lhs, rhs in dfs:
+            if lhs <= res and not rhs <= res:
+                res |= rhs
+                cambio = True
+    return res
+
+
+def cobertura_ingenua(dfs_in: List[Tuple[List[str], List[str]]]) -> List[Tuple[Set[str], Set[str]]]:
+    dfs = [(set(l), {a}) for l, r in dfs_in for a in r if a not in l]
+    for i, (lhs, rhs) in enumerate(dfs):
+        for b in sorted(lhs):
+            if len(lhs) > 1 and rhs <= _cierre_ingenuo(lhs - {b}, dfs):
+                lhs = lhs - {b}
+        dfs[i] = (lhs, rhs)
+    i = 0
+    while i < len(dfs):
+        lhs, rhs = dfs[i]
+        resto = dfs[:i] + dfs[i + 1:]
+        if rhs <= _cierre_ingenuo(lhs, resto):
+            dfs = resto
+        else:
+            i += 1
+    return dfs
+
+
+def _medir(fn, repeticiones: int) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dfs", type=int, nargs="+", default=[100, 200, 400])
+    ap.add_argument("--atributos", type=int, default=60)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'DFs':>5} {'cobertura':>11} {'ingenua':>11} {'síntesis 3FN':>13} {'BCNF':>11} {'#3FN':>5} {'#BCNF':>6}")
+    for n in args.dfs:
+        attrs, dfs = esquema_sintetico(n, args.atributos)
+        esq = EsquemaDF(attrs, dfs)
+        t_cob = _medir(lambda: cobertura_minima(esq), args.repeticiones)
+        t_ing = _medir(lambda: cobertura_ingenua(dfs), args.repeticiones)
+        t_3fn = _medir(lambda: sintesis_3fn(esq), args.repeticiones)
+        t_bcnf = _medir(lambda: descomposicion_bcnf(esq), args.repeticiones)
+        n3 = len(sintesis_3fn(esq)["esquemas"])
+        nb = len(descomposicion_bcnf(esq)["esquemas"])
+        print(f"{n:>5} {t_cob:>9.1f}ms {t_ing:>9.1f}ms {t_3fn:>11.1f}ms {t_bcnf:>9.1f}ms {n3:>5} {nb:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# bench/bench_indices.py — latencia de lookups con y sin los índices de app/migraciones.py
+#
+# Uso (contra una base de PRUEBAS, porque borra y recrea los índices):
+#   python -m bench.bench_indices --esquemas 10000 --confirmar
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from app.agent import get_driver, cerrar_driver, NEO4J_DATABASE, Q_ESTADO_FN_TODAS
+from app.migraciones import MIGRACIONES, aplicar_migraciones
+
+PREFIJO = "BENCH_IDX_"
+
+Q_SEMBRAR = """
+UNWIND $nombres AS n
+MERGE (es:Esquema {name:n})
+WITH es
+UNWIND range(1, $attrs) AS i
+MERGE (att:Atributo {name:'A' + toString(i), esquema: es.name})
+SET att.es_pk = i = 1
+MERGE (es)-[:TIENE]->(att)
+WITH DISTINCT es
+MERGE (ev:EVALUAR_FORMA_NORMAL {id:'EV_' + es.name + '_GUIADO'})
+SET ev.esquema_objetivo = es.name
+MERGE (ev)-[:EVALUA]->(es)
+"""
+
+Q_LIMPIAR = """
+MATCH (n) WHERE (n:Esquema AND n.name STARTS WITH $p)
+             OR (n:Atributo AND n.esquema STARTS WITH $p)
+             OR (n:EVALUAR_FORMA_NORMAL AND n.id STARTS WITH 'EV_' + $p)
+CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 5000 ROWS
+"""
+
+LOOKUPS = {
+    "estado_fn (Esquema {name})": (Q_ESTADO_FN_TODAS, lambda n: {"esquema": n}),
+    "Atributo {name, esquema}": (
+        "MATCH (a:Atributo {name:'A1', esquema:$esquema}) RETURN a.es_pk AS pk",
+        lambda n: {"esquema": n},
+    ),
+    "Atributo {esquema}": (
+        "MATCH (a:Atributo {esquema:$esquema}) RETURN count(a) AS n",
+        lambda n: {"esquema": n},
+    ),
+    "EVALUAR_FORMA_NORMAL {id}": (
+        "MATCH (ev:EVALUAR_FORMA_NORMAL {id:$id}) RETURN ev.esquema_objetivo AS e",
+        lambda n: {"id": f"EV_{n}_GUIADO"},
+    ),
+}
+
+
+def _run(query: str, params: Dict | None = None) -> None:
+    with get_driver().session(database=NEO4J_DATABASE) as session:
+        session.run(query, params or {}).consume()
+
+
+def _sembrar(n: int, attrs: int, lote: int = 1000) -> List[str]:
+    nombres = [f"{PREFIJO}{i:06d}" for i in range(n)]
+    for i in range(0, n, lote):
+        _run(Q_SEMBRAR, {"nombres": nombres[i:i + lote], "attrs": attrs})
+    return nombres
+
+
+def _borrar_indices() -> None:
+    for m in MIGRACIONES:
+        for nombre in m.indices:
+            _run(f"DROP CONSTRAINT {nombre} IF EXISTS")
+            _run(f"DROP INDEX {nombre} IF EXISTS")
+    _run("MATCH (m:MigracionEsquema {id:'edudb'}) DELETE m")
+
+
+def _medir(nombres: List[str], repeticiones: int) -> Dict[str, Dict[str, float]]:
+    muestra = random.sample(nombres, min(repeticiones, len(nombres)))
+    res: Dict[str, Dict[str, float]] = {}
+    with get_driver().session(database=NEO4J_DATABASE) as session:
+        for etiqueta, (q, mk_params) in LOOKUPS.items():
+            session.run(q, mk_params(muestra[0])).consume()  # calentar plan
+            tiempos = []
+            for n in muestra:
+                t0 = time.perf_counter()
+                session.run(q, mk_params(n)).consume()
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            tiempos.sort()
+            res[etiqueta] = {
+                "p50_ms": statistics.median(tiempos),
+                "p95_ms": tiempos[int(len(tiempos) * 0.95) - 1],
+            }
+    return res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--esquemas", type=int, default=10_000)
+    ap.add_argument("--atributos", type=int, default=5)
+    ap.add_argument("--repeticiones", type=int, default=300)
+    ap.add_argument("--conservar", action="store_true", help="no borrar los datos sembrados")
+    ap.add_argument("--confirmar", action="store_true", help="acepto que se borren y recreen los índices")
+    args = ap.parse_args()
+    if not args.confirmar:
+        ap.error("este benchmark borra índices: usalo en una base de pruebas y pasá --confirmar")
+
+    print(f"Sembrando {args.esquemas} esquemas x {args.atributos} atributos...")
+    _borrar_indices()
+    nombres = _sembrar(args.esquemas, args.atributos)
+
+    antes = _medir(nombres, args.repeticiones)
+    reporte = aplicar_migraciones(get_driver(), NEO4J_DATABASE)
+    print(f"Migraciones aplicadas: {reporte['aplicadas']} (ok={reporte['ok']})")
+    despues = _medir(nombres, args.repeticiones)
+
+    print(f"\n{'lookup':32} {'sin índice p50/p95':>22} {'con índice p50/p95':>22} {'mejora p50':>11}")
+    for etiqueta in LOOKUPS:
+        a, d = antes[etiqueta], despues[etiqueta]
+        print(
+            f"{etiqueta:32} {a['p50_ms']:>10.2f}/{a['p95_ms']:<9.2f}ms"
+            f" {d['p50_ms']:>10.2f}/{d['p95_ms']:<9.2f}ms {a['p50_ms'] / d['p50_ms']:>9.1f}x"
+        )
+
+    if not args.conservar:
+        _run(Q_LIMPIAR, {"p": PREFIJO})
+    cerrar_driver()
+
+
+if __name__ == "__main__":
+    main()
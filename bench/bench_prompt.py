@@ -0,0 +1,92 @@
+# bench/bench_prompt.py — prompt de ruteo completo vs. compacto: latencia, tokens y precisión
+#
+# Llama directo a las cadenas de ruteo (sin pre-router ni caches), contra el
+# Ollama configurado en el .env:
+#   python -m bench.bench_prompt --repeticiones 3
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.llm_service import _limpiar_ruta, estadisticas_tokens, get_chain
+
+# (consulta, intent esperado, esquema esperado, forma normal esperada)
+CASOS: List[Tuple[str, str, Optional[str], Optional[str]]] = [
+    ("¿El esquema Pedido cumple 2FN?", "estado_fn", "Pedido", "2FN"),
+    ("¿En qué forma normal está el esquema Pedido?", "estado_fn", "Pedido", None),
+    ("qué formas normales cumple Cliente_Direccion", "estado_fn", "Cliente_Direccion", None),
+    ("Pedido está en tercera forma normal?", "estado_fn", "Pedido", "3FN"),
+    ("¿Factura cumple la 1fn?", "estado_fn", "Factura", "1FN"),
+    ("decime si Alumno llega a 2NF", "estado_fn", "Alumno", "2FN"),
+    ("¿Qué se requiere para cumplir 3FN?", "requisitos_fn", None, "3FN"),
+    ("explicame qué pide la primera forma normal", "requisitos_fn", None, "1FN"),
+    ("qué condiciones tiene que cumplir un esquema para estar en 2FN", "requisitos_fn", None, "2FN"),
+    ("¿Qué le falta al esquema Pedido para estar en 2FN?", "requisitos_fn", "Pedido", "2FN"),
+    ("qué necesita Cliente para llegar a 3FN", "requisitos_fn", "Cliente", "3FN"),
+    ("requisitos de la segunda forma normal", "requisitos_fn", None, "2FN"),
+    ("hola, ¿cómo estás?", "desconocido", None, None),
+    ("¿cuál es la capital de Francia?", "desconocido", None, None),
+    ("haceme un SELECT de todos los pedidos", "desconocido", None, None),
+]
+
+
+def _acierta(routed: Dict[str, Any], intent: str, esquema: Optional[str], fn: Optional[str]) -> bool:
+    if routed["intent"] != intent:
+        return False
+    if intent == "desconocido":
+        return True
+    p = routed["params"]
+    return (p.get("esquema") or None) == esquema and (p.get("forma_normal") or None) == fn
+
+
+def _correr(modo: str, repeticiones: int) -> Dict[str, Any]:
+    cadena = get_chain("ruteo", modo)
+    cadena.invoke({"text": CASOS[0][0]})  # carga el modelo y el prefijo
+    antes = estadisticas_tokens()[f"ruteo:{modo}"]
+
+    tiempos: List[float] = []
+    aciertos = 0
+    errores = 0
+    for _ in range(repeticiones):
+        for texto, intent, esquema, fn in CASOS:
+            t0 = time.perf_counter()
+            try:
+                routed = _limpiar_ruta(cadena.invoke({"text": texto}))
+            except Exception:
+                routed = {"intent": "desconocido", "params": {}}
+                errores += 1
+            tiempos.append((time.perf_counter() - t0) * 1000)
+            aciertos += _acierta(routed, intent, esquema, fn)
+
+    despues = estadisticas_tokens()[f"ruteo:{modo}"]
+    n = len(tiempos)
+    llamadas = (despues["llamadas"] - antes["llamadas"]) or 1
+    tiempos.sort()
+    return {
+        "p50_ms": statistics.median(tiempos),
+        "p95_ms": tiempos[max(0, int(n * 0.95) - 1)],
+        "precision": aciertos / n,
+        "errores_parseo": errores,
+        "tokens_prompt": (despues["tokens_prompt"] - antes["tokens_prompt"]) / llamadas,
+        "tokens_respuesta": (despues["tokens_respuesta"] - antes["tokens_respuesta"]) / llamadas,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeticiones", type=int, default=3)
+    ap.add_argument("--modos", nargs="+", default=["completo", "compacto"])
+    args = ap.parse_args()
+
+    print(f"{len(CASOS)} consultas x {args.repeticiones} repeticiones por modo\n")
+    print(f"{'modo':10} {'p50':>9} {'p95':>9} {'precisión':>10} {'tok prompt':>11} {'tok resp':>9} {'err parseo':>11}")
+    for modo in args.modos:
+        r = _correr(modo, args.repeticiones)
+        print(
+            f"{modo:10} {r['p50_ms']:>7.0f}ms {r['p95_ms']:>7.0f}ms {r['precision']:>9.0%}"
+            f" {r['tokens_prompt']:>11.0f} {r['tokens_respuesta']:>9.0f} {r['errores_parseo']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
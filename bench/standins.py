@@ -0,0 +1,413 @@
+# bench/standins.py — dobles locales de Ollama y Neo4j para medir sin servicios externos
+#
+# - OllamaFalso: servidor HTTP en un hilo que imita /api/generate (NDJSON en
+#   streaming, con prompt_eval_count / eval_count en el último chunk) y
+#   responde las rutas con el ruteo por palabras clave. La latencia es
+#   configurable: `latencia_ms` por llamada + `ms_por_token` por chunk.
+# - GrafoFalso: driver sync en proceso que contesta las consultas del agente
+#   (Q_ESTADO_FN_UNA/TODAS, Q_DEPENDENCIAS, Q_GUIADO_ESCRIBIR, ...) desde
+#   dicts en memoria, con `latencia_ms` por consulta para simular la red.
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# ==========================
+# Ollama
+# ==========================
+
+_RE_CONSULTA_LOTE = re.compile(r"^\[(\d+)\] (.*)$", re.M)
+
+
+def _entre(texto: str, inicio: str, fin: str) -> str:
+    return texto.rsplit(inicio, 1)[1].rsplit(fin, 1)[0].strip()
+
+
+def _ruta(texto: str) -> Dict[str, Any]:
+    from app.llm_service import _ruta_degradada
+
+    ruta = _ruta_degradada(texto, "bench")
+    return {"intent": ruta["intent"], "params": ruta["params"]}
+
+
+def responder(prompt: str) -> str:
+    """Lo que contestaría el modelo a cada prompt de llm_service."""
+    if "El usuario preguntó:" in prompt:
+        return "El esquema se evaluó con las reglas de EduDB; revisá las dependencias indicadas."
+    if "Consultas:" in prompt:
+        cuerpo = prompt.rsplit("Consultas:", 1)[1]
+        textos = [t for _, t in _RE_CONSULTA_LOTE.findall(cuerpo)]
+        return json.dumps({"rutas": [_ruta(t) for t in textos]}, ensure_ascii=False)
+    if "Usuario:" in prompt:
+        return json.dumps(_ruta(_entre(prompt, "Usuario:", "Salida:")), ensure_ascii=False)
+    if "Consulta:" in prompt:
+        return json.dumps(_ruta(_entre(prompt, "Consulta:", "JSON:")), ensure_ascii=False)
+    return "{}"
+
+
+class OllamaFalso:
+    """Servidor /api/generate local. Uso: `with OllamaFalso(latencia_ms=50) as o: o.url`."""
+
+    def __init__(self, latencia_ms: float = 50.0, ms_por_token: float = 0.0,
+                 host: str = "127.0.0.1", puerto: int = 0) -> None:
+        self.latencia_ms = latencia_ms
+        self.ms_por_token = ms_por_token
+        self.llamadas = 0
+        self._lock = threading.Lock()
+        falso = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:  # sin ruido en la salida del bench
+                pass
+
+            def do_POST(self) -> None:
+                largo = int(self.headers.get("Content-Length") or 0)
+                cuerpo = json.loads(self.rfile.read(largo) or b"{}")
+                if self.path.rstrip("/") != "/api/generate":
+                    self.send_error(404)
+                    return
+                falso._generar(self, cuerpo)
+
+        self._server = ThreadingHTTPServer((host, puerto), Handler)
+        self._server.daemon_threads = True
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, puerto = self._server.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def _generar(self, h: BaseHTTPRequestHandler, cuerpo: Dict[str, Any]) -> None:
+        with self._lock:
+            self.llamadas += 1
+        prompt = cuerpo.get("prompt")
+        respuesta = responder(prompt) if prompt else ""
+        # Tokens aproximados (~4 caracteres por token), como para el contador
+        tokens = [respuesta[i:i + 4] for i in range(0, len(respuesta), 4)]
+        time.sleep(self.latencia_ms / 1000)
+
+        h.send_response(200)
+        h.send_header("Content-Type", "application/x-ndjson")
+        h.send_header("Transfer-Encoding", "chunked")
+        h.end_headers()
+
+        def _chunk(obj: Dict[str, Any]) -> None:
+            linea = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+            h.wfile.write(f"{len(linea):x}\r\n".encode() + linea + b"\r\n")
+            h.wfile.flush()
+
+        modelo = cuerpo.get("model", "bench")
+        if cuerpo.get("stream", True):
+            for t in tokens:
+                if self.ms_por_token:
+                    time.sleep(self.ms_por_token / 1000)
+                _chunk({"model": modelo, "response": t, "done": False})
+            final = ""
+        else:
+            final = respuesta
+        _chunk({
+            "model": modelo,
+            "response": final,
+            "done": True,
+            "prompt_eval_count": len(prompt or "") // 4,
+            "eval_count": len(tokens),
+        })
+        h.wfile.write(b"0\r\n\r\n")
+        h.wfile.flush()
+
+    def iniciar(self) -> "OllamaFalso":
+        self._hilo = threading.Thread(target=self._server.serve_forever, name="ollama-falso", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "OllamaFalso":
+        return self.iniciar()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.detener()
+
+# ==========================
+# Neo4j
+# ==========================
+
+FNS = ("1FN", "2FN", "3FN")
+
+
+class _Registro:
+    __slots__ = ("_d",)
+
+    def __init__(self, d: Dict[str, Any]) -> None:
+        self._d = d
+
+    def data(self) -> Dict[str, Any]:
+        return self._d
+
+    def __getitem__(self, clave: str) -> Any:
+        return self._d[clave]
+
+
+class _Summary:
+    result_available_after = 0
+    result_consumed_after = 0
+    profile = None
+
+
+class _Resultado(list):
+    def consume(self) -> _Summary:
+        return _Summary()
+
+
+class _Sesion:
+    def __init__(self, grafo: "GrafoFalso") -> None:
+        self._grafo = grafo
+
+    def run(self, query: str, params: Optional[Dict[str, Any]] = None, **kw: Any) -> _Resultado:
+        filas = self._grafo.ejecutar(query, params if params is not None else kw)
+        return _Resultado(_Registro(f) for f in filas)
+
+    def execute_write(self, fn, *args: Any, **kwargs: Any) -> Any:
+        # La "transacción" es la misma sesión: el stand-in no hace rollback
+        with self._grafo.lock:
+            return fn(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "_Sesion":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class GrafoFalso:
+    """Driver sync en memoria con las consultas de app/agent.py.
+
+    esquemas[nombre] = {"atributos": {nombre: es_pk}, "dfs": [(desde, hacia, determinante)],
+                        "estados": {fn: (tipo_rel, props)}}
+    """
+
+    def __init__(self, latencia_ms: float = 1.0) -> None:
+        from app import agent as ag
+
+        self.latencia_ms = latencia_ms
+        self.esquemas: Dict[str, Dict[str, Any]] = {}
+        self.evaluaciones: Dict[str, Dict[str, Any]] = {}
+        self.descompuesto_en: Dict[Tuple[str, str], List[str]] = {}  # (esquema, fn) -> sub-esquemas
+        self.consultas = 0
+        self.lock = threading.RLock()
+        self._handlers = {
+            ag.Q_ESTADO_FN_UNA: self._estado_una,
+            ag.Q_ESTADO_FN_TODAS: self._estado_todas,
+            ag.Q_DEPENDENCIAS: self._dependencias,
+            ag.Q_GUIADO_ESCRIBIR: self._guiado_escribir,
+            ag.Q_DESCOMPOSICION_ESCRIBIR: self._descomposicion_escribir,
+            ag.Q_ESTADOS_FN_RECORRER: self._estados_recorrer,
+            ag.Q_ESQUEMAS_LISTAR: self._esquemas_listar,
+            ag.Q_EXPORTAR: self._exportar,
+            ag.Q_ESTADO_FN_NIVEL: self._estado_nivel,
+            ag.Q_NIVEL_FN_REPARAR: self._nivel_reparar,
+            ag.Q_ESQUEMAS_NOMBRES: self._esquemas_nombres,
+            ag.Q_ESQUEMAS_BUSCAR: self._esquemas_buscar,
+            ag.Q_ESQUEMA_EXACTO: self._esquema_exacto,
+        }
+
+    # ---------- API de driver ----------
+
+    def session(self, **kwargs: Any) -> _Sesion:
+        return _Sesion(self)
+
+    def verify_connectivity(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def ejecutar(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if query.startswith("PROFILE "):
+            query = query[len("PROFILE "):]
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        self.consultas += 1
+        if query.strip() == "RETURN 1":
+            return [{"1": 1}]
+        handler = self._handlers.get(query)
+        if handler is None:
+            raise NotImplementedError(f"GrafoFalso no conoce la consulta: {query.strip()[:80]}")
+        with self.lock:
+            return handler(params)
+
+    # ---------- datos ----------
+
+    def cargar(self, nombre: str, atributos: List[Tuple[str, bool]],
+               dfs: List[Tuple[List[str], List[str]]],
+               estados: Optional[Dict[str, bool]] = None) -> None:
+        """Alta directa de un esquema (sin pasar por Cypher)."""
+        self.esquemas[nombre] = {
+            "atributos": dict(atributos),
+            "dfs": [(x, y, list(det)) for det, deps in dfs for x in det for y in deps],
+            "estados": {
+                fn: ("CUMPLE" if cumple else "NO_CUMPLE", {"origen": "bench"})
+                for fn, cumple in (estados or {}).items()
+            },
+        }
+
+    # ---------- consultas ----------
+
+    def _estado_una(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        es = self.esquemas.get(p["esquema"])
+        if es is None:
+            return []
+        tipo, props = es["estados"].get(p["fn"], (None, None))
+        return [{
+            "esquema": p["esquema"],
+            "forma_normal": p["fn"],
+            "estado": tipo or "SIN_EVALUAR",
+            "datos_cumple": dict(props) if tipo == "CUMPLE" else None,
+            "datos_no_cumple": dict(props) if tipo == "NO_CUMPLE" else None,
+        }]
+
+    def _estado_todas(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        es = self.esquemas.get(p["esquema"])
+        if es is None:
+            return []
+        filas = [
+            {"esquema": p["esquema"], "forma_normal": fn, "tipo_rel": tipo, "estado": tipo, "detalles": dict(props)}
+            for fn, (tipo, props) in sorted(es["estados"].items()) if fn in FNS
+        ]
+        # OPTIONAL MATCH sin evaluaciones: una fila con nulls
+        return filas or [{"esquema": p["esquema"], "forma_normal": None, "tipo_rel": None,
+                          "estado": "SIN_EVALUAR", "detalles": None}]
+
+    def _estado_nivel(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from app.grafo import mascara_fn, nivel_de_mascara
+
+        es = self.esquemas.get(p["esquema"])
+        if es is None:
+            return []
+        m = mascara_fn({fn: tipo for fn, (tipo, _) in es["estados"].items()})
+        detalles = [[fn, dict(props)] for fn, (_, props) in es["estados"].items() if fn in FNS]
+        return [{"esquema": p["esquema"], "nivel_fn": nivel_de_mascara(m), "mascara_fn": m, "detalles": detalles}]
+
+    def _nivel_reparar(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # El doble calcula la máscara al leer: no hay nada que corregir
+        nombres = sorted(n for n in self.esquemas if n > p["despues"])[:p["lote"]]
+        return [{"procesados": len(nombres), "corregidos": 0, "ultimo": nombres[-1] if nombres else None}]
+
+    def _estados_recorrer(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {"esquema": nombre, "forma_normal": fn, "estado": tipo, "props": dict(props or {})}
+            for nombre, es in self.esquemas.items()
+            for fn, (tipo, props) in (es["estados"].items() or [(None, (None, None))])
+        ]
+
+    def _esquemas_listar(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from app.grafo import pasa_filtros
+
+        filas = []
+        for nombre in sorted(n for n in self.esquemas if n > p["despues"]):
+            es = self.esquemas[nombre]
+            estados = {fn: tipo for fn, (tipo, _) in es["estados"].items() if fn in FNS}
+            n_pk = sum(es["atributos"].values())
+            if pasa_filtros(len(es["atributos"]), n_pk > 1, estados, p):
+                filas.append({"esquema": nombre, "n_atributos": len(es["atributos"]),
+                              "pk_compuesta": n_pk > 1, "estados": [[fn, t] for fn, t in estados.items()]})
+                if len(filas) >= p["limite"]:
+                    break
+        return filas
+
+    def _exportar(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [{
+            "esquema": nombre,
+            "atributos": [{"nombre": a, "es_pk": pk} for a, pk in es["atributos"].items()],
+            "dfs": [{"desde": x, "hacia": y, "determinante": det} for x, y, det in es["dfs"]],
+            "evaluaciones": [{"forma_normal": fn, "estado": tipo, "detalles": dict(props)}
+                             for fn, (tipo, props) in sorted(es["estados"].items()) if fn in FNS],
+            "referencias": [],
+        } for nombre, es in sorted(self.esquemas.items()) if nombre > p["despues"]]
+
+    def _esquemas_nombres(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [{"esquema": nombre} for nombre in self.esquemas]
+
+    def _esquemas_buscar(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # Sin Lucene: las palabras de la consulta ("t~ OR t*") contra cada nombre
+        from app.nombres import similitud
+
+        texto = " ".join(t[:-1] for t in p["consulta"].split() if t.endswith("~"))
+        puntajes = sorted(((similitud(texto, n), n) for n in self.esquemas), key=lambda x: (-x[0], x[1]))
+        return self._esquema_exacto(p) + [{"esquema": n, "score": s} for s, n in puntajes[:p["limite"]] if s > 0]
+
+    def _esquema_exacto(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [{"esquema": p["esquema"], "score": 1.0e9}] if p["esquema"] in self.esquemas else []
+
+    def _dependencias(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        es = self.esquemas.get(p["esquema"])
+        if es is None:
+            return []
+        return [{
+            "atributos": [{"nombre": a, "es_pk": pk} for a, pk in es["atributos"].items()],
+            "dfs": [{"desde": x, "hacia": y, "determinante": det} for x, y, det in es["dfs"]],
+        }]
+
+    def _guiado_escribir(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        for e in p["esquemas"]:
+            es = self.esquemas.setdefault(e["esquema"], {"atributos": {}, "dfs": [], "estados": {}})
+            es["atributos"] = {a["nombre"]: bool(a.get("es_pk")) for a in e["atributos"]}
+            if e.get("dfs") is not None:
+                es["dfs"] = [
+                    (d["desde"], d["hacia"], d["determinante"]) for d in e["dfs"]
+                    if d["desde"] in es["atributos"] and d["hacia"] in es["atributos"]
+                ]
+            self.evaluaciones[e["ev"]["id"]] = dict(e["ev"]["props"], esquema_objetivo=e["esquema"])
+            es["estados"] = {
+                ev["fn"]: ("CUMPLE" if ev["cumple"] else "NO_CUMPLE", dict(ev["props"]))
+                for ev in e["evaluaciones"]
+            }
+        return [{"escritos": len(p["esquemas"])}]
+
+    def _descomposicion_escribir(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if p["esquema"] not in self.esquemas:
+            return []
+        viejos = self.descompuesto_en.pop((p["esquema"], p["fn"]), [])
+        borrados = [v for v in viejos if self.esquemas.pop(v, None) is not None]
+        for sub in p["subesquemas"]:
+            self.esquemas[sub["nombre"]] = {
+                "atributos": {a["nombre"]: a["es_pk"] for a in sub["atributos"]},
+                "dfs": [(d["desde"], d["hacia"], d["determinante"]) for d in sub["dfs"]],
+                "estados": {},
+            }
+        creados = [sub["nombre"] for sub in p["subesquemas"]]
+        self.descompuesto_en[(p["esquema"], p["fn"])] = creados
+        return [{"creados": creados, "borrados": borrados}]
+
+
+def grafo_de_ejemplo(n_esquemas: int = 200, latencia_ms: float = 1.0) -> GrafoFalso:
+    """Pedido (el del setup.cypher) más `n_esquemas` sintéticos con una
+    dependencia parcial y una transitiva cada uno."""
+    g = GrafoFalso(latencia_ms=latencia_ms)
+    g.cargar(
+        "Pedido",
+        [("IDProducto", True), ("IDPedido", True), ("NroPedido", False),
+         ("NombreProducto", False), ("Cantidad", False)],
+        [(["IDPedido"], ["NroPedido"]), (["IDProducto"], ["NombreProducto"]),
+         (["IDPedido", "IDProducto"], ["Cantidad"])],
+        {"1FN": True, "2FN": False, "3FN": False},
+    )
+    for i in range(n_esquemas):
+        g.cargar(
+            f"Esquema{i:04d}",
+            [("A", True), ("B", True), ("C", False), ("D", False), ("E", False)],
+            [(["A", "B"], ["C"]), (["A"], ["D"]), (["C"], ["E"])],
+            {"1FN": True, "2FN": False, "3FN": False},
+        )
+    return g
@@ -0,0 +1,283 @@
+# bench/suite.py — suite de benchmarks offline con baseline y control de regresiones
+#
+# Corre las funciones calientes del asistente contra los dobles de
+# bench/standins.py (Ollama falso por HTTP local, grafo en memoria), así que
+# no necesita Neo4j, Ollama ni .env:
+#
+#   python -m bench.suite                         # compara contra bench/baseline.json si existe
+#   python -m bench.suite --guardar-baseline      # (re)escribe la baseline
+#   python -m bench.suite --solo route_query.llm tool_estado_fn.cache --tolerancia 0.3
+#   python -m bench.suite --backend memoria       # tools sobre GrafoMemoria en vez del driver falso
+#
+# Reporta p50/p95/p99 y throughput (ops/s, secuencial) por benchmark. Sale
+# con código 1 si algún p50/p95 empeoró más que --tolerancia respecto de la
+# baseline (o si el throughput cayó en la misma proporción).
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from bench.standins import OllamaFalso, grafo_de_ejemplo
+
+BASELINE = Path(__file__).with_name("baseline.json")
+METRICAS_COMPARADAS = ("p50_ms", "p95_ms")
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano (sin interpolar)."""
+    i = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[i]
+
+
+def medir(fn: Callable[[int], Any], iteraciones: int, calentamiento: int) -> Dict[str, float]:
+    for i in range(calentamiento):
+        fn(i)
+    tiempos: List[float] = []
+    t_total = time.perf_counter()
+    for i in range(iteraciones):
+        t0 = time.perf_counter()
+        fn(calentamiento + i)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    total_s = time.perf_counter() - t_total
+    tiempos.sort()
+    return {
+        "n": iteraciones,
+        "p50_ms": round(_percentil(tiempos, 50), 4),
+        "p95_ms": round(_percentil(tiempos, 95), 4),
+        "p99_ms": round(_percentil(tiempos, 99), 4),
+        "ops_s": round(iteraciones / total_s, 1) if total_s else 0.0,
+    }
+
+# ==========================
+# Benchmarks
+# ==========================
+# Cada uno arma su estado y devuelve fn(i) -> resultado. `i` sirve para
+# variar la entrada (y esquivar los caches cuando lo que se mide es el miss).
+
+
+def _benchmarks(n_esquemas: int) -> Dict[str, Callable[[], Callable[[int], Any]]]:
+    from app import agent as ag
+    from app import llm_service as L
+
+    def esquema(i: int) -> str:
+        return f"Esquema{i % n_esquemas:04d}"
+
+    def _ruteo(reglas: bool, similitud: bool, texto: Callable[[int], str]) -> Callable[[int], Any]:
+        L.ROUTER_REGLAS, L.ROUTER_SIMILITUD = reglas, similitud
+        L.invalidar_cache_rutas()
+        L._circuito.reiniciar()
+        return lambda i: L.route_query(texto(i))
+
+    def route_query_llm():
+        # Consultas distintas y sin pre-router: todas llegan al LLM falso
+        return _ruteo(False, False, lambda i: f"¿El esquema {esquema(i)} cumple 2FN? (variante {i})")
+
+    def route_query_reglas():
+        return _ruteo(True, False, lambda i: f"¿El esquema {esquema(i)} cumple 2FN? (variante {i})")
+
+    def route_query_cache():
+        return _ruteo(False, False, lambda i: "¿El esquema Pedido cumple 2FN?")
+
+    def _lecturas(cache: bool, instantanea: bool = False) -> None:
+        ag.configurar_cache_estado(cache)
+        ag.INSTANTANEA_FN = instantanea
+        if instantanea:
+            ag.cargar_instantanea()
+
+    def dispatch_estado_fn():
+        _lecturas(cache=False)
+        return lambda i: ag.dispatch("estado_fn", {"esquema": esquema(i), "forma_normal": None})
+
+    def tool_estado_fn_cache():
+        # Pocos esquemas: después del calentamiento todo es hit
+        _lecturas(cache=True)
+        return lambda i: ag.tool_estado_fn(esquema(i % 16), "2FN")
+
+    def tool_estado_fn_instantanea():
+        _lecturas(cache=False, instantanea=True)
+        return lambda i: ag.tool_estado_fn(esquema(i), None)
+
+    def tool_estado_fn_nombre_aproximado():
+        # Nombres en minúscula y en plural, como los suele devolver el LLM
+        _lecturas(cache=True)
+        return lambda i: ag.tool_estado_fn(esquema(i).lower(), None)
+
+    def tool_requisitos_fn():
+        _lecturas(cache=True)
+        return lambda i: ag.tool_requisitos_fn("2FN", esquema(i))
+
+    def tool_listar_esquemas():
+        # Recorre el listado página por página; al terminar vuelve a la primera
+        siguiente: Dict[str, Any] = {"cursor": None}
+
+        def pagina(i: int) -> Any:
+            r = ag.tool_listar_esquemas(forma_normal="3FN", estado="NO_CUMPLE", limite=20,
+                                        cursor=siguiente["cursor"])
+            siguiente["cursor"] = r["siguiente"]
+            return r
+        return pagina
+
+    def crear_esquema_guiado():
+        _lecturas(cache=True)
+        return lambda i: ag.crear_esquema_guiado_y_evaluar({
+            "nombre_esquema": f"Guiado{i % n_esquemas:04d}",
+            "atributos": [
+                {"nombre": "A", "es_pk": True}, {"nombre": "B", "es_pk": True},
+                {"nombre": "C"}, {"nombre": "D"}, {"nombre": "E"},
+            ],
+            "dependencias": [
+                {"determinante": ["A", "B"], "dependientes": ["C"]},
+                {"determinante": ["A"], "dependientes": ["D"]},
+                {"determinante": ["C"], "dependientes": ["E"]},
+            ],
+        })
+
+    return {
+        "route_query.llm": route_query_llm,
+        "route_query.reglas": route_query_reglas,
+        "route_query.cache": route_query_cache,
+        "dispatch.estado_fn": dispatch_estado_fn,
+        "tool_estado_fn.cache": tool_estado_fn_cache,
+        "tool_estado_fn.instantanea": tool_estado_fn_instantanea,
+        "tool_estado_fn.nombre_aproximado": tool_estado_fn_nombre_aproximado,
+        "tool_requisitos_fn": tool_requisitos_fn,
+        "tool_listar_esquemas": tool_listar_esquemas,
+        "crear_esquema_guiado_y_evaluar": crear_esquema_guiado,
+    }
+
+# ==========================
+# Baseline
+# ==========================
+
+
+def comparar(actual: Dict[str, Dict[str, float]], base: Dict[str, Dict[str, float]],
+             tolerancia: float, min_ms: float) -> List[str]:
+    """Lista de regresiones (vacía si todo está dentro de la tolerancia).
+
+    `min_ms` es un piso absoluto: en benchmarks de microsegundos una
+    diferencia relativa grande puede ser solo ruido del scheduler.
+    """
+    regresiones: List[str] = []
+    for nombre, r in actual.items():
+        b = base.get(nombre)
+        if not b:
+            continue
+        for m in METRICAS_COMPARADAS:
+            if r[m] > b[m] * (1 + tolerancia) and r[m] - b[m] > min_ms:
+                regresiones.append(f"{nombre}: {m} {b[m]:.3f} -> {r[m]:.3f} ms (+{r[m] / b[m] - 1:.0%})")
+        if b.get("ops_s") and r["ops_s"] < b["ops_s"] / (1 + tolerancia) and r["p50_ms"] - b["p50_ms"] > min_ms:
+            regresiones.append(f"{nombre}: ops_s {b['ops_s']:.1f} -> {r['ops_s']:.1f}")
+    return regresiones
+
+
+def _grafo_memoria(n_esquemas: int):
+    """GrafoMemoria sembrado desde setup.cypher + los mismos esquemas
+    sintéticos que grafo_de_ejemplo, evaluados por el flujo guiado."""
+    from app import agent as ag
+    from app.grafo import grafo_memoria_desde_setup
+
+    g = grafo_memoria_desde_setup(ag._preparar_guiado)
+    g.escribir_guiado([
+        ag._preparar_guiado({
+            "nombre_esquema": f"Esquema{i:04d}",
+            "atributos": [{"nombre": "A", "es_pk": True}, {"nombre": "B", "es_pk": True},
+                          {"nombre": "C"}, {"nombre": "D"}, {"nombre": "E"}],
+            "dependencias": [{"determinante": ["A", "B"], "dependientes": ["C"]},
+                             {"determinante": ["A"], "dependientes": ["D"]},
+                             {"determinante": ["C"], "dependientes": ["E"]}],
+        })["item"]
+        for i in range(n_esquemas)
+    ])
+    return g
+
+
+def _config(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "backend": args.backend,
+        "iteraciones": args.iteraciones,
+        "llm_ms": args.llm_ms,
+        "neo4j_ms": args.neo4j_ms,
+        "esquemas": args.esquemas,
+        "python": platform.python_version(),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iteraciones", type=int, default=200)
+    ap.add_argument("--calentamiento", type=int, default=20)
+    ap.add_argument("--llm-ms", type=float, default=20.0, help="latencia del Ollama falso por llamada")
+    ap.add_argument("--neo4j-ms", type=float, default=0.5, help="latencia del grafo falso por consulta")
+    ap.add_argument("--esquemas", type=int, default=200, help="esquemas sintéticos en el grafo")
+    ap.add_argument("--backend", choices=["neo4j", "memoria"], default="neo4j",
+                    help="neo4j = GrafoNeo4j sobre el driver falso; memoria = GrafoMemoria")
+    ap.add_argument("--solo", nargs="+", help="correr solo estos benchmarks")
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--guardar-baseline", action="store_true")
+    ap.add_argument("--tolerancia", type=float, default=0.25, help="empeoramiento relativo admitido (0.25 = 25%%)")
+    ap.add_argument("--min-ms", type=float, default=0.05, help="diferencia absoluta mínima para contar como regresión")
+    args = ap.parse_args(argv)
+
+    with OllamaFalso(latencia_ms=args.llm_ms) as ollama:
+        # Antes de importar llm_service: la URL se lee al importar
+        os.environ["CLOUD_OLLAMA_URL"] = ollama.url
+        from app import agent as ag
+
+        if args.backend == "memoria":
+            ag.usar_grafo(_grafo_memoria(args.esquemas))
+        else:
+            ag.usar_grafo(ag.GrafoNeo4j())
+            ag._driver = grafo_de_ejemplo(args.esquemas, latencia_ms=args.neo4j_ms)
+        benchmarks = _benchmarks(args.esquemas)
+        nombres = args.solo or list(benchmarks)
+        desconocidos = [n for n in nombres if n not in benchmarks]
+        if desconocidos:
+            ap.error(f"benchmarks desconocidos: {', '.join(desconocidos)} (hay: {', '.join(benchmarks)})")
+
+        resultados: Dict[str, Dict[str, float]] = {}
+        print(f"{'benchmark':32} {'p50':>10} {'p95':>10} {'p99':>10} {'ops/s':>10}")
+        for nombre in nombres:
+            r = resultados[nombre] = medir(benchmarks[nombre](), args.iteraciones, args.calentamiento)
+            print(f"{nombre:32} {r['p50_ms']:>8.3f}ms {r['p95_ms']:>8.3f}ms {r['p99_ms']:>8.3f}ms {r['ops_s']:>10.1f}")
+        ag._driver = None
+        ag.usar_grafo(None)
+
+    config = _config(args)
+    if args.guardar_baseline:
+        previos: Dict[str, Any] = {}
+        if args.baseline.exists():
+            previos = json.loads(args.baseline.read_text(encoding="utf-8")).get("resultados", {})
+        previos.update(resultados)
+        args.baseline.write_text(
+            json.dumps({"config": config, "resultados": previos}, indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
+        print(f"\nbaseline guardada en {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nsin baseline ({args.baseline}); usá --guardar-baseline para crearla")
+        return 0
+    guardada = json.loads(args.baseline.read_text(encoding="utf-8"))
+    distinto: List[Tuple[str, Any, Any]] = [
+        (k, v, config.get(k)) for k, v in guardada.get("config", {}).items() if config.get(k) != v
+    ]
+    if distinto:
+        print("\naviso: la baseline se midió con otra configuración: "
+              + ", ".join(f"{k}={v} (ahora {a})" for k, v, a in distinto))
+    regresiones = comparar(resultados, guardada.get("resultados", {}), args.tolerancia, args.min_ms)
+    if regresiones:
+        print(f"\n{len(regresiones)} regresión(es) por encima de {args.tolerancia:.0%}:")
+        for r in regresiones:
+            print(f"  - {r}")
+        return 1
+    print(f"\nsin regresiones (tolerancia {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+# tests/conftest.py — fixtures compartidas: el agente sobre el driver falso de bench/standins.py
+import pytest
+
+from app import agent as ag
+from bench.standins import grafo_de_ejemplo
+
+
+@pytest.fixture
+def grafo_falso():
+    """GrafoNeo4j sobre GrafoFalso (Pedido + 20 esquemas sintéticos), sin latencia."""
+    g = grafo_de_ejemplo(20, latencia_ms=0)
+    driver_anterior = ag._driver
+    ag._driver = g
+    ag.usar_grafo(ag.GrafoNeo4j())
+    yield g
+    ag.usar_grafo(None)
+    ag._driver = driver_anterior
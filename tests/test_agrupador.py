@@ -0,0 +1,52 @@
+# tests/test_agrupador.py — el agrupador de ruteo resuelve siempre todos los futures
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import llm_service as L
+
+
+def _rutear(monkeypatch, salida_lote, textos):
+    """Rutea `textos` a la vez con un LLM falso que devuelve `salida_lote`
+    para el prompt multi-consulta y falla para las consultas sueltas."""
+    async def llamar(cadena, entrada):
+        if "consultas" in entrada:
+            if isinstance(salida_lote, Exception):
+                raise salida_lote
+            return salida_lote
+        raise RuntimeError("llm caído")
+
+    monkeypatch.setattr(L, "get_chain", lambda *a, **k: None)
+    monkeypatch.setattr(L, "_llamar_llm_async", llamar)
+    agrupador = L._AgrupadorRuteo(ventana_ms=5, max_lote=10)
+
+    async def correr():
+        return await asyncio.wait_for(
+            asyncio.gather(*(agrupador.rutear(t, None) for t in textos)), timeout=2)
+    return asyncio.run(correr()), agrupador
+
+
+TEXTOS = ["¿Pedido cumple 2FN?", "requisitos de 3FN", "hola"]
+
+
+@pytest.mark.parametrize("salida", [
+    SimpleNamespace(rutas=[]),                                   # corta
+    SimpleNamespace(rutas=[object()] * 4),                       # sobran
+    SimpleNamespace(rutas=[object()] * 3),                       # malformadas: _limpiar_ruta falla
+    SimpleNamespace(),                                           # sin rutas
+])
+def test_lote_invalido_cae_a_rutas_individuales(monkeypatch, salida):
+    rutas, agrupador = _rutear(monkeypatch, salida, TEXTOS)
+    assert len(rutas) == len(TEXTOS)
+    assert all(r["degradado"] for r in rutas)
+    assert agrupador.fallback == 1
+
+
+def test_error_inesperado_no_deja_futures_colgados(monkeypatch):
+    async def explota(self, lote):
+        raise ValueError("bug")
+
+    monkeypatch.setattr(L._AgrupadorRuteo, "_resolver", explota)
+    rutas, _ = _rutear(monkeypatch, SimpleNamespace(rutas=[]), TEXTOS)
+    assert [r["motivo"] for r in rutas] == ["bug"] * 3
@@ -0,0 +1,27 @@
+# tests/test_arranque.py — el arranque reintenta hasta que sus pasos terminan
+import asyncio
+from types import SimpleNamespace
+
+import app.app as aplicacion
+
+
+def test_arranque_reintenta_con_backoff(monkeypatch):
+    fallas = [ConnectionError("neo4j no responde"), ConnectionError("neo4j no responde")]
+    esperas = []
+
+    async def _pasos(app, estado):
+        if fallas:
+            raise fallas.pop()
+
+    async def _dormir(s):
+        esperas.append(s)
+
+    monkeypatch.setattr(aplicacion, "_pasos_arranque", _pasos)
+    monkeypatch.setattr(aplicacion.asyncio, "sleep", _dormir)
+    monkeypatch.setattr(aplicacion, "ARRANQUE_ESPERA_S", 1.0)
+    app = SimpleNamespace(state=SimpleNamespace(arranque={"listo": False}))
+    asyncio.run(aplicacion._arrancar(app))
+
+    estado = app.state.arranque
+    assert estado["listo"] and estado["intentos"] == 3 and "error" not in estado
+    assert esperas == [1.0, 2.0]
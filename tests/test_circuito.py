@@ -0,0 +1,52 @@
+# tests/test_circuito.py — circuit breaker (app/resiliencia.py) y timeout del ruteo sync
+import time
+
+from app import llm_service as L
+from app.resiliencia import ABIERTO, CERRADO, SEMIABIERTO, CircuitBreaker
+
+
+def test_abre_con_fallas_seguidas_y_prueba_al_reabrir():
+    c = CircuitBreaker("t", fallas_max=2, reapertura_s=0.05)
+    for _ in range(2):
+        assert c.permite()
+        c.registrar(1, RuntimeError("x"))
+    assert c.estado == ABIERTO and not c.permite()
+    time.sleep(0.06)
+    assert c.permite()          # la llamada de prueba
+    assert not c.permite()      # solo una
+    assert c.estado == SEMIABIERTO
+    c.registrar(1)
+    assert c.estado == CERRADO
+
+
+def test_lenta_cuenta_como_falla():
+    c = CircuitBreaker("t", fallas_max=1, lento_ms=10)
+    c.registrar(50)
+    assert c.estado == ABIERTO and c.lentas == 1
+
+
+def test_route_query_sync_corta_un_llm_colgado(monkeypatch):
+    class Colgada:
+        config = {"run_name": "ruteo"}
+
+        def invoke(self, entrada):
+            time.sleep(1)
+
+    monkeypatch.setattr(L, "ROUTER_TIMEOUT_S", 0.05)
+    monkeypatch.setattr(L, "ROUTER_REGLAS", False)
+    monkeypatch.setattr(L, "ROUTER_SIMILITUD", False)
+    monkeypatch.setattr(L, "get_chain", lambda *a, **k: Colgada())
+    L._circuito.reiniciar()
+    fallas = L._circuito.fallas
+    t0 = time.perf_counter()
+    r = L.route_query("una consulta que nadie cacheó todavía")
+    assert time.perf_counter() - t0 < 0.5
+    assert r["degradado"] and "no respondió" in r["motivo"]
+    assert L._circuito.fallas == fallas + 1
+    L._circuito.reiniciar()
+
+
+def test_timeout_del_cliente_no_supera_el_del_ruteo(monkeypatch):
+    for tope, esperado in ((10, 10), (2.5, 2), (0.05, 1)):
+        monkeypatch.setattr(L, "ROUTER_TIMEOUT_S", tope)
+        assert L._timeout_cliente() == esperado
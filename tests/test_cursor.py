@@ -0,0 +1,21 @@
+# tests/test_cursor.py — cursor opaco del listado paginado de esquemas
+import pytest
+
+from app import agent as ag
+
+
+def test_cursor_ida_y_vuelta():
+    filtros = {"fn": "3FN", "estado": "NO_CUMPLE"}
+    assert ag._leer_cursor(ag._cursor("Pedido_ñ", filtros), filtros) == "Pedido_ñ"
+
+
+def test_cursor_de_otros_filtros():
+    cursor = ag._cursor("Pedido", {"fn": "3FN"})
+    with pytest.raises(ValueError, match="otros filtros"):
+        ag._leer_cursor(cursor, {"fn": "2FN"})
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", "W10", "bnVsbA", "eyJkIjogMX0"])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        ag._leer_cursor(cursor, {})
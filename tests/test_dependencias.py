@@ -0,0 +1,80 @@
+# tests/test_dependencias.py — motor de DF: cierre, claves, cobertura mínima, 3FN/BCNF
+import pytest
+
+from app.dependencias import EsquemaDF, analizar_dependencias, cobertura_minima, descomponer
+
+
+def _nombres(esq, masks):
+    return sorted(tuple(esq.nombres(m)) for m in masks)
+
+
+def test_cierre():
+    esq = EsquemaDF("ABCDE", [("A", "B"), ("B", "C"), ("CD", "E")])
+    assert esq.nombres(esq.cierre(esq.mascara("A"))) == ["A", "B", "C"]
+    assert esq.nombres(esq.cierre(esq.mascara("AD"))) == list("ABCDE")
+    # ignorando A → B el cierre de A no avanza
+    assert esq.cierre(esq.mascara("A"), excluir=0) == esq.mascara("A")
+
+
+def test_claves_candidatas():
+    esq = EsquemaDF("ABCD", [("AB", "C"), ("C", "D"), ("D", "A")])
+    assert _nombres(esq, esq.claves_candidatas()) == [("A", "B"), ("B", "C"), ("B", "D")]
+
+
+def test_cobertura_minima_saca_extranos_y_redundantes():
+    esq = EsquemaDF("ABC", [("A", "BC"), ("B", "C"), ("AB", "C")])
+    cobertura = {tuple(esq.nombres(l)): esq.nombres(r) for l, r in cobertura_minima(esq)}
+    assert cobertura == {("A",): ["B"], ("B",): ["C"]}
+
+
+def test_parcial_transitiva_y_bcnf():
+    r = analizar_dependencias("ABCD", [("AB", "C"), ("A", "D")], pk="AB")
+    assert r["dependencias_parciales"] == [{"determinante": ["A"], "dependiente": "D"}]
+    assert not r["cumple_2fn"] and r["pk_es_clave_candidata"]
+
+    r = analizar_dependencias("ABC", [("A", "B"), ("B", "C")])
+    assert r["cumple_2fn"] and not r["cumple_3fn"]
+    assert r["dependencias_transitivas"] == [{"determinante": ["B"], "dependiente": "C"}]
+
+    # 3FN pero no BCNF: C → B con B primo
+    r = analizar_dependencias("ABC", [("AB", "C"), ("C", "B")])
+    assert r["cumple_3fn"] and not r["cumple_bcnf"]
+
+
+def test_determinante_vacio_es_constante_no_parcial():
+    r = analizar_dependencias("ABCD", [("AB", "D"), ((), "C"), ("A", "C")])
+    assert r["dependencias_constantes"] == ["C"]
+    assert r["dependencias_parciales"] == []
+    assert r["cumple_2fn"] and not r["cumple_3fn"] and not r["cumple_bcnf"]
+    tipos = {("".join(d["determinante"]), d["dependiente"]): d["tipo"] for d in r["dfs"]}
+    assert tipos == {("AB", "D"): "Plena", ("", "C"): "Constante", ("A", "C"): "Constante"}
+
+
+@pytest.mark.parametrize("forma_normal", ["3FN", "BCNF"])
+def test_descomposicion_sin_perdida_y_cubre_todo(forma_normal):
+    atributos = ["curso", "profesor", "hora", "aula", "alumno", "nota", "suelto"]
+    dfs = [(["curso"], ["profesor"]), (["hora", "aula"], ["curso"]), (["hora", "profesor"], ["aula"]),
+           (["curso", "alumno"], ["nota"]), (["hora", "alumno"], ["aula"])]
+    r = descomponer(atributos, dfs, forma_normal)
+    cubiertos = {a for e in r["esquemas"] for a in e["atributos"]}
+    assert cubiertos == set(atributos)
+    esq = EsquemaDF(atributos, dfs)
+    # alguna relación contiene una clave del esquema original (sin pérdida)
+    assert any(esq.es_superclave(esq.mascara(e["atributos"])) for e in r["esquemas"])
+    if forma_normal == "3FN":
+        assert r["preserva_dependencias"]
+    else:
+        for e in r["esquemas"]:
+            sub = EsquemaDF(e["atributos"], [(d["determinante"], d["dependientes"]) for d in e["dependencias"]])
+            assert sub.analizar()["cumple_bcnf"]
+
+
+def test_guiado_rechaza_determinante_vacio():
+    from app import agent as ag
+
+    r = ag._preparar_guiado({
+        "nombre_esquema": "T",
+        "atributos": [{"nombre": "A", "es_pk": True}, {"nombre": "B"}],
+        "dependencias": [{"determinante": [], "dependientes": ["B"]}],
+    })
+    assert not r["ok"] and "determinante" in r["error"]
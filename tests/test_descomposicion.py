@@ -0,0 +1,50 @@
+# tests/test_descomposicion.py — persistir una descomposición sobre GrafoMemoria
+import pytest
+
+from app import agent as ag
+from app.grafo import GrafoMemoria
+
+
+def _guiado(dependencias):
+    return {
+        "nombre_esquema": "Envio",
+        "atributos": [{"nombre": a, "es_pk": a == "id"} for a in ("id", "zona", "tarifa", "moneda")],
+        "dependencias": dependencias,
+    }
+
+
+@pytest.fixture
+def grafo_memoria(monkeypatch):
+    monkeypatch.setattr(ag, "INSTANTANEA_FN", True)
+    g = GrafoMemoria()
+    ag.usar_grafo(g)
+    ag.cargar_instantanea()
+    yield g
+    ag.usar_grafo(None)
+
+
+def test_redescomponer_olvida_los_sub_esquemas_borrados(grafo_memoria):
+    ag.crear_esquema_guiado_y_evaluar(_guiado([
+        {"determinante": ["id"], "dependientes": ["zona"]},
+        {"determinante": ["zona"], "dependientes": ["tarifa"]},
+        {"determinante": ["tarifa"], "dependientes": ["moneda"]},
+    ]))
+    antes = ag.tool_descomponer_esquema("Envio", "3FN", persistir=True)
+    subs_antes = [s["nombre"] for s in antes["esquemas"]]
+    assert len(subs_antes) == 3
+    for sub in subs_antes:
+        assert ag.tool_estado_fn(sub)["ok"]  # queda en el cache y en la instantánea
+
+    ag.crear_esquema_guiado_y_evaluar(_guiado([{"determinante": ["id"], "dependientes": ["zona", "tarifa", "moneda"]}]))
+    despues = ag.tool_descomponer_esquema("Envio", "3FN", persistir=True)
+    subs_despues = [s["nombre"] for s in despues["esquemas"]]
+    borrados = [s for s in subs_antes if s not in subs_despues]
+    assert borrados
+
+    for sub in borrados:
+        assert sub not in grafo_memoria.esquemas
+        assert sub not in ag._nombres
+        assert ag._instantanea.filas({"esquema": sub}) is None
+        assert not ag.tool_estado_fn(sub)["ok"]
+    for sub in subs_despues:
+        assert sub in ag._nombres
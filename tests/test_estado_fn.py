@@ -0,0 +1,29 @@
+# tests/test_estado_fn.py — lectura de estado_fn: camino por nivel_fn vs. aristas
+from app import agent as ag
+
+
+def test_nivel_fn_trae_los_mismos_detalles_que_las_aristas(grafo_falso, monkeypatch):
+    monkeypatch.setattr(ag, "ESTADO_CACHE", False)
+    monkeypatch.setattr(ag, "NIVEL_FN_LECTURA", True)
+    por_nivel = ag.tool_estado_fn("Pedido")
+    monkeypatch.setattr(ag, "NIVEL_FN_LECTURA", False)
+    por_aristas = ag.tool_estado_fn("Pedido")
+    assert por_nivel["nivel_fn"] == por_aristas["nivel_fn"] == 1
+    claves = lambda r: [(f["forma_normal"], f["estado"], f["detalles"]) for f in r["resultados"]]
+    assert claves(por_nivel) == claves(por_aristas)
+    assert all(f["detalles"] for f in por_nivel["resultados"])
+
+
+class _GrafoQueRepara:
+    def reparar_nivel_fn(self, despues, lote):
+        return {"procesados": 1, "corregidos": 1, "ultimo": None}
+
+
+def test_lectura_empezada_antes_de_reparar_no_queda_en_cache(monkeypatch):
+    monkeypatch.setattr(ag, "ESTADO_CACHE", True)
+    params = {"esquema": "Pedido"}
+    _, clave, gen = ag._estado_cacheado(params)
+    monkeypatch.setattr(ag, "get_grafo", lambda: _GrafoQueRepara())
+    ag.reparar_nivel_fn()
+    ag._guardar_estado(clave, gen, {"ok": True, "viejo": True})
+    assert ag._estado_cacheado(params)[0] is None
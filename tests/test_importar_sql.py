@@ -0,0 +1,112 @@
+# tests/test_importar_sql.py — parser de dumps e importación sobre GrafoMemoria
+import pytest
+
+from app import agent as ag
+from app.grafo import GrafoMemoria
+from app.importar_sql import importar, parsear_alter_table, parsear_create_table, sentencias_de_tablas
+
+MYSQLDUMP = """\
+-- MySQL dump
+DROP TABLE IF EXISTS `cliente`;
+CREATE TABLE `cliente` (
+  `id` int NOT NULL,
+  `email` varchar(80) DEFAULT 'a;b',
+  `key` int,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `email_uq` (`email`),
+  KEY `idx_key` (`key`)
+) ENGINE=InnoDB;
+INSERT INTO `cliente` VALUES (1,'x;y',2);
+"""
+
+PG_DUMP = """\
+CREATE TABLE public.cliente (
+    id integer NOT NULL,
+    nombre text
+);
+ALTER TABLE public.cliente OWNER TO postgres;
+CREATE TABLE public.pedido (
+    numero integer NOT NULL,
+    cliente_id integer,
+    period varchar(10)
+);
+COPY public.pedido (numero, cliente_id, period) FROM stdin;
+1\t1\t2024Q1
+\\.
+ALTER TABLE ONLY public.cliente
+    ADD CONSTRAINT cliente_pkey PRIMARY KEY (id);
+ALTER TABLE ONLY public.pedido
+    ADD CONSTRAINT pedido_pkey PRIMARY KEY (numero);
+ALTER TABLE ONLY public.pedido
+    ADD CONSTRAINT pedido_cliente_fk FOREIGN KEY (cliente_id) REFERENCES public.cliente(id);
+"""
+
+
+@pytest.fixture
+def grafo_memoria():
+    g = GrafoMemoria()
+    ag.usar_grafo(g)
+    yield g
+    ag.usar_grafo(None)
+
+
+def test_separador_ignora_insert_y_comentarios():
+    sentencias = list(sentencias_de_tablas(MYSQLDUMP.splitlines(keepends=True)))
+    assert len(sentencias) == 1
+    assert "'a;b'" in sentencias[0]
+
+
+def test_create_table_mysqldump():
+    tabla = parsear_create_table(next(sentencias_de_tablas(MYSQLDUMP.splitlines(keepends=True))))
+    assert tabla["nombre"] == "cliente"
+    assert tabla["columnas"] == ["id", "email", "key"]
+    assert tabla["pk"] == ["id"]
+    assert tabla["unicos"] == [["email"]]
+
+
+@pytest.mark.parametrize("columna", ["period varchar(10)", "like_count int", "check text", "exclude boolean"])
+def test_columnas_con_nombre_de_palabra_clave(columna):
+    tabla = parsear_create_table(f"CREATE TABLE t (id int PRIMARY KEY, {columna})")
+    assert tabla["columnas"] == ["id", columna.split()[0]]
+
+
+@pytest.mark.parametrize("item", [
+    "PERIOD FOR validez (desde, hasta)",
+    "LIKE otra INCLUDING DEFAULTS",
+    "CHECK (id > 0)",
+    "CONSTRAINT positivo CHECK (id > 0)",
+    "EXCLUDE USING gist (id WITH =)",
+    "FULLTEXT KEY ft (id)",
+])
+def test_items_que_no_son_columnas(item):
+    tabla = parsear_create_table(f"CREATE TABLE t (id int, {item})")
+    assert tabla["columnas"] == ["id"]
+
+
+def test_alter_table_add_constraint():
+    alter = parsear_alter_table(
+        "ALTER TABLE ONLY public.pedido ADD CONSTRAINT pk PRIMARY KEY (numero), "
+        "ADD UNIQUE KEY u (codigo), ADD CONSTRAINT fk FOREIGN KEY (cliente_id) REFERENCES public.cliente(id)")
+    assert alter["nombre"] == "pedido"
+    assert alter["pk"] == ["numero"]
+    assert alter["unicos"] == [["codigo"]]
+    assert alter["fks"] == [(["cliente_id"], "cliente", ["id"])]
+    assert parsear_alter_table("ALTER TABLE public.cliente OWNER TO postgres") is None
+
+
+def test_importar_pg_dump_toma_las_claves_del_alter(grafo_memoria):
+    reporte = importar(PG_DUMP.splitlines(keepends=True))
+    assert reporte["ok"] and reporte["tablas"] == 2 and reporte["restricciones"] == 3
+    cliente, pedido = grafo_memoria.esquemas["cliente"], grafo_memoria.esquemas["pedido"]
+    assert cliente.atributos == {"id": True, "nombre": False}
+    assert pedido.atributos == {"numero": True, "cliente_id": False, "period": False}
+    assert ("cliente_id", "cliente", "id") in pedido.referencias
+    assert reporte["dfs"] == 2
+
+
+def test_alter_sobre_tabla_ya_escrita_la_reescribe(grafo_memoria):
+    dump = ("CREATE TABLE t (id int PRIMARY KEY, codigo int, x int);\n"
+            "ALTER TABLE t ADD CONSTRAINT u UNIQUE (codigo);\n")
+    reporte = importar(dump.splitlines(keepends=True), chunk_size=1)
+    assert reporte["dfs"] == 2
+    assert ("codigo", "x", ("codigo",)) in grafo_memoria.esquemas["t"].dfs
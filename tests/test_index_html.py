@@ -0,0 +1,19 @@
+# tests/test_index_html.py — el <script> de la interfaz web tiene que parsear
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from app.app import INDEX_HTML
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="hace falta node para chequear la sintaxis")
+def test_script_de_index_html_es_js_valido(tmp_path):
+    scripts = re.findall(r"<script>(.*?)</script>", INDEX_HTML, re.S)
+    assert scripts
+    for i, script in enumerate(scripts):
+        ruta = tmp_path / f"index_{i}.js"
+        ruta.write_text(script, encoding="utf-8")
+        r = subprocess.run(["node", "--check", str(ruta)], capture_output=True, text=True)
+        assert r.returncode == 0, r.stderr
@@ -0,0 +1,30 @@
+# tests/test_instantanea.py — read model de estados FN
+from app.instantanea import InstantaneaFN
+
+
+def _filas(props_por_esquema):
+    return [{"esquema": e, "forma_normal": "3FN", "estado": "NO_CUMPLE", "props": p}
+            for e, p in props_por_esquema.items()]
+
+
+def test_cada_carga_arranca_una_tabla_de_props_nueva():
+    inst = InstantaneaFN()
+    inst.cargar(_filas({f"E{i}": {"transitivas": i} for i in range(50)}))
+    assert inst.stats()["props_distintas"] == 50
+
+    r = inst.cargar(_filas({f"E{i}": {"transitivas": 1} for i in range(50)}))
+    assert inst.stats()["props_distintas"] == 1
+    assert r["diferencias"] == 49  # E1 ya tenía {"transitivas": 1}
+    assert inst.filas({"esquema": "E7", "fn": "3FN"})[0]["datos_no_cumple"] == {"transitivas": 1}
+
+    # Misma foto con otros ids de props: sin diferencias
+    assert inst.cargar(_filas({f"E{i}": {"transitivas": 1} for i in range(50)}))["diferencias"] == 0
+
+
+def test_aplicar_y_quitar():
+    inst = InstantaneaFN()
+    inst.cargar(_filas({"A": {"x": 1}}))
+    inst.aplicar("B", {"2FN": ("CUMPLE", {"y": 2})})
+    assert inst.filas({"esquema": "B", "fn": "2FN"})[0]["datos_cumple"] == {"y": 2}
+    inst.quitar("A")
+    assert inst.filas({"esquema": "A"}) is None
@@ -0,0 +1,97 @@
+# tests/test_nombres.py — índice de nombres (app/nombres.py) y resolución en las tools
+from app import agent as ag
+from app.nombres import IndiceNombres, elegir, normalizar, similitud
+
+
+def test_normalizar():
+    assert normalizar("Clientes_Dirección") == "clientesdireccion"
+    assert normalizar("  ") == ""
+
+
+def test_similitud():
+    assert similitud("Pedido", "pedido") == 1.0
+    assert 0.6 < similitud("Pedidos", "Pedido") < 0.7
+    assert similitud("Pedido", "xyz") == 0.0
+
+
+def test_indice_buscar_y_candidatos():
+    idx = IndiceNombres()
+    assert idx.cargar(["Pedido", "PEDIDO", "Cliente"]) == 3
+    assert idx.agregar(["Pedido"]) == 0
+    assert "Pedido" in idx and "pedido" not in idx
+    assert idx.buscar("pedido")[:2] == [("Pedido", 1.0), ("PEDIDO", 1.0)]  # en orden de alta
+    assert "Cliente" in idx.candidatos("clientes")
+    idx.vaciar()
+    assert len(idx) == 0 and not idx.cargado
+
+
+def test_elegir_exacto_y_normalizado():
+    assert elegir("Pedido", ["Pedido", "Pedidos"], 0.85, 0.1)[0] == ("Pedido", 1.0, "exacto")
+    assert elegir("pedido", ["Pedido", "Cliente"], 0.85, 0.1)[0] == ("Pedido", 1.0, "normalizado")
+
+
+def test_elegir_ambiguo_devuelve_candidatos():
+    resuelto, ranking = elegir("pedido", ["Pedido", "PEDIDO"], 0.85, 0.1)
+    assert resuelto is None
+    assert {n for n, _ in ranking} == {"Pedido", "PEDIDO"}
+
+
+def test_elegir_no_sustituye_parecidos_con_umbral_alto():
+    # Los casos del review: ninguno es lo bastante parecido para sustituir
+    for texto, otro in [("Pedido2", "Pedido"), ("Pedidos", "Pedido"), ("Clientes", "Cliente")]:
+        resuelto, ranking = elegir(texto, [otro], 0.85, 0.1)
+        assert resuelto is None
+        assert ranking[0][0] == otro
+
+
+def test_elegir_no_cambia_numeros():
+    resuelto, _ = elegir("FacturaDetalleLinea3", ["FacturaDetalleLinea2"], 0.5, 0.0)
+    assert resuelto is None
+
+
+def test_elegir_exige_margen_sobre_el_segundo():
+    candidatos = ["FacturaDetalleLinea", "FacturaDetalleLineaX"]
+    assert elegir("FacturaDetalleLineas", candidatos, 0.8, 0.1)[0] is None
+    assert elegir("FacturaDetalleLineas", candidatos[:1], 0.8, 0.1)[0][2] == "trigramas"
+
+
+def test_resolver_prefiere_el_grafo_al_indice(grafo_falso):
+    ag.cargar_nombres()
+    # Escritos por "otro proceso": el índice local no los conoce
+    for nombre in ("Pedido2", "Pedidos", "Clientes"):
+        grafo_falso.cargar(nombre, [("A", True)], [], {"1FN": True})
+    grafo_falso.cargar("Cliente", [("A", True)], [], {"1FN": True})
+    ag.registrar_nombres("Cliente")
+    for nombre in ("Pedido2", "Pedidos", "Clientes"):
+        r = ag.tool_estado_fn(nombre)
+        assert r["ok"] and r["esquema"] == nombre and "resolucion" not in r
+
+
+def test_resolver_normalizado_y_sugerencias(grafo_falso):
+    r = ag.tool_estado_fn("pedido")
+    assert r["ok"] and r["esquema"] == "Pedido"
+    assert r["esquema_pedido"] == "pedido" and r["resolucion"]["via"] == "normalizado"
+
+    r = ag.tool_estado_fn("Esquema0003x")
+    assert not r["ok"]
+    assert r["sugerencias"][0] == "Esquema0003"
+
+
+def test_resolver_nombre_conocido_no_consulta_de_mas(grafo_falso):
+    ag.cargar_nombres()
+    antes = grafo_falso.consultas
+    ag.tool_estado_fn("Esquema0001")
+    assert grafo_falso.consultas - antes == 1
+
+
+def test_contadores_del_resolver_con_hilos():
+    import threading
+
+    antes = ag.estadisticas_nombres()["exacto"]
+    hilos = [threading.Thread(target=lambda: [ag._contar_resolucion("exacto") for _ in range(2000)])
+             for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert ag.estadisticas_nombres()["exacto"] - antes == 16000
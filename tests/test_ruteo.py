@@ -0,0 +1,38 @@
+# tests/test_ruteo.py — pre-router: esquemas conocidos y contadores de ruteo
+import threading
+
+import pytest
+
+import app.app as aplicacion
+from app import llm_service as L
+
+
+@pytest.fixture
+def conocidos():
+    antes = dict(L.ESQUEMAS_CONOCIDOS)
+    L.ESQUEMAS_CONOCIDOS.clear()
+    yield L.ESQUEMAS_CONOCIDOS
+    L.ESQUEMAS_CONOCIDOS.clear()
+    L.ESQUEMAS_CONOCIDOS.update(antes)
+
+
+def test_conocidos_salen_del_grafo(grafo_falso, conocidos):
+    assert L._extraer_esquemas("¿pedido cumple 2FN?") == []
+    assert aplicacion._registrar_esquemas_del_grafo() == 21
+    assert L._extraer_esquemas("¿pedido cumple 2FN?") == ["Pedido"]
+    assert L._extraer_esquemas("y esquema0003?") == ["Esquema0003"]
+
+
+def test_contadores_de_ruteo_con_hilos():
+    antes = L.estadisticas_ruteo()["reglas"]
+
+    def _contar():
+        for _ in range(2000):
+            L._contar_ruta("reglas")
+
+    hilos = [threading.Thread(target=_contar) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert L.estadisticas_ruteo()["reglas"] - antes == 16000